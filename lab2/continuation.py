@@ -0,0 +1,466 @@
+import copy
+import numpy as np
+from scipy.integrate import solve_ivp
+from scipy.optimize import brentq
+from lab2 import flux_production, jacobian_flux_production
+from steady_state import solve_steady_state
+
+
+def set_parameter(flux_param_dict, f6b_influx, param, value):
+    """
+    Returns a parameter dictionary and an influx where the continuation parameter is set to the given value
+    :param flux_param_dict: Parameter dictionary for the PFK and aldolase fluxes
+    :param f6b_influx: Influx of F6P
+    :param param: Continuation parameter. Either 'f6b_influx' or a tuple of enzyme and parameter name,
+            e.g. ('pfk', 'limiting_rate')
+    :param value: Value of the continuation parameter
+    :return: Parameter dictionary and influx
+    """
+    if param == 'f6b_influx':
+        return flux_param_dict, value
+    enzyme, name = param
+    param_dict = copy.deepcopy(flux_param_dict)
+    param_dict[enzyme][name] = value
+    return param_dict, f6b_influx
+
+
+def _residual(log_point, flux_param_dict, f6b_influx, param):
+    """
+    Change in concentration at a point of the extended state space, given by the log-concentrations and
+    the log of the continuation parameter
+    :param log_point: Log-concentrations of F6P and FBP and log of the continuation parameter
+    :param flux_param_dict: Parameter dictionary for the PFK and aldolase fluxes
+    :param f6b_influx: Influx of F6P
+    :param param: Continuation parameter
+    :return: Change in concentration
+    """
+    conc = np.exp(log_point[:2])
+    param_dict, influx = set_parameter(flux_param_dict, f6b_influx, param, np.exp(log_point[2]))
+    return flux_production(conc[0], conc[1], param_dict, f6b_influx=influx)
+
+
+def _extended_jacobian(log_point, flux_param_dict, f6b_influx, param, rel_step=1e-7):
+    """
+    Jacobian of the change in concentration with respect to the log-concentrations and the log of the
+    continuation parameter. The state derivatives are analytic, the parameter derivative is computed with
+    central differences
+    :param log_point: Log-concentrations of F6P and FBP and log of the continuation parameter
+    :param flux_param_dict: Parameter dictionary for the PFK and aldolase fluxes
+    :param f6b_influx: Influx of F6P
+    :param param: Continuation parameter
+    :param rel_step: Step for the central differences in the log-parameter
+    :return: Jacobian with shape (2, 3)
+    """
+    conc = np.exp(log_point[:2])
+    param_dict, _ = set_parameter(flux_param_dict, f6b_influx, param, np.exp(log_point[2]))
+    state_jacobian = jacobian_flux_production(conc[0], conc[1], param_dict) * conc[np.newaxis, :]
+
+    shift = np.asarray([0., 0., rel_step])
+    param_derivative = (
+        _residual(log_point + shift, flux_param_dict, f6b_influx, param)
+        - _residual(log_point - shift, flux_param_dict, f6b_influx, param)
+    ) / (2 * rel_step)
+    return np.column_stack([state_jacobian, param_derivative])
+
+
+def _tangent(extended_jacobian, previous_tangent=None):
+    """
+    Normalised tangent of the equilibrium branch, i.e. the null vector of the 2x3 extended Jacobian
+    :param extended_jacobian: Extended Jacobian
+    :param previous_tangent: Tangent of the previous point to keep the direction of the continuation
+    :return: Tangent vector
+    """
+    tangent = np.cross(extended_jacobian[0], extended_jacobian[1])
+    tangent /= np.linalg.norm(tangent)
+    if previous_tangent is not None and tangent.dot(previous_tangent) < 0:
+        tangent = -tangent
+    return tangent
+
+
+def _test_functions(conc, flux_param_dict, f6b_influx, param, log_param):
+    """
+    Test functions for bifurcations of the equilibrium: determinant (saddle-node) and trace (Hopf)
+    of the Jacobian
+    :param conc: Concentrations of F6P and FBP
+    :param flux_param_dict: Parameter dictionary for the PFK and aldolase fluxes
+    :param f6b_influx: Influx of F6P
+    :param param: Continuation parameter
+    :param log_param: Log of the continuation parameter
+    :return: Jacobian, determinant and trace
+    """
+    param_dict, _ = set_parameter(flux_param_dict, f6b_influx, param, np.exp(log_param))
+    jacobian = jacobian_flux_production(conc[0], conc[1], param_dict)
+    return jacobian, np.linalg.det(jacobian), np.trace(jacobian)
+
+
+def continue_equilibria(
+        flux_param_dict,
+        param='f6b_influx',
+        param_range=(1e-4, 2e-2),
+        f6b_influx=0.6e-3,
+        initial_values=(1., 1e-3),
+        step_size=0.05,
+        min_step_size=1e-5,
+        max_step_size=0.2,
+        max_points=1000,
+        tol=1e-10,
+        max_iter=10
+):
+    """
+    Pseudo-arclength continuation of the equilibria of the glycolysis system. The continuation runs in
+    the log-concentrations and the log of the parameter, which makes the arclength independent of the
+    very different scales of F6P, FBP and the parameters. Hopf points (trace of the Jacobian changes sign
+    while the determinant is positive) and saddle-node points (determinant changes sign) are detected
+    along the branch
+    :param flux_param_dict: Parameter dictionary for the PFK and aldolase fluxes
+    :param param: Continuation parameter. Either 'f6b_influx' or a tuple of enzyme and parameter name,
+            e.g. ('pfk', 'limiting_rate')
+    :param param_range: Lower and upper bound of the continuation parameter. The continuation starts at the
+            lower bound and ends with the last point on a bound
+    :param f6b_influx: Influx of F6P if it is not the continuation parameter
+    :param initial_values: Initial guess for the first equilibrium
+    :param step_size: Initial arclength step size
+    :param min_step_size: Minimal arclength step size. The continuation stops if the step size falls below
+    :param max_step_size: Maximal arclength step size
+    :param max_points: Maximal number of points on the branch
+    :param tol: Tolerance of the Newton corrector
+    :param max_iter: Maximal number of Newton iterations of the corrector
+    :return: Dictionary with the parameter values, concentrations, eigenvalues and stability of the branch
+            and a list of the detected bifurcation points
+    """
+    param_dict, influx = set_parameter(flux_param_dict, f6b_influx, param, param_range[0])
+    conc, converged, _ = solve_steady_state(param_dict, f6b_influx=influx, initial_values=initial_values)
+    if not np.all(converged):
+        raise ValueError('No equilibrium found at the start of the parameter range')
+
+    log_bounds = np.log(param_range)
+    point = np.append(np.log(conc), log_bounds[0])
+    tangent = _tangent(_extended_jacobian(point, flux_param_dict, f6b_influx, param))
+    if tangent[2] < 0:
+        tangent = -tangent
+
+    jacobian, determinant, trace = _test_functions(conc, flux_param_dict, f6b_influx, param, point[2])
+    branch = {'param': [param_range[0]], 'conc': [conc], 'eigenvalues': [np.linalg.eigvals(jacobian)]}
+    bifurcations = []
+
+    while len(branch['param']) < max_points and log_bounds[0] <= point[2] <= log_bounds[1]:
+        prediction = point + step_size * tangent
+        corrected = prediction.copy()
+        success = False
+        for num_iter in range(max_iter):
+            residual = np.append(
+                _residual(corrected, flux_param_dict, f6b_influx, param),
+                tangent.dot(corrected - prediction)
+            )
+            system = np.vstack([_extended_jacobian(corrected, flux_param_dict, f6b_influx, param), tangent])
+            try:
+                update = np.linalg.solve(system, residual)
+            except np.linalg.LinAlgError:
+                break
+            corrected -= update
+            if np.abs(update).max() < tol:
+                success = True
+                break
+
+        if not success:
+            step_size /= 2.
+            if step_size < min_step_size:
+                break
+            continue
+
+        at_bound = not log_bounds[0] <= corrected[2] <= log_bounds[1]
+        if at_bound:
+            corrected = _point_at_bound(point, corrected, log_bounds, flux_param_dict, f6b_influx, param)
+            if corrected is None:
+                break
+
+        new_conc = np.exp(corrected[:2])
+        new_jacobian, new_determinant, new_trace = _test_functions(
+            new_conc,
+            flux_param_dict,
+            f6b_influx,
+            param,
+            corrected[2]
+        )
+        new_tangent = _tangent(_extended_jacobian(corrected, flux_param_dict, f6b_influx, param), tangent)
+
+        if np.sign(new_determinant) != np.sign(determinant) or np.sign(new_tangent[2]) != np.sign(tangent[2]):
+            weight = determinant / (determinant - new_determinant)
+            bifurcations.append(_bifurcation_point('LP', point, corrected, weight))
+        elif np.sign(new_trace) != np.sign(trace) and new_determinant > 0 and determinant > 0:
+            weight = trace / (trace - new_trace)
+            hopf = _bifurcation_point('HB', point, corrected, weight)
+            hopf['frequency'] = np.sqrt((1 - weight) * determinant + weight * new_determinant)
+            bifurcations.append(hopf)
+
+        point, tangent = corrected, new_tangent
+        determinant, trace = new_determinant, new_trace
+        branch['param'].append(np.exp(point[2]))
+        branch['conc'].append(new_conc)
+        branch['eigenvalues'].append(np.linalg.eigvals(new_jacobian))
+
+        if at_bound:
+            break
+        if num_iter <= 2:
+            step_size = min(1.5 * step_size, max_step_size)
+
+    branch = {key: np.asarray(value) for key, value in branch.items()}
+    branch['stable'] = np.all(branch['eigenvalues'].real < 0, axis=-1)
+    return branch, bifurcations
+
+
+def _point_at_bound(point, next_point, log_bounds, flux_param_dict, f6b_influx, param):
+    """
+    Equilibrium at the bound of the parameter range that the branch crosses between two points. The
+    crossing is interpolated linearly and corrected with Newton's method at the fixed parameter value
+    :param point: Point in the extended log-space inside of the parameter range
+    :param next_point: Point in the extended log-space outside of the parameter range
+    :param log_bounds: Log of the lower and upper bound of the continuation parameter
+    :param flux_param_dict: Parameter dictionary for the PFK and aldolase fluxes
+    :param f6b_influx: Influx of F6P
+    :param param: Continuation parameter
+    :return: Point in the extended log-space on the bound, or None if the correction did not converge
+    """
+    bound = log_bounds[1] if next_point[2] > log_bounds[1] else log_bounds[0]
+    weight = (bound - point[2]) / (next_point[2] - point[2])
+    crossing = (1 - weight) * point + weight * next_point
+    param_dict, influx = set_parameter(flux_param_dict, f6b_influx, param, np.exp(bound))
+    conc, converged, _ = solve_steady_state(param_dict, f6b_influx=influx, initial_values=np.exp(crossing[:2]))
+    if not np.all(converged):
+        return None
+    return np.append(np.log(conc), bound)
+
+
+def _bifurcation_point(kind, point, next_point, weight):
+    """
+    Linear interpolation of a bifurcation point between two points of the branch
+    :param kind: Type of the bifurcation ('HB' for Hopf, 'LP' for saddle-node/limit point)
+    :param point: Point in the extended log-space before the bifurcation
+    :param next_point: Point in the extended log-space after the bifurcation
+    :param weight: Interpolation weight
+    :return: Dictionary describing the bifurcation
+    """
+    log_point = (1 - weight) * point + weight * next_point
+    return {'type': kind, 'param': np.exp(log_point[2]), 'conc': np.exp(log_point[:2])}
+
+
+def poincare_return(fbp_conc, section_value, flux_param_dict, f6b_influx, max_time=1e4, rtol=1e-10, atol=1e-14):
+    """
+    Return map on the Poincare section where F6P equals the given value and decreases. The orbit starts
+    on the section with the given FBP concentration and is integrated until it crosses the section again
+    in the same direction. To avoid that the event is triggered at the start, the orbit is first integrated
+    to the opposite crossing and then back to the section
+    :param fbp_conc: FBP concentration on the section
+    :param section_value: F6P concentration that defines the section (usually the equilibrium value)
+    :param flux_param_dict: Parameter dictionary for the PFK and aldolase fluxes
+    :param f6b_influx: Influx of F6P
+    :param max_time: Maximal return time
+    :param rtol: Relative tolerance of the solver
+    :param atol: Absolute tolerance of the solver
+    :return: FBP concentration at the return, return time and the trajectory over one return, or None if
+            the orbit did not return within the maximal time
+    """
+    def concentrations(time, conc):
+        return flux_production(conc[0], conc[1], flux_param_dict, f6b_influx=f6b_influx)
+
+    def section(time, conc):
+        return conc[0] - section_value
+    section.terminal = True
+
+    start, time, trajectory = [section_value, fbp_conc], 0., []
+    for direction in [1, -1]:
+        section.direction = direction
+        solution = solve_ivp(
+            concentrations,
+            (0., max_time - time),
+            start,
+            method='LSODA',
+            events=section,
+            rtol=rtol,
+            atol=atol
+        )
+        if solution.status != 1:
+            return None
+        start = solution.y_events[0][0]
+        time += solution.t_events[0][0]
+        trajectory.append(solution.y)
+
+    return start[1], time, np.concatenate(trajectory, axis=1)
+
+
+def _displacement(log_offset, equilibrium, flux_param_dict, f6b_influx):
+    """
+    Displacement of the Poincare return map in the log of the FBP offset from the equilibrium
+    :param log_offset: Log of the FBP offset from the equilibrium on the section
+    :param equilibrium: Equilibrium concentrations
+    :param flux_param_dict: Parameter dictionary for the PFK and aldolase fluxes
+    :param f6b_influx: Influx of F6P
+    :return: Displacement (NaN if the orbit does not return)
+    """
+    offset = np.exp(log_offset)
+    result = poincare_return(equilibrium[1] + offset, equilibrium[0], flux_param_dict, f6b_influx)
+    if result is None or result[0] <= equilibrium[1]:
+        return np.nan
+    return np.log(result[0] - equilibrium[1]) - log_offset
+
+
+def _periodic_orbit(log_offset, equilibrium, flux_param_dict, f6b_influx, rel_step=1e-6):
+    """
+    Properties of the periodic orbit that passes the section at the given offset from the equilibrium
+    :param log_offset: Log of the FBP offset from the equilibrium on the section
+    :param equilibrium: Equilibrium concentrations
+    :param flux_param_dict: Parameter dictionary for the PFK and aldolase fluxes
+    :param f6b_influx: Influx of F6P
+    :param rel_step: Step for the central differences of the return map
+    :return: Dictionary with period, extrema, amplitude and the nontrivial Floquet multiplier of the orbit
+    """
+    fbp_conc = equilibrium[1] + np.exp(log_offset)
+    _, period, trajectory = poincare_return(fbp_conc, equilibrium[0], flux_param_dict, f6b_influx)
+    step = rel_step * fbp_conc
+    returns = [
+        poincare_return(fbp_conc + sign * step, equilibrium[0], flux_param_dict, f6b_influx)
+        for sign in [1., -1.]
+    ]
+    # The derivative of the return map is the nontrivial Floquet multiplier
+    if returns[0] is None or returns[1] is None:
+        multiplier = np.nan
+    else:
+        multiplier = (returns[0][0] - returns[1][0]) / (2 * step)
+    return {
+        'log_offset': log_offset,
+        'period': period,
+        'minimum': trajectory.min(axis=1),
+        'maximum': trajectory.max(axis=1),
+        'amplitude': (trajectory.max(axis=1) - trajectory.min(axis=1)) / 2.,
+        'floquet_multiplier': multiplier
+    }
+
+
+def find_periodic_orbits(
+        flux_param_dict,
+        f6b_influx,
+        equilibrium,
+        offset_range=(1e-4, 1e3),
+        num_samples=30
+):
+    """
+    Finds all periodic orbits around an equilibrium as roots of the displacement of the Poincare return map.
+    The FBP offsets from the equilibrium on the section are scanned logarithmically and every sign change
+    of the displacement is refined with Brent's method
+    :param flux_param_dict: Parameter dictionary for the PFK and aldolase fluxes
+    :param f6b_influx: Influx of F6P
+    :param equilibrium: Equilibrium concentrations
+    :param offset_range: Range of the FBP offsets relative to the equilibrium FBP concentration
+    :param num_samples: Number of scanned offsets
+    :return: List of dictionaries describing the periodic orbits, sorted by amplitude
+    """
+    log_offsets = np.log(equilibrium[1]) + np.linspace(np.log(offset_range[0]), np.log(offset_range[1]), num_samples)
+    displacements = [_displacement(value, equilibrium, flux_param_dict, f6b_influx) for value in log_offsets]
+    return _refine_roots(log_offsets, displacements, equilibrium, flux_param_dict, f6b_influx)
+
+
+def _refine_roots(log_offsets, displacements, equilibrium, flux_param_dict, f6b_influx):
+    """
+    Refines the roots of the displacement between sampled offsets with a sign change
+    :param log_offsets: Sampled log-offsets
+    :param displacements: Displacements at the sampled log-offsets
+    :param equilibrium: Equilibrium concentrations
+    :param flux_param_dict: Parameter dictionary for the PFK and aldolase fluxes
+    :param f6b_influx: Influx of F6P
+    :return: List of dictionaries describing the periodic orbits
+    """
+    orbits = []
+    for lower, upper, d_lower, d_upper in zip(log_offsets[:-1], log_offsets[1:], displacements[:-1], displacements[1:]):
+        if not np.isfinite(d_lower) or not np.isfinite(d_upper) or np.sign(d_lower) == np.sign(d_upper):
+            continue
+        root = brentq(_displacement, lower, upper, args=(equilibrium, flux_param_dict, f6b_influx), xtol=1e-10)
+        orbits.append(_periodic_orbit(root, equilibrium, flux_param_dict, f6b_influx))
+    return orbits
+
+
+def continue_periodic_orbits(
+        flux_param_dict,
+        hopf_point,
+        param='f6b_influx',
+        param_range=(1e-4, 2e-2),
+        f6b_influx=0.6e-3,
+        step_size=0.01,
+        min_step_size=1e-4,
+        max_step_size=0.1,
+        bracket_width=0.5,
+        max_period_change=0.2,
+        max_orbits=200
+):
+    """
+    Switches at a Hopf point to the branch of periodic orbits and follows it in the continuation parameter.
+    Close to the Hopf point, both sides are searched for the orbit with the smallest amplitude, which
+    determines whether the bifurcation is super- or subcritical. Afterwards the orbit is tracked with a
+    local root search of the Poincare return map around the offset of the previous orbit, while the log
+    of the parameter is stepped with an adaptive step size. The tracking stops at a fold of the orbit branch
+    :param flux_param_dict: Parameter dictionary for the PFK and aldolase fluxes
+    :param hopf_point: Hopf point as returned by continue_equilibria
+    :param param: Continuation parameter
+    :param param_range: Lower and upper bound of the continuation parameter
+    :param f6b_influx: Influx of F6P if it is not the continuation parameter
+    :param step_size: Initial step size in the log of the parameter
+    :param min_step_size: Minimal step size. The continuation stops if the step size falls below
+    :param max_step_size: Maximal step size
+    :param bracket_width: Half width of the bracket in the log-offset for the local root search
+    :param max_period_change: Maximal relative change of the period between two successive orbits. Larger
+            changes indicate a jump to another branch and are rejected
+    :param max_orbits: Maximal number of orbits on the branch
+    :return: Dictionary with the parameter values, periods, extrema, amplitudes and Floquet multipliers of
+            the orbits
+    """
+    log_bounds = np.log(param_range)
+    log_param = np.log(hopf_point['param'])
+    equilibrium = hopf_point['conc']
+
+    first_orbit, side = None, 1.
+    for sign in [1., -1.]:
+        param_dict, influx = set_parameter(flux_param_dict, f6b_influx, param, np.exp(log_param + sign * step_size))
+        side_equilibrium, _, _ = solve_steady_state(param_dict, f6b_influx=influx, initial_values=equilibrium)
+        side_orbits = find_periodic_orbits(param_dict, influx, side_equilibrium)
+        if side_orbits and (first_orbit is None or side_orbits[0]['log_offset'] < first_orbit['log_offset']):
+            first_orbit, side = side_orbits[0], sign
+
+    orbits = {'param': [], 'period': [], 'minimum': [], 'maximum': [], 'amplitude': [], 'floquet_multiplier': []}
+    if first_orbit is None:
+        return {key: np.asarray(value) for key, value in orbits.items()}
+
+    orbit = first_orbit
+    log_param += side * step_size
+    while True:
+        orbits['param'].append(np.exp(log_param))
+        for key in ['period', 'minimum', 'maximum', 'amplitude', 'floquet_multiplier']:
+            orbits[key].append(orbit[key])
+        if len(orbits['param']) >= max_orbits:
+            break
+
+        while True:
+            new_log_param = log_param + side * step_size
+            if not log_bounds[0] <= new_log_param <= log_bounds[1]:
+                break
+            param_dict, influx = set_parameter(flux_param_dict, f6b_influx, param, np.exp(new_log_param))
+            equilibrium, _, _ = solve_steady_state(param_dict, f6b_influx=influx, initial_values=equilibrium)
+            log_offsets = orbit['log_offset'] + bracket_width * np.asarray([-1., 0., 1.])
+            displacements = [_displacement(value, equilibrium, param_dict, influx) for value in log_offsets]
+            candidates = [
+                candidate for candidate in _refine_roots(log_offsets, displacements, equilibrium, param_dict, influx)
+                if abs(candidate['period'] - orbit['period']) <= max_period_change * orbit['period']
+            ]
+            if candidates:
+                break
+            step_size /= 2.
+            if step_size < min_step_size:
+                break
+
+        if not log_bounds[0] <= new_log_param <= log_bounds[1] or step_size < min_step_size:
+            break
+        orbit = min(candidates, key=lambda candidate: abs(candidate['log_offset'] - orbit['log_offset']))
+        log_param = new_log_param
+        step_size = min(1.5 * step_size, max_step_size)
+
+    orbits = {key: np.asarray(value) for key, value in orbits.items()}
+    orbits['stable'] = np.abs(orbits['floquet_multiplier']) < 1
+    return orbits
@@ -98,9 +98,14 @@ def flux(
 
 def flux_production(f6p_conc, fbp_conc, flux_param_dict, f6b_influx=0.6e-3, stoichiometric_matrix=None):
     """
-    Computes the change in concentration over time
-    :param fluxes: Fluxes for F6P and FBP
-    :return:
+    Computes the change in concentration over time. Concentrations, influx and parameters can be arrays,
+    in which case the result is broadcast along the trailing axes
+    :param f6p_conc: Concentration of F6P
+    :param fbp_conc: Concentration of FBP
+    :param flux_param_dict: Parameter dictionary for the PFK and aldolase fluxes
+    :param f6b_influx: Influx of F6P
+    :param stoichiometric_matrix: Stoichiometric matrix. If None, the default matrix is used
+    :return: Change in concentration of F6P and FBP with shape (2, ...)
     """
     pfk_param = flux_param_dict['pfk']
     pfk_flux = flux(
@@ -126,10 +131,179 @@ def flux_production(f6p_conc, fbp_conc, flux_param_dict, f6b_influx=0.6e-3, stoi
         use_modulator=False
     )
 
-    fluxes = np.asarray([f6b_influx, pfk_flux, aldolase_flux])
+    fluxes = np.stack(np.broadcast_arrays(f6b_influx, pfk_flux, aldolase_flux))
     if stoichiometric_matrix is None:
         stoichiometric_matrix = STOICHIOMETRIC_MATRIX
 
-    return stoichiometric_matrix.dot(fluxes)
+    return np.tensordot(stoichiometric_matrix, fluxes, axes=1)
 
 
+def modulator_derivative(modul_conc, cooperativity=2.5, effect=1/(0.1**2.5), dissociation_const=3e-3):
+    """
+    Derivative of the modulator function with respect to the modulator concentration
+    :param modul_conc: Modulator concentration
+    :param cooperativity: Cooperativity which is described by the Hill coefficient
+    :param effect: Effect the modulator has on the enzyme
+    :param dissociation_const: Dissociation constant
+    :return: Derivative of the modulator term
+    """
+    xi_value = xi(modul_conc, dissociation_const)
+    xi_pow = xi_value**cooperativity
+    d_xi_pow = cooperativity * xi_value**(cooperativity - 1) / float(dissociation_const)
+    return (1 - effect) * d_xi_pow / (1 + effect * xi_pow)**2
+
+
+def flux_derivative(
+        subs_conc,
+        modul_conc,
+        limiting_rate=100/float(180),
+        michaelis_const=8.,
+        cooperativity=2.5,
+        effect=1/(0.1**2.5),
+        dissociation_const=3e-3,
+        use_modulator=True
+):
+    """
+    Analytic derivatives of the flux j with respect to the substrate and the modulator concentration
+    :param subs_conc: Substrate concentration
+    :param modul_conc: Modulator concentration
+    :param limiting_rate: Limiting rate
+    :param michaelis_const: Michaelis constant
+    :param cooperativity: Cooperativity which is described by the Hill coefficient
+    :param effect: Effect the modulator has on the enzyme
+    :param dissociation_const: Dissociation constant
+    :param use_modulator Flag to determine whether or not to use the modulator
+    :return: Derivative of j with respect to the substrate and derivative of j with respect to the modulator
+    """
+    sigma_value = sigma(subs_conc, michaelis_const=michaelis_const)
+    if use_modulator:
+        sigma_pow = sigma_value**cooperativity
+        d_sigma_pow = cooperativity * sigma_value**(cooperativity - 1) / float(michaelis_const)
+        modulator_value = modulator(
+            modul_conc,
+            cooperativity=cooperativity,
+            effect=effect,
+            dissociation_const=dissociation_const
+        )
+        denominator = (sigma_pow + modulator_value)**2
+        d_subs = limiting_rate * d_sigma_pow * modulator_value / denominator
+        d_modul = -limiting_rate * sigma_pow / denominator * modulator_derivative(
+            modul_conc,
+            cooperativity=cooperativity,
+            effect=effect,
+            dissociation_const=dissociation_const
+        )
+    else:
+        d_subs = limiting_rate / float(michaelis_const) / (1 + sigma_value)**2
+        d_modul = np.zeros_like(d_subs)
+
+    return d_subs, d_modul
+
+
+def jacobian_flux_production(f6p_conc, fbp_conc, flux_param_dict, stoichiometric_matrix=None):
+    """
+    Analytic Jacobian of the change in concentration with respect to the concentrations of F6P and FBP.
+    The concentrations and the parameters can be arrays, in which case the Jacobians are broadcast
+    along the leading axes
+    :param f6p_conc: Concentration of F6P
+    :param fbp_conc: Concentration of FBP
+    :param flux_param_dict: Parameter dictionary for the PFK and aldolase fluxes
+    :param stoichiometric_matrix: Stoichiometric matrix. If None, the default matrix is used
+    :return: Jacobian with shape (..., 2, 2)
+    """
+    pfk_param = flux_param_dict['pfk']
+    pfk_d_f6p, pfk_d_fbp = flux_derivative(
+        f6p_conc,
+        fbp_conc,
+        limiting_rate=pfk_param['limiting_rate'],
+        michaelis_const=pfk_param['michaelis_const'],
+        cooperativity=pfk_param['cooperativity'],
+        effect=pfk_param['effect'],
+        dissociation_const=pfk_param['dissociation_const'],
+        use_modulator=True
+    )
+
+    aldolase_param = flux_param_dict['aldolase']
+    aldolase_d_fbp, _ = flux_derivative(
+        fbp_conc,
+        None,
+        limiting_rate=aldolase_param['limiting_rate'],
+        michaelis_const=aldolase_param['michaelis_const'],
+        cooperativity=aldolase_param['cooperativity'],
+        effect=aldolase_param['effect'],
+        dissociation_const=aldolase_param['dissociation_const'],
+        use_modulator=False
+    )
+
+    pfk_d_f6p, pfk_d_fbp, aldolase_d_fbp = np.broadcast_arrays(pfk_d_f6p, pfk_d_fbp, aldolase_d_fbp)
+    zeros = np.zeros_like(pfk_d_f6p)
+    # Derivatives of the fluxes (influx, PFK, aldolase) with respect to (F6P, FBP)
+    flux_jacobian = np.stack([
+        np.stack([zeros, zeros], axis=-1),
+        np.stack([pfk_d_f6p, pfk_d_fbp], axis=-1),
+        np.stack([zeros, aldolase_d_fbp], axis=-1)
+    ], axis=-2)
+
+    if stoichiometric_matrix is None:
+        stoichiometric_matrix = STOICHIOMETRIC_MATRIX
+
+    return np.matmul(stoichiometric_matrix, flux_jacobian)
+
+
+def flux_parameter_derivatives(
+        subs_conc,
+        modul_conc,
+        limiting_rate=100/float(180),
+        michaelis_const=8.,
+        cooperativity=2.5,
+        effect=1/(0.1**2.5),
+        dissociation_const=3e-3,
+        use_modulator=True
+):
+    """
+    Analytic derivatives of the flux j with respect to its parameters
+    :param subs_conc: Substrate concentration
+    :param modul_conc: Modulator concentration
+    :param limiting_rate: Limiting rate
+    :param michaelis_const: Michaelis constant
+    :param cooperativity: Cooperativity which is described by the Hill coefficient
+    :param effect: Effect the modulator has on the enzyme
+    :param dissociation_const: Dissociation constant
+    :param use_modulator Flag to determine whether or not to use the modulator
+    :return: Dictionary with the derivatives of j with respect to the parameters. Without the modulator,
+            only limiting rate and Michaelis constant are included
+    """
+    sigma_value = sigma(subs_conc, michaelis_const=michaelis_const)
+    if not use_modulator:
+        return {
+            'limiting_rate': sigma_value / (1 + sigma_value),
+            'michaelis_const': -limiting_rate * sigma_value / float(michaelis_const) / (1 + sigma_value)**2
+        }
+
+    xi_value = xi(modul_conc, dissociation_const)
+    sigma_pow = sigma_value**cooperativity
+    xi_pow = xi_value**cooperativity
+    modulator_value = modulator(
+        modul_conc,
+        cooperativity=cooperativity,
+        effect=effect,
+        dissociation_const=dissociation_const
+    )
+    denominator = sigma_pow + modulator_value
+
+    d_sigma_pow = limiting_rate * modulator_value / denominator**2
+    d_modulator = -limiting_rate * sigma_pow / denominator**2
+    d_modulator_d_xi_pow = (1 - effect) / (1 + effect * xi_pow)**2
+    with np.errstate(divide='ignore', invalid='ignore'):
+        log_sigma = np.where(sigma_value > 0, np.log(sigma_value), 0.)
+        log_xi = np.where(xi_value > 0, np.log(xi_value), 0.)
+
+    return {
+        'limiting_rate': sigma_pow / denominator,
+        'michaelis_const': d_sigma_pow * (-cooperativity * sigma_pow / float(michaelis_const)),
+        'cooperativity': d_sigma_pow * sigma_pow * log_sigma
+        + d_modulator * d_modulator_d_xi_pow * xi_pow * log_xi,
+        'effect': d_modulator * (-(1 + xi_pow) * xi_pow / (1 + effect * xi_pow)**2),
+        'dissociation_const': d_modulator * d_modulator_d_xi_pow * (
+                -cooperativity * xi_pow / float(dissociation_const))
+    }
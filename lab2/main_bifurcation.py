@@ -0,0 +1,62 @@
+from continuation import *
+import matplotlib.pyplot as plt
+import numpy as np
+
+
+VERBOSITY = 0
+
+
+def main():
+    flux_param_dict = {
+        'pfk': {
+            'limiting_rate': 100 / float(180),
+            'michaelis_const': 8.,
+            'cooperativity': 2.5,
+            'effect': 1 / (0.1 ** 2.5),
+            'dissociation_const': 3e-3
+        },
+        'aldolase': {
+            'limiting_rate': 60e-3,
+            'michaelis_const': 10e-3,
+            'cooperativity': 1,
+            'effect': None,
+            'dissociation_const': None
+        }
+    }
+
+    param_range = (1e-4, 2e-2)
+    branch, bifurcations = continue_equilibria(flux_param_dict, param='f6b_influx', param_range=param_range)
+    for point in bifurcations:
+        print(point['type'], 'at influx', point['param'], 'with concentrations', point['conc'])
+
+    stable_f6p = np.where(branch['stable'], branch['conc'][:, 0], np.nan)
+    unstable_f6p = np.where(branch['stable'], np.nan, branch['conc'][:, 0])
+    plt.plot(branch['param'], stable_f6p, 'b-', label='Stable equilibrium')
+    plt.plot(branch['param'], unstable_f6p, 'b--', label='Unstable equilibrium')
+
+    for point in bifurcations:
+        plt.plot(point['param'], point['conc'][0], 'ro' if point['type'] == 'HB' else 'ks')
+        if point['type'] != 'HB':
+            continue
+        orbits = continue_periodic_orbits(flux_param_dict, point, param='f6b_influx', param_range=param_range)
+        if VERBOSITY > 0:
+            print('Periods', orbits['period'])
+        if not orbits['param'].size:
+            continue
+        style = np.where(orbits['stable'], 'g.', 'm.')
+        for param, minimum, maximum, marker in zip(orbits['param'], orbits['minimum'], orbits['maximum'], style):
+            plt.plot([param, param], [minimum[0], maximum[0]], marker)
+
+    plt.plot([], [], 'g.', label='Stable periodic orbit (extrema)')
+    plt.plot([], [], 'm.', label='Unstable periodic orbit (extrema)')
+    plt.plot([], [], 'ro', label='Hopf bifurcation')
+    plt.xscale('log')
+    plt.legend(loc='upper right')
+    plt.title('Bifurcation diagram of the glycolysis system over the influx')
+    plt.xlabel('Influx F6P')
+    plt.ylabel('Concentration F6P')
+    plt.show()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,42 @@
+from sensitivity import *
+import matplotlib.pyplot as plt
+import numpy as np
+
+
+def main():
+    flux_param_dict = {
+        'pfk': {
+            'limiting_rate': 100 / float(180),
+            'michaelis_const': 8.,
+            'cooperativity': 2.5,
+            'effect': 1 / (0.1 ** 2.5),
+            'dissociation_const': 3e-3
+        },
+        'aldolase': {
+            'limiting_rate': 60e-3,
+            'michaelis_const': 10e-3,
+            'cooperativity': 1,
+            'effect': None,
+            'dissociation_const': None
+        }
+    }
+
+    result = oscillation_sensitivities(flux_param_dict, [1., 1e-3], time=1000, f6b_influx=6e-3)
+    print('Period', result['period'], 'Amplitude', result['amplitude'])
+    names = [name for _, name in PFK_PARAMETERS]
+    for name, rel_period, rel_amplitude in zip(names, result['rel_period'], result['rel_amplitude'].T):
+        print(name, 'relative sensitivity period', rel_period, 'amplitude', rel_amplitude)
+
+    positions = np.arange(len(names))
+    plt.bar(positions - 0.25, result['rel_period'], width=0.25, label='Period')
+    plt.bar(positions, result['rel_amplitude'][0], width=0.25, label='Amplitude F6P')
+    plt.bar(positions + 0.25, result['rel_amplitude'][1], width=0.25, label='Amplitude FBP')
+    plt.xticks(positions, names)
+    plt.legend(loc='upper right')
+    plt.title('Relative sensitivities of the oscillation to the PFK parameters')
+    plt.ylabel('p / y * dy/dp')
+    plt.show()
+
+
+if __name__ == '__main__':
+    main()
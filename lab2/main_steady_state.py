@@ -0,0 +1,52 @@
+from steady_state import *
+import matplotlib.pyplot as plt
+import numpy as np
+
+
+def main():
+    influx_range = np.linspace(1e-4, 2e-2, 200)
+    limiting_rate_range = np.linspace(0.2, 1., 200)
+
+    flux_param_dict = {
+        'pfk': {
+            'limiting_rate': limiting_rate_range[np.newaxis, :],
+            'michaelis_const': 8.,
+            'cooperativity': 2.5,
+            'effect': 1 / (0.1 ** 2.5),
+            'dissociation_const': 3e-3
+        },
+        'aldolase': {
+            'limiting_rate': 60e-3,
+            'michaelis_const': 10e-3,
+            'cooperativity': 1,
+            'effect': None,
+            'dissociation_const': None
+        }
+    }
+
+    result = steady_state_stability(flux_param_dict, f6b_influx=influx_range[:, np.newaxis])
+    print('Newton iterations', result['iterations'], 'converged', result['converged'].mean())
+
+    class_index = (result['stability'][..., np.newaxis] == STABILITY_CLASSES).argmax(axis=-1)
+    class_index = np.where(result['converged'], class_index, -1)
+
+    plt.imshow(
+        class_index,
+        origin='lower',
+        aspect='auto',
+        extent=[limiting_rate_range[0], limiting_rate_range[-1], influx_range[0], influx_range[-1]],
+        cmap='tab10',
+        vmin=-1,
+        vmax=9
+    )
+    for num, name in enumerate(STABILITY_CLASSES):
+        plt.plot([], [], 's', color=plt.get_cmap('tab10')((num + 1) / 10.), label=name)
+    plt.legend(loc='upper right')
+    plt.title('Stability of the equilibria of the glycolysis system')
+    plt.xlabel('Limiting rate PFK')
+    plt.ylabel('Influx F6P')
+    plt.show()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+from scipy.integrate import ode
+from lab2 import flux_production
+from stochastic import *
+import matplotlib.pyplot as plt
+import numpy as np
+
+
+def main():
+    flux_param_dict = {
+        'pfk': {
+            'limiting_rate': 100 / float(180),
+            'michaelis_const': 8.,
+            'cooperativity': 2.5,
+            'effect': 1 / (0.1 ** 2.5),
+            'dissociation_const': 3e-3
+        },
+        'aldolase': {
+            'limiting_rate': 60e-3,
+            'michaelis_const': 10e-3,
+            'cooperativity': 1,
+            'effect': None,
+            'dissociation_const': None
+        }
+    }
+    f6b_influx = 6e-3
+    initial_values = [1., 1e-3]
+    time = 500
+    sample_times = np.arange(0, time, 1.)
+
+    # Femtolitre compartment, i.e. roughly 6e5 molecules per mM
+    system_size = volume_to_system_size(1e-15)
+    stochastic_conc = simulate_stochastic(
+        flux_param_dict,
+        initial_values,
+        system_size,
+        sample_times,
+        f6b_influx=f6b_influx,
+        num_realizations=20,
+        method='tau_leaping'
+    )
+
+    def concentrations(time, conc):
+        return flux_production(conc[0], conc[1], flux_param_dict=flux_param_dict, f6b_influx=f6b_influx)
+
+    ode_simulation = ode(concentrations).set_integrator('vode', method='bdf', order=15)\
+        .set_initial_value(initial_values)
+    deterministic_conc = [initial_values]
+    for _ in sample_times[1:]:
+        ode_simulation.integrate(ode_simulation.t + 1)
+        deterministic_conc.append(ode_simulation.y)
+    deterministic_conc = np.asarray(deterministic_conc)
+
+    for realization in stochastic_conc[:5]:
+        plt.plot(sample_times, realization[:, 0], 'c-', alpha=0.5)
+    plt.plot(sample_times, stochastic_conc[:, :, 0].mean(axis=0), 'b-', label='F6P stochastic mean')
+    plt.plot(sample_times, deterministic_conc[:, 0], 'm--', label='F6P deterministic')
+    plt.legend(loc='upper right')
+    plt.title('Stochastic and deterministic concentration of F6P over time')
+    plt.xlabel('Time')
+    plt.ylabel('Concentration')
+    plt.show()
+
+
+if __name__ == '__main__':
+    main()
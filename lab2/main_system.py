@@ -1,5 +1,6 @@
 from scipy.integrate import ode
 from lab2 import *
+from oscillation import integrate_until_settled
 import matplotlib.pyplot as plt
 import numpy as np
 
@@ -32,13 +33,22 @@ def main():
         return flux_production(conc[0], conc[1], flux_param_dict=flux_param_dict, f6b_influx=6e-3)
 
     initial_values = [1., 1e-3]
+    stop_times = []
+    for influx in [0.6e-3, 6e-3]:
+        analyzer, _, _ = integrate_until_settled(flux_param_dict, initial_values, f6b_influx=influx)
+        print('Influx', influx, ':', analyzer.state, 'detected at time', analyzer.time)
+        if analyzer.state == 'limit_cycle':
+            print('Period', analyzer.period, 'Amplitude', analyzer.amplitude, 'Phase', analyzer.phase)
+        # The plotted runs end once the system has settled
+        stop_times.append(int(np.ceil(analyzer.time)))
+    time, time_influx = stop_times
+
     ode_simulation = ode(concentrations).set_integrator('vode', method='bdf', order=15)\
         .set_initial_value(initial_values)
 
     ode_simulation_influx = ode(concentrations_f6p_influx).set_integrator('vode', method='bdf', order=15) \
         .set_initial_value(initial_values)
 
-    time = 2000
     f6p_conc = []
     fbp_conc = []
 
@@ -52,7 +62,7 @@ def main():
         if VERBOSITY > 0:
             print('Result for time', ode_simulation.t, ':', ode_simulation.y)
 
-    for _ in range(time):
+    for _ in range(time_influx):
         ode_simulation_influx.integrate(ode_simulation_influx.t + 1)
         f6p_conc_influx.append(ode_simulation_influx.y[0])
         fbp_conc_influx.append(ode_simulation_influx.y[1])
@@ -61,10 +71,11 @@ def main():
             print('Result for time', ode_simulation_influx.t, ':', ode_simulation_influx.y)
 
     time_range = np.arange(0, time, 1)
+    time_range_influx = np.arange(0, time_influx, 1)
     plt.plot(time_range, f6p_conc, 'b-', label='F6P concentration low influx')
     plt.plot(time_range, fbp_conc, 'g-', label='FBP concentration low influx')
-    plt.plot(time_range, f6p_conc_influx, 'm--', label='F6P concentration high influx')
-    plt.plot(time_range, fbp_conc_influx, 'c--', label='FBP concentration high influx')
+    plt.plot(time_range_influx, f6p_conc_influx, 'm--', label='F6P concentration high influx')
+    plt.plot(time_range_influx, fbp_conc_influx, 'c--', label='FBP concentration high influx')
     plt.legend(loc='upper right')
     plt.title('Concentration of F6P and FBP over time')
     plt.xlabel('Time')
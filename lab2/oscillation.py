@@ -0,0 +1,161 @@
+import numpy as np
+from scipy.integrate import LSODA
+from lab2 import flux_production
+
+
+class OscillationAnalyzer:
+    """
+    Online analyzer that watches a trajectory of the glycolysis system and detects when it has settled
+    into a stable limit cycle or a fixed point. The Poincare section is given by the maxima of the
+    observed species, i.e. the points where its time derivative changes sign from positive to negative.
+    """
+    def __init__(
+            self,
+            section_species=0,
+            rel_tol=1e-3,
+            fixed_point_tol=1e-9,
+            num_confirm=3
+    ):
+        """
+        Constructor
+        :param section_species: Index of the species that defines the Poincare section (0: F6P, 1: FBP)
+        :param rel_tol: Relative tolerance for successive periods and amplitudes to be considered equal
+        :param fixed_point_tol: Upper bound of the norm of the time derivative to detect a fixed point
+        :param num_confirm: Number of successive matching cycles that are needed to confirm a limit cycle
+        """
+        self.section_species = section_species
+        self.rel_tol = rel_tol
+        self.fixed_point_tol = fixed_point_tol
+        self.num_confirm = num_confirm
+
+        self.state = 'undetermined'
+        self.section_times = []
+        self.amplitudes = []
+        self.period = None
+        self.amplitude = None
+        self.phase = None
+        self.time = None
+        self.conc = None
+
+        self._prev_time = None
+        self._prev_d_conc = None
+        self._cycle_min = None
+        self._cycle_max = None
+
+    def _section_crossing(self, time, conc, d_conc):
+        """
+        Linear interpolation of the time at which the Poincare section was crossed between the previous
+        and the current sample
+        :param time: Current time
+        :param conc: Current concentrations
+        :param d_conc: Current time derivative of the concentrations
+        :return: Crossing time or None if the section was not crossed
+        """
+        prev_d = self._prev_d_conc[self.section_species]
+        curr_d = d_conc[self.section_species]
+        if not (prev_d > 0 >= curr_d):
+            return None
+        weight = prev_d / (prev_d - curr_d)
+        return self._prev_time + weight * (time - self._prev_time)
+
+    def _is_close(self, values):
+        """
+        Checks whether the last num_confirm values agree within the relative tolerance
+        :param values: List of values (scalars or arrays)
+        :return: True if the values match, False otherwise
+        """
+        if len(values) < self.num_confirm:
+            return False
+        recent = np.asarray(values[-self.num_confirm:])
+        scale = np.maximum(np.abs(recent).max(axis=0), np.finfo(float).tiny)
+        return np.all((recent.max(axis=0) - recent.min(axis=0)) / scale <= self.rel_tol)
+
+    def update(self, time, conc, d_conc):
+        """
+        Feeds a new sample of the trajectory to the analyzer
+        :param time: Time of the sample
+        :param conc: Concentrations of F6P and FBP
+        :param d_conc: Time derivative of the concentrations
+        :return: True if a limit cycle or a fixed point has been detected, False otherwise
+        """
+        conc = np.asarray(conc, dtype=float)
+        d_conc = np.asarray(d_conc, dtype=float)
+        self.time = time
+        self.conc = conc.copy()
+
+        if np.linalg.norm(d_conc) <= self.fixed_point_tol:
+            self.state = 'fixed_point'
+            self.period = None
+            self.amplitude = np.zeros_like(conc)
+            self.phase = None
+            return True
+
+        if self._prev_time is not None:
+            crossing = self._section_crossing(time, conc, d_conc)
+            if crossing is not None:
+                if self._cycle_min is not None and self.section_times:
+                    self.amplitudes.append((self._cycle_max - self._cycle_min) / 2.)
+                self.section_times.append(crossing)
+                self._cycle_min = conc.copy()
+                self._cycle_max = conc.copy()
+
+        if self._cycle_min is not None:
+            self._cycle_min = np.minimum(self._cycle_min, conc)
+            self._cycle_max = np.maximum(self._cycle_max, conc)
+
+        self._prev_time = time
+        self._prev_d_conc = d_conc
+
+        periods = list(np.diff(self.section_times))
+        if self._is_close(periods) and self._is_close(self.amplitudes):
+            self.state = 'limit_cycle'
+            self.period = periods[-1]
+            self.amplitude = self.amplitudes[-1]
+            self.phase = 2 * np.pi * ((time - self.section_times[-1]) % self.period) / self.period
+            return True
+
+        return False
+
+
+def integrate_until_settled(
+        flux_param_dict,
+        initial_values,
+        f6b_influx=0.6e-3,
+        max_time=10000,
+        rtol=1e-8,
+        atol=1e-12,
+        analyzer=None
+):
+    """
+    Integrates the glycolysis system until the analyzer detects a stable limit cycle or a fixed point,
+    or until the maximal time is reached. Every internal step of the adaptive solver is passed to
+    the analyzer, such that the sharp relaxation phases of the oscillation are resolved. The maximal time has
+    to cover the relaxation to a fixed point as well: at the default influx, the slowest relaxation time of the
+    fixed point is about 290, and the time derivative falls below the fixed point tolerance only at t ~ 4460
+    :param flux_param_dict: Parameter dictionary for the PFK and aldolase fluxes
+    :param initial_values: Initial concentrations of F6P and FBP
+    :param f6b_influx: Influx of F6P
+    :param max_time: Maximal integration time
+    :param rtol: Relative tolerance of the solver
+    :param atol: Absolute tolerance of the solver
+    :param analyzer: Oscillation analyzer. If None, an analyzer with default settings is used
+    :return: The analyzer (holding state, period, amplitude and phase), the time points and the trajectory
+    """
+    if analyzer is None:
+        analyzer = OscillationAnalyzer()
+
+    def concentrations(time, conc):
+        return flux_production(conc[0], conc[1], flux_param_dict=flux_param_dict, f6b_influx=f6b_influx)
+
+    solver = LSODA(concentrations, 0., initial_values, max_time, rtol=rtol, atol=atol)
+
+    time_points = [0.]
+    trajectory = [np.asarray(initial_values, dtype=float)]
+    while solver.status == 'running':
+        solver.step()
+        time_points.append(solver.t)
+        trajectory.append(solver.y.copy())
+        if analyzer.update(solver.t, solver.y, concentrations(solver.t, solver.y)):
+            break
+
+    return analyzer, np.asarray(time_points), np.asarray(trajectory)
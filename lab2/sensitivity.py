@@ -0,0 +1,202 @@
+import numpy as np
+from scipy.integrate import solve_ivp
+from scipy.optimize import brentq
+from lab2 import (
+    flux_production,
+    jacobian_flux_production,
+    flux_parameter_derivatives,
+    STOICHIOMETRIC_MATRIX
+)
+
+
+PFK_PARAMETERS = [
+    ('pfk', 'limiting_rate'),
+    ('pfk', 'michaelis_const'),
+    ('pfk', 'cooperativity'),
+    ('pfk', 'effect'),
+    ('pfk', 'dissociation_const')
+]
+
+
+def parameter_jacobian(f6p_conc, fbp_conc, flux_param_dict, params=None, stoichiometric_matrix=None):
+    """
+    Analytic derivative of the change in concentration with respect to the parameters
+    :param f6p_conc: Concentration of F6P
+    :param fbp_conc: Concentration of FBP
+    :param flux_param_dict: Parameter dictionary for the PFK and aldolase fluxes
+    :param params: List of parameters. Each parameter is either 'f6b_influx' or a tuple of enzyme and
+            parameter name. If None, the PFK parameters are used
+    :param stoichiometric_matrix: Stoichiometric matrix. If None, the default matrix is used
+    :return: Derivatives with shape (2, number of parameters)
+    """
+    if params is None:
+        params = PFK_PARAMETERS
+    if stoichiometric_matrix is None:
+        stoichiometric_matrix = STOICHIOMETRIC_MATRIX
+
+    pfk_param = flux_param_dict['pfk']
+    aldolase_param = flux_param_dict['aldolase']
+    derivatives = {
+        'pfk': flux_parameter_derivatives(f6p_conc, fbp_conc, use_modulator=True, **pfk_param),
+        'aldolase': flux_parameter_derivatives(fbp_conc, None, use_modulator=False, **aldolase_param)
+    }
+
+    columns = []
+    for param in params:
+        # Derivatives of the fluxes (influx, PFK, aldolase) with respect to the parameter
+        if param == 'f6b_influx':
+            flux_derivative = [1., 0., 0.]
+        elif param[0] == 'pfk':
+            flux_derivative = [0., derivatives['pfk'][param[1]], 0.]
+        else:
+            flux_derivative = [0., 0., derivatives['aldolase'][param[1]]]
+        columns.append(stoichiometric_matrix.dot(flux_derivative))
+    return np.column_stack(columns)
+
+
+def integrate_sensitivities(
+        flux_param_dict,
+        initial_values,
+        time,
+        params=None,
+        f6b_influx=0.6e-3,
+        rtol=1e-8,
+        atol=1e-12
+):
+    """
+    Integrates the concentrations together with their forward sensitivities with respect to the parameters
+    in one augmented system. The sensitivities S = dc/dp obey dS/dt = J S + df/dp, where J is the analytic
+    Jacobian of the system and df/dp the analytic parameter derivative
+    :param flux_param_dict: Parameter dictionary for the PFK and aldolase fluxes
+    :param initial_values: Initial concentrations of F6P and FBP
+    :param time: Integration time
+    :param params: List of parameters. If None, the PFK parameters are used
+    :param f6b_influx: Influx of F6P
+    :param rtol: Relative tolerance of the solver
+    :param atol: Absolute tolerance of the solver
+    :return: Solution object with dense output. The state is the concentrations followed by the flattened
+            sensitivities with shape (2, number of parameters)
+    """
+    if params is None:
+        params = PFK_PARAMETERS
+    num_params = len(params)
+
+    def augmented(time, state):
+        jacobian = jacobian_flux_production(state[0], state[1], flux_param_dict)
+        sensitivity = state[2:].reshape(2, num_params)
+        return np.concatenate([
+            flux_production(state[0], state[1], flux_param_dict, f6b_influx=f6b_influx),
+            (jacobian.dot(sensitivity) + parameter_jacobian(state[0], state[1], flux_param_dict, params)).ravel()
+        ])
+
+    initial_state = np.concatenate([initial_values, np.zeros(2 * num_params)])
+    return solve_ivp(
+        augmented,
+        (0., time),
+        initial_state,
+        method='LSODA',
+        dense_output=True,
+        rtol=rtol,
+        atol=atol
+    )
+
+
+def oscillation_sensitivities(
+        flux_param_dict,
+        initial_values,
+        time=2000,
+        params=None,
+        f6b_influx=6e-3,
+        num_cycles=2,
+        samples_per_cycle=2000
+):
+    """
+    Period and amplitude of the oscillation and their derivatives with respect to the parameters, all
+    taken from a single solve of the augmented sensitivity system. The period is measured between
+    downward crossings of F6P through the middle of its range. The derivative of a crossing time t_k
+    follows from the implicit function theorem, dt_k/dp = -S_F6P(t_k) / f_F6P(t_k). At the extrema the
+    time derivative vanishes, such that the derivative of an extremum is the sensitivity at that point
+    :param flux_param_dict: Parameter dictionary for the PFK and aldolase fluxes
+    :param initial_values: Initial concentrations of F6P and FBP
+    :param time: Integration time. Needs to be long enough for the transient to decay
+    :param params: List of parameters. If None, the PFK parameters are used
+    :param f6b_influx: Influx of F6P
+    :param num_cycles: Number of cycles at the end of the trajectory that are used
+    :param samples_per_cycle: Number of samples per cycle to bracket the extrema
+    :return: Dictionary with period, amplitude, their derivatives and the normalised (logarithmic)
+            sensitivities p / T * dT/dp and p / A * dA/dp
+    """
+    if params is None:
+        params = PFK_PARAMETERS
+    num_params = len(params)
+    solution = integrate_sensitivities(flux_param_dict, initial_values, time, params=params, f6b_influx=f6b_influx)
+    if not solution.success:
+        raise RuntimeError(solution.message)
+
+    sample_times = np.linspace(time / 2., time, 50 * samples_per_cycle)
+    f6p_conc = solution.sol(sample_times)[0]
+    level = (f6p_conc.max() + f6p_conc.min()) / 2.
+    crossing_index = np.nonzero((f6p_conc[:-1] >= level) & (f6p_conc[1:] < level))[0]
+    if crossing_index.size < num_cycles + 1:
+        raise ValueError('Not enough oscillation cycles found. The system might not oscillate')
+
+    crossings = []
+    for index in crossing_index[-(num_cycles + 1):]:
+        crossing_time = brentq(lambda t: solution.sol(t)[0] - level, sample_times[index], sample_times[index + 1])
+        state = solution.sol(crossing_time)
+        change = flux_production(state[0], state[1], flux_param_dict, f6b_influx=f6b_influx)
+        crossings.append((crossing_time, -state[2:].reshape(2, num_params)[0] / change[0]))
+
+    periods = np.diff([crossing[0] for crossing in crossings])
+    d_periods = np.diff([crossing[1] for crossing in crossings], axis=0)
+
+    cycle_times = np.linspace(crossings[-2][0], crossings[-1][0], samples_per_cycle)
+    conc = solution.sol(cycle_times)[:2]
+    amplitude = np.zeros(2)
+    d_amplitude = np.zeros((2, num_params))
+    for species in range(2):
+        extrema = []
+        for index in [conc[species].argmax(), conc[species].argmin()]:
+            extremum_time = _refine_extremum(solution, flux_param_dict, f6b_influx, species, cycle_times, index)
+            extrema.append(solution.sol(extremum_time))
+        amplitude[species] = (extrema[0][species] - extrema[1][species]) / 2.
+        d_amplitude[species] = (
+            extrema[0][2:].reshape(2, num_params)[species] - extrema[1][2:].reshape(2, num_params)[species]
+        ) / 2.
+
+    param_values = np.asarray([
+        f6b_influx if param == 'f6b_influx' else flux_param_dict[param[0]][param[1]] for param in params
+    ], dtype=float)
+    period, d_period = periods.mean(), d_periods.mean(axis=0)
+    return {
+        'period': period,
+        'amplitude': amplitude,
+        'd_period': d_period,
+        'd_amplitude': d_amplitude,
+        'rel_period': param_values * d_period / period,
+        'rel_amplitude': param_values[np.newaxis, :] * d_amplitude / amplitude[:, np.newaxis]
+    }
+
+
+def _refine_extremum(solution, flux_param_dict, f6b_influx, species, sample_times, index):
+    """
+    Locates the time of an extremum precisely as root of the time derivative of the species. This matters
+    because the sensitivities grow linearly in time along the time derivative, such that they are only
+    the derivatives of the extremum exactly where the time derivative vanishes
+    :param solution: Solution object of the augmented system
+    :param flux_param_dict: Parameter dictionary for the PFK and aldolase fluxes
+    :param f6b_influx: Influx of F6P
+    :param species: Index of the species
+    :param sample_times: Sample times that were used to find the extremum
+    :param index: Index of the sample closest to the extremum
+    :return: Time of the extremum
+    """
+    def change(time):
+        state = solution.sol(time)
+        return flux_production(state[0], state[1], flux_param_dict, f6b_influx=f6b_influx)[species]
+
+    lower = sample_times[max(index - 1, 0)]
+    upper = sample_times[min(index + 1, sample_times.size - 1)]
+    if np.sign(change(lower)) == np.sign(change(upper)):
+        return sample_times[index]
+    return brentq(change, lower, upper)
@@ -0,0 +1,160 @@
+import numpy as np
+from lab2 import flux_production, jacobian_flux_production
+
+
+STABILITY_CLASSES = np.asarray([
+    'stable node',
+    'stable focus',
+    'unstable node',
+    'unstable focus',
+    'saddle',
+    'non-hyperbolic'
+])
+
+
+def solve_steady_state(
+        flux_param_dict,
+        f6b_influx=0.6e-3,
+        initial_values=(1., 1e-3),
+        stoichiometric_matrix=None,
+        tol=1e-10,
+        max_iter=50,
+        max_log_step=2.,
+        residual_tol=1e-8
+):
+    """
+    Solves flux_production = 0 with Newton's method and the analytic Jacobian. Any entry of the
+    parameter dictionary as well as the influx can be an array, in which case all parameter
+    combinations are solved at once in a batch. The iteration is carried out on the logarithm of the
+    concentrations, which keeps them positive
+    :param flux_param_dict: Parameter dictionary for the PFK and aldolase fluxes
+    :param f6b_influx: Influx of F6P
+    :param initial_values: Initial guess for the concentrations of F6P and FBP
+    :param stoichiometric_matrix: Stoichiometric matrix. If None, the default matrix is used
+    :param tol: Tolerance on the relative change of the concentrations to stop the iteration
+    :param max_iter: Maximal number of Newton iterations
+    :param max_log_step: Maximal change of the log-concentrations per iteration (damping)
+    :param residual_tol: Tolerance on the residual relative to the influx. A point only converged if both the
+            step and the residual are small
+    :return: Steady state concentrations with shape (2, ...), boolean array indicating convergence and
+            the number of iterations. Points whose iteration diverged, i.e. where the Newton step is not finite,
+            keep their last finite concentrations and are not converged
+    """
+    batch_shape = np.broadcast(
+        f6b_influx,
+        *[value for param in flux_param_dict.values() for value in param.values() if value is not None]
+    ).shape
+    log_conc = np.log(np.asarray(initial_values, dtype=float)).reshape((2,) + (1,) * len(batch_shape))
+    log_conc = np.broadcast_to(log_conc, (2,) + batch_shape).copy()
+
+    residual_scale = residual_tol * np.maximum(np.abs(f6b_influx), np.finfo(float).tiny)
+    converged = np.zeros(batch_shape, dtype=bool)
+    failed = np.zeros(batch_shape, dtype=bool)
+    num_iter = 0
+    for num_iter in range(1, max_iter + 1):
+        conc = np.exp(log_conc)
+        residual = flux_production(
+            conc[0],
+            conc[1],
+            flux_param_dict,
+            f6b_influx=f6b_influx,
+            stoichiometric_matrix=stoichiometric_matrix
+        )
+        jacobian = jacobian_flux_production(
+            conc[0],
+            conc[1],
+            flux_param_dict,
+            stoichiometric_matrix=stoichiometric_matrix
+        )
+        # Chain rule for the derivative with respect to the log-concentrations
+        log_jacobian = jacobian * np.moveaxis(conc, 0, -1)[..., np.newaxis, :]
+        # Closed form solution of the 2x2 systems. A singular Jacobian yields a non-finite step instead of an error
+        determinant = np.linalg.det(log_jacobian)
+        with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+            step = np.stack([
+                log_jacobian[..., 1, 1] * residual[0] - log_jacobian[..., 0, 1] * residual[1],
+                log_jacobian[..., 0, 0] * residual[1] - log_jacobian[..., 1, 0] * residual[0]
+            ]) / determinant
+            failed |= ~np.isfinite(step).all(axis=0) & ~converged
+            scale = np.maximum(1., np.abs(step).max(axis=0) / max_log_step)
+        step = np.where(converged | failed, 0., step / scale)
+        log_conc -= step
+
+        converged |= (np.abs(step).max(axis=0) < tol) & (np.abs(residual).max(axis=0) <= residual_scale) & ~failed
+        if np.all(converged | failed):
+            break
+
+    return np.exp(log_conc), converged, num_iter
+
+
+def classify_stability(jacobian, hopf_tol=1e-6):
+    """
+    Classifies the stability of equilibria by the eigenvalues of the Jacobian
+    :param jacobian: Jacobian(s) at the equilibria with shape (..., 2, 2)
+    :param hopf_tol: Tolerance on the real part of complex eigenvalues relative to their imaginary part
+            below which an equilibrium is flagged as Hopf candidate
+    :return: Eigenvalues with shape (..., 2), array of stability class names and boolean array of Hopf candidates
+    """
+    eigenvalues = np.linalg.eigvals(jacobian)
+    real = eigenvalues.real
+    is_complex = np.abs(eigenvalues.imag).max(axis=-1) > 0
+    num_positive = (real > 0).sum(axis=-1)
+    num_negative = (real < 0).sum(axis=-1)
+
+    class_index = np.full(real.shape[:-1], 5)
+    class_index[(num_negative == 2) & ~is_complex] = 0
+    class_index[(num_negative == 2) & is_complex] = 1
+    class_index[(num_positive == 2) & ~is_complex] = 2
+    class_index[(num_positive == 2) & is_complex] = 3
+    class_index[(num_positive == 1) & (num_negative == 1)] = 4
+
+    max_real = real.max(axis=-1)
+    hopf_candidate = is_complex & (max_real >= -hopf_tol * np.abs(eigenvalues.imag).max(axis=-1))
+
+    return eigenvalues, STABILITY_CLASSES[class_index], hopf_candidate
+
+
+def steady_state_stability(
+        flux_param_dict,
+        f6b_influx=0.6e-3,
+        initial_values=(1., 1e-3),
+        stoichiometric_matrix=None,
+        tol=1e-10,
+        max_iter=50
+):
+    """
+    Computes the equilibria of the glycolysis system and their linear stability, batched over all
+    parameter combinations that are given as arrays
+    :param flux_param_dict: Parameter dictionary for the PFK and aldolase fluxes
+    :param f6b_influx: Influx of F6P
+    :param initial_values: Initial guess for the concentrations of F6P and FBP
+    :param stoichiometric_matrix: Stoichiometric matrix. If None, the default matrix is used
+    :param tol: Tolerance of the Newton iteration
+    :param max_iter: Maximal number of Newton iterations
+    :return: Dictionary with the steady state concentrations, convergence flags, eigenvalues,
+            stability classes and Hopf candidates
+    """
+    conc, converged, num_iter = solve_steady_state(
+        flux_param_dict,
+        f6b_influx=f6b_influx,
+        initial_values=initial_values,
+        stoichiometric_matrix=stoichiometric_matrix,
+        tol=tol,
+        max_iter=max_iter
+    )
+    jacobian = jacobian_flux_production(
+        conc[0],
+        conc[1],
+        flux_param_dict,
+        stoichiometric_matrix=stoichiometric_matrix
+    )
+    eigenvalues, stability, hopf_candidate = classify_stability(jacobian)
+    return {
+        'conc': conc,
+        'converged': converged,
+        'iterations': num_iter,
+        'eigenvalues': eigenvalues,
+        'stability': stability,
+        'hopf_candidate': hopf_candidate
+    }
+
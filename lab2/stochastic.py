@@ -0,0 +1,168 @@
+import numpy as np
+from scipy import constants as cs
+from lab2 import flux, STOICHIOMETRIC_MATRIX
+
+
+AVOGADRO_CONSTANT = cs.value(u'Avogadro constant')
+
+
+def volume_to_system_size(volume, concentration_unit=1e-3):
+    """
+    Number of molecules that corresponds to a concentration of one unit in the given volume
+    :param volume: Cell volume in litres
+    :param concentration_unit: Concentration unit in mol per litre (default mM)
+    :return: System size, i.e. molecules per unit of concentration
+    """
+    return volume * concentration_unit * AVOGADRO_CONSTANT
+
+
+def propensities(counts, flux_param_dict, system_size, f6b_influx=0.6e-3):
+    """
+    Propensities of the influx, the PFK and the aldolase reaction. The deterministic rate laws are
+    evaluated at the concentrations that correspond to the molecule counts and scaled by the system size
+    :param counts: Molecule counts of F6P and FBP with shape (..., 2)
+    :param flux_param_dict: Parameter dictionary for the PFK and aldolase fluxes
+    :param system_size: Molecules per unit of concentration
+    :param f6b_influx: Influx of F6P
+    :return: Propensities with shape (..., 3)
+    """
+    conc = counts / float(system_size)
+    pfk_param = flux_param_dict['pfk']
+    pfk_flux = flux(
+        conc[..., 0],
+        conc[..., 1],
+        limiting_rate=pfk_param['limiting_rate'],
+        michaelis_const=pfk_param['michaelis_const'],
+        cooperativity=pfk_param['cooperativity'],
+        effect=pfk_param['effect'],
+        dissociation_const=pfk_param['dissociation_const'],
+        use_modulator=True
+    )
+
+    aldolase_param = flux_param_dict['aldolase']
+    aldolase_flux = flux(
+        conc[..., 1],
+        None,
+        limiting_rate=aldolase_param['limiting_rate'],
+        michaelis_const=aldolase_param['michaelis_const'],
+        cooperativity=aldolase_param['cooperativity'],
+        effect=aldolase_param['effect'],
+        dissociation_const=aldolase_param['dissociation_const'],
+        use_modulator=False
+    )
+
+    fluxes = np.stack(np.broadcast_arrays(f6b_influx, pfk_flux, aldolase_flux), axis=-1)
+    return fluxes * system_size
+
+
+def _record(history, counts, new_time, next_sample, index, sample_times):
+    """
+    Stores the counts for all sample times that are passed when the realizations advance to new_time.
+    The counts are constant in between
+    :param history: Array of recorded counts with shape (realizations, samples, 2)
+    :param counts: Counts of the advanced realizations before the update
+    :param new_time: Time of the advanced realizations after the update
+    :param next_sample: Index of the next sample time per realization (updated in place)
+    :param index: Indices of the advanced realizations
+    :param sample_times: Sample times
+    :return: None
+    """
+    num_samples = sample_times.size
+    passed = np.ones(index.size, dtype=bool)
+    while True:
+        current = next_sample[index]
+        passed &= (current < num_samples)
+        passed[passed] = sample_times[current[passed]] < new_time[passed]
+        if not np.any(passed):
+            break
+        history[index[passed], current[passed]] = counts[passed]
+        next_sample[index[passed]] += 1
+
+
+def simulate_stochastic(
+        flux_param_dict,
+        initial_values,
+        system_size,
+        sample_times,
+        f6b_influx=0.6e-3,
+        num_realizations=100,
+        method='tau_leaping',
+        epsilon=0.03,
+        ssa_threshold=3.,
+        seed=None
+):
+    """
+    Stochastic simulation of the glycolysis system with many independent realizations that are advanced
+    together. With method 'ssa', every realization performs exact Gillespie steps. With method 'tau_leaping',
+    the leap size is chosen adaptively such that the expected relative change of the propensities is bounded
+    by epsilon (Cao, Gillespie and Petzold, 2006). Realizations whose leap would cover less than ssa_threshold
+    reactions, or would lead to negative counts, fall back to exact steps
+    :param flux_param_dict: Parameter dictionary for the PFK and aldolase fluxes
+    :param initial_values: Initial concentrations of F6P and FBP
+    :param system_size: Molecules per unit of concentration (see volume_to_system_size)
+    :param sample_times: Increasing times at which the state is recorded
+    :param f6b_influx: Influx of F6P
+    :param num_realizations: Number of independent realizations
+    :param method: Either 'ssa' or 'tau_leaping'
+    :param epsilon: Error control parameter of the tau selection
+    :param ssa_threshold: Expected number of reactions below which an exact step is performed
+    :param seed: Seed of the random number generator
+    :return: Concentrations of F6P and FBP with shape (realizations, samples, 2)
+    """
+    if method not in ['ssa', 'tau_leaping']:
+        raise ValueError('Unknown method %s' % method)
+    rng = np.random.default_rng(seed)
+    sample_times = np.asarray(sample_times, dtype=float)
+    # Change of the species by the reactions with shape (reactions, species)
+    state_change = STOICHIOMETRIC_MATRIX.T
+
+    counts = np.tile(np.round(np.asarray(initial_values, dtype=float) * system_size), (num_realizations, 1))
+    time = np.zeros(num_realizations)
+    next_sample = np.zeros(num_realizations, dtype=int)
+    history = np.zeros((num_realizations, sample_times.size, 2))
+    active = np.ones(num_realizations, dtype=bool)
+
+    while np.any(active):
+        index = np.nonzero(active)[0]
+        rates = propensities(counts[index], flux_param_dict, system_size, f6b_influx=f6b_influx)
+        total_rate = rates.sum(axis=1)
+        exact = np.ones(index.size, dtype=bool)
+        new_counts = counts[index].copy()
+        new_time = np.full(index.size, np.inf)
+
+        if method == 'tau_leaping':
+            mean_change = rates.dot(state_change)
+            var_change = rates.dot(state_change**2)
+            bound = np.maximum(epsilon * counts[index] / 2., 1.)
+            with np.errstate(divide='ignore'):
+                tau = np.minimum(
+                    bound / np.abs(mean_change),
+                    bound**2 / var_change
+                ).min(axis=1)
+
+            leap = tau * total_rate > ssa_threshold
+            if np.any(leap):
+                firings = rng.poisson(rates[leap] * tau[leap, np.newaxis])
+                leap_counts = counts[index[leap]] + firings.dot(state_change)
+                # Leaps with negative counts are replaced by exact steps
+                valid = np.all(leap_counts >= 0, axis=1)
+                leap_index = np.nonzero(leap)[0][valid]
+                new_counts[leap_index] = leap_counts[valid]
+                new_time[leap_index] = time[index[leap_index]] + tau[leap_index]
+                exact[leap_index] = False
+
+        exact_index = np.nonzero(exact & (total_rate > 0))[0]
+        if exact_index.size:
+            exact_rates = rates[exact_index]
+            new_time[exact_index] = time[index[exact_index]] + rng.exponential(1. / total_rate[exact_index])
+            threshold = rng.random(exact_index.size) * total_rate[exact_index]
+            reaction = (np.cumsum(exact_rates, axis=1) < threshold[:, np.newaxis]).sum(axis=1)
+            reaction = np.minimum(reaction, exact_rates.shape[1] - 1)
+            new_counts[exact_index] += state_change[reaction]
+
+        _record(history, counts[index], new_time, next_sample, index, sample_times)
+        counts[index] = new_counts
+        time[index] = new_time
+        active[index] = next_sample[index] < sample_times.size
+
+    return history / float(system_size)
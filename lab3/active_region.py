@@ -0,0 +1,247 @@
+#!/usr/bin/python3
+import numpy as np
+from reaction_diffusion import ReactDiffStepper, fill_ghost_cells
+
+
+def significant_box(deviation_a, deviation_b, tol=0.):
+    """
+    Bounding box of the cells where either species deviates from the equilibrium by more than the tolerance
+    :param deviation_a: Deviation of the equilibrium of species a
+    :param deviation_b: Deviation of the equilibrium of species b
+    :param tol: Deviations up to this value are negligible
+    :return: List of (start, stop) per axis, or None if no cell is significant
+    """
+    significant = np.abs(deviation_a) > tol
+    significant |= np.abs(deviation_b) > tol
+    box = []
+    for axis in range(significant.ndim):
+        other_axes = tuple(other for other in range(significant.ndim) if other != axis)
+        indices = np.flatnonzero(significant.any(axis=other_axes))
+        if indices.size == 0:
+            return None
+        box.append((indices[0], indices[-1] + 1))
+    return box
+
+
+class ActiveRegionStepper(ReactDiffStepper):
+    """
+    Reaction diffusion system with two species that only updates the region where the deviations are not
+    negligible. The active region starts as the bounding box of the significant cells plus a margin. Since the
+    rate vanishes wherever a cell and its neighbours are at the equilibrium, the front can only advance by the
+    reach of the stencil per step, and the region is grown by the margin whenever significant cells come within
+    the margin of one of its faces. The cost of a step is proportional to the perturbed area instead of the whole
+    grid, such that the early steps of localized initial conditions, e.g. a single perturbed cell, are much
+    cheaper. With a tolerance of zero, the result is the same as for the ReactDiffStepper
+    """
+    checkpoint_parameters = (
+        'interact_a',
+        'interact_b',
+        'nonlin_break',
+        'diffusion_coef',
+        'dt',
+        'active_tol',
+        'margin',
+        'stencil',
+        'boundary',
+        'boundary_value',
+        'dtype'
+    )
+    checkpoint_attributes = ReactDiffStepper.checkpoint_attributes + ('active_box',)
+
+    def __init__(
+            self,
+            deviation_a,
+            deviation_b,
+            interact_a=1.,
+            interact_b=-1.,
+            nonlin_break=0.1,
+            diffusion_coef=(1., 3.),
+            dt=0.1,
+            active_tol=1e-12,
+            margin=2,
+            stencil=None,
+            boundary='periodic',
+            boundary_value=0.,
+            dtype=np.float64
+    ):
+        """
+        Constructor
+        :param deviation_a: Initial deviation of the equilibrium of species a
+        :param deviation_b: Initial deviation of the equilibrium of species b
+        :param interact_a: Interaction coefficient of species a. Either shared or a pair (species a, species b)
+        :param interact_b: Interaction coefficient of species b. Either shared or a pair (species a, species b)
+        :param nonlin_break: Non-linear breakdown. Either shared or a pair (species a, species b)
+        :param diffusion_coef: Diffusion coefficient. Either shared or a pair (species a, species b)
+        :param dt: Change in time
+        :param active_tol: Deviations up to this value are negligible. Cells outside of the active region keep
+                their value until the region reaches them
+        :param margin: Number of cells by which the bounding box of the significant cells is extended. It needs
+                to be at least the reach of the stencil, i.e. one
+        :param stencil: Name of the stencil of the second derivative (see STENCILS)
+        :param boundary: Boundary condition. Either 'periodic', 'neumann' or 'dirichlet'
+        :param boundary_value: Value of the deviation outside of the domain for Dirichlet boundaries. Either shared
+                or a pair (species a, species b)
+        :param dtype: Data type of the fields and the parameters, e.g. np.float32
+        """
+        if margin < 1:
+            raise ValueError('The margin needs to be at least one cell')
+        super().__init__(
+            deviation_a,
+            deviation_b,
+            interact_a=interact_a,
+            interact_b=interact_b,
+            nonlin_break=nonlin_break,
+            diffusion_coef=diffusion_coef,
+            dt=dt,
+            stencil=stencil,
+            boundary=boundary,
+            boundary_value=boundary_value,
+            dtype=dtype
+        )
+        self.active_tol = active_tol
+        self.margin = margin
+        self._full_scratch = self._scratch
+        # Non-zero Dirichlet values drive the cells along the boundary, hence the whole grid stays active
+        self._always_full = boundary == 'dirichlet' and np.any(np.asarray(self.boundary_value) != 0)
+        self.active_region = None
+        if self._always_full:
+            self._set_region(tuple(slice(0, length) for length in self.deviation_a.shape))
+        else:
+            box = significant_box(self.deviation_a, self.deviation_b, active_tol)
+            self._set_region(None if box is None else self._extend(box))
+
+    def _set_region(self, region):
+        """
+        Switches the views on which the steps operate to a new active region
+        :param region: Tuple of slices or None if no cell is active
+        :return: None
+        """
+        self.active_region = region
+        if region is None:
+            return
+        self._padded_region = tuple(slice(area.start, area.stop + 2) for area in region)
+        self._active_a = self.deviation_a[region]
+        self._active_b = self.deviation_b[region]
+        self._active_increment_a = self.increment_a[region]
+        self._active_increment_b = self.increment_b[region]
+        self._scratch = self._full_scratch[region]
+
+    def _clip(self, start, stop, length):
+        """
+        Clips the bounds of the region along one axis to the grid. Periodic boundaries couple opposite sides,
+        thus a region that reaches one side covers the whole axis
+        :param start: First cell
+        :param stop: Cell after the last one
+        :param length: Number of cells along the axis
+        :return: Slice
+        """
+        start, stop = max(start, 0), min(stop, length)
+        if self.boundary == 'periodic' and (start == 0 or stop == length):
+            start, stop = 0, length
+        return slice(start, stop)
+
+    def _extend(self, box):
+        """
+        Extends a box by the margin
+        :param box: List of (start, stop) per axis
+        :return: Tuple of slices
+        """
+        return tuple(
+            self._clip(start - self.margin, stop + self.margin, length)
+            for (start, stop), length in zip(box, self.deviation_a.shape)
+        )
+
+    def _is_significant(self, band):
+        """
+        :param band: Slices of a band of the active region
+        :return: True if a cell of the band deviates by more than the tolerance
+        """
+        return bool(
+            np.any(np.abs(self._active_a[band]) > self.active_tol)
+            or np.any(np.abs(self._active_b[band]) > self.active_tol)
+        )
+
+    def _next_region(self):
+        """
+        Active region for the next step. Only the bands of width margin along the faces of the region are
+        inspected: if a band holds significant cells, the front approaches this face and the region is extended
+        by the margin on that side. The region never shrinks, and the inspection costs scale with its surface
+        :return: Tuple of slices
+        """
+        region = []
+        for axis, (area, length) in enumerate(zip(self.active_region, self.deviation_a.shape)):
+            start, stop = area.start, area.stop
+            lower_band, upper_band = [slice(None)] * self.deviation_a.ndim, [slice(None)] * self.deviation_a.ndim
+            lower_band[axis], upper_band[axis] = slice(0, self.margin), slice(-self.margin, None)
+            if start > 0 and self._is_significant(tuple(lower_band)):
+                start -= self.margin
+            if stop < length and self._is_significant(tuple(upper_band)):
+                stop += self.margin
+            region.append(self._clip(start, stop, length))
+        return tuple(region)
+
+    @property
+    def active_box(self):
+        """
+        :return: Bounds of the active region as array with shape (number of axes, 2). Empty if no cell is active
+        """
+        if self.active_region is None:
+            return np.zeros((0, 2), dtype=int)
+        return np.asarray([(area.start, area.stop) for area in self.active_region])
+
+    @active_box.setter
+    def active_box(self, box):
+        """
+        Sets the active region, e.g. when a checkpoint is restored
+        :param box: Bounds of the active region as array with shape (number of axes, 2)
+        :return: None
+        """
+        box = np.asarray(box)
+        self._set_region(tuple(slice(int(start), int(stop)) for start, stop in box) if box.size else None)
+
+    @property
+    def active_fraction(self):
+        """
+        :return: Fraction of the grid that is updated by the next step
+        """
+        if self.active_region is None:
+            return 0.
+        return np.prod([area.stop - area.start for area in self.active_region]) / float(self.deviation_a.size)
+
+    def _pad(self, substance, species):
+        """
+        Padded active region of a species with refreshed ghost cells. Only the faces of the whole grid are
+        refreshed, and only if the region touches them
+        :param substance: Active region of the species
+        :param species: Index of the species (0 for a, 1 for b)
+        :return: Padded active region
+        """
+        padded = self._padded[species]
+        touching = [
+            axis for axis, (area, length) in enumerate(zip(self.active_region, self.deviation_a.shape))
+            if area.start == 0 or area.stop == length
+        ]
+        if touching:
+            fill_ghost_cells(padded, self.boundary, self.boundary_value[species], axes=touching)
+        return padded[self._padded_region]
+
+    def step(self, num_steps=1):
+        """
+        Advances both species in place inside of the active region
+        :param num_steps: Number of time steps
+        :return: None
+        """
+        for _ in range(num_steps):
+            if self.active_region is not None:
+                region = self._next_region()
+                if region != self.active_region:
+                    self._set_region(region)
+            if self.active_region is not None:
+                self.rate(self._active_a, self._active_b, 0, self._active_increment_a)
+                self.rate(self._active_a, self._active_b, 1, self._active_increment_b)
+                self._active_increment_a *= self.dt
+                self._active_increment_b *= self.dt
+                self._active_a += self._active_increment_a
+                self._active_b += self._active_increment_b
+            self.time += self.dt
+            self.num_steps += 1
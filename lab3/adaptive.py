@@ -0,0 +1,208 @@
+#!/usr/bin/python3
+import numpy as np
+from reaction_diffusion import ReactDiffStepper
+
+
+class AdaptiveStepper(ReactDiffStepper):
+    """
+    Reaction diffusion system with two species that is integrated with the embedded Runge-Kutta pair of
+    Bogacki and Shampine (RK23). The local error is estimated by the difference of the second and third
+    order solutions, and the time step is adapted such that the error stays within the given tolerances.
+    While the pattern settles, the steps grow automatically
+    """
+    checkpoint_parameters = (
+        'interact_a',
+        'interact_b',
+        'nonlin_break',
+        'diffusion_coef',
+        'dt',
+        'rtol',
+        'atol',
+        'max_dt',
+        'safety',
+        'min_factor',
+        'max_factor',
+        'stencil',
+        'boundary',
+        'boundary_value'
+    )
+    checkpoint_attributes = ReactDiffStepper.checkpoint_attributes + ('num_rejected', 'num_rhs_evaluations')
+
+    def __init__(
+            self,
+            deviation_a,
+            deviation_b,
+            interact_a=1.,
+            interact_b=-1.,
+            nonlin_break=0.1,
+            diffusion_coef=(1., 3.),
+            dt=0.01,
+            rtol=1e-4,
+            atol=1e-7,
+            max_dt=np.inf,
+            safety=0.9,
+            min_factor=0.2,
+            max_factor=5.,
+            stencil=None,
+            boundary='periodic',
+            boundary_value=0.
+    ):
+        """
+        Constructor
+        :param deviation_a: Initial deviation of the equilibrium of species a
+        :param deviation_b: Initial deviation of the equilibrium of species b
+        :param interact_a: Interaction coefficient of species a. Either shared or a pair (species a, species b)
+        :param interact_b: Interaction coefficient of species b. Either shared or a pair (species a, species b)
+        :param nonlin_break: Non-linear breakdown. Either shared or a pair (species a, species b)
+        :param diffusion_coef: Diffusion coefficient. Either shared or a pair (species a, species b)
+        :param dt: Initial change in time
+        :param rtol: Relative tolerance of the local error
+        :param atol: Absolute tolerance of the local error
+        :param max_dt: Upper bound of the time step
+        :param safety: Safety factor of the step size controller
+        :param min_factor: Minimal factor by which the step size is changed
+        :param max_factor: Maximal factor by which the step size is changed
+        :param stencil: Name of the stencil of the second derivative (see STENCILS)
+        :param boundary: Boundary condition. Either 'periodic', 'neumann' or 'dirichlet'
+        :param boundary_value: Value of the deviation outside of the domain for Dirichlet boundaries
+        """
+        super().__init__(
+            deviation_a,
+            deviation_b,
+            interact_a=interact_a,
+            interact_b=interact_b,
+            nonlin_break=nonlin_break,
+            diffusion_coef=diffusion_coef,
+            dt=dt,
+            stencil=stencil,
+            boundary=boundary,
+            boundary_value=boundary_value
+        )
+        self.rtol = rtol
+        self.atol = atol
+        self.max_dt = max_dt
+        self.safety = safety
+        self.min_factor = min_factor
+        self.max_factor = max_factor
+
+        self.num_rejected = 0
+        self.num_rhs_evaluations = 0
+
+        shape = (2,) + self.deviation_a.shape
+        self._state = np.empty(shape)
+        self._stage = np.empty(shape)
+        self._new_state = np.empty(shape)
+        self._error = np.empty(shape)
+        self._slopes = [np.empty(shape) for _ in range(4)]
+        self._first_slope_valid = False
+
+    def _rhs(self, state, out):
+        """
+        Change in time of both species
+        :param state: Stacked deviations of species a and b
+        :param out: Output buffer for the stacked changes
+        :return: The output buffer
+        """
+        self.rate(state[0], state[1], 0, out[0])
+        self.rate(state[0], state[1], 1, out[1])
+        self.num_rhs_evaluations += 1
+        return out
+
+    def _attempt(self, dt):
+        """
+        Computes a step with the embedded pair and returns the scaled error norm
+        :param dt: Change in time
+        :return: Root mean square of the error relative to the tolerances
+        """
+        k1, k2, k3, k4 = self._slopes
+        state, stage, new_state, error = self._state, self._stage, self._new_state, self._error
+
+        np.multiply(k1, dt / 2., out=stage)
+        stage += state
+        self._rhs(stage, k2)
+        np.multiply(k2, 3. * dt / 4., out=stage)
+        stage += state
+        self._rhs(stage, k3)
+
+        np.multiply(k1, 2. / 9., out=new_state)
+        new_state += k2 / 3.
+        new_state += 4. / 9. * k3
+        new_state *= dt
+        new_state += state
+        self._rhs(new_state, k4)
+
+        np.multiply(k1, -5. / 72., out=error)
+        error += k2 / 12.
+        error += k3 / 9.
+        error -= k4 / 8.
+        error *= dt
+
+        np.maximum(np.abs(state), np.abs(new_state), out=stage)
+        stage *= self.rtol
+        stage += self.atol
+        error /= stage
+        return np.sqrt(np.mean(error**2))
+
+    def step(self, num_steps=1):
+        """
+        Performs accepted adaptive steps. Rejected attempts are repeated with a smaller time step
+        :param num_steps: Number of accepted time steps
+        :return: None
+        """
+        for _ in range(num_steps):
+            self._state[0] = self.deviation_a
+            self._state[1] = self.deviation_b
+            if not self._first_slope_valid:
+                self._rhs(self._state, self._slopes[0])
+
+            while True:
+                dt = min(self.dt, self.max_dt)
+                error_norm = self._attempt(dt)
+                if error_norm == 0:
+                    factor = self.max_factor
+                else:
+                    factor = np.clip(self.safety * error_norm**(-1. / 3.), self.min_factor, self.max_factor)
+                if error_norm <= 1:
+                    break
+                self.num_rejected += 1
+                self.dt = dt * factor
+
+            np.subtract(self._new_state[0], self.deviation_a, out=self.increment_a)
+            np.subtract(self._new_state[1], self.deviation_b, out=self.increment_b)
+            self.deviation_a[...] = self._new_state[0]
+            self.deviation_b[...] = self._new_state[1]
+            # First same as last: the last slope is the first slope of the next step
+            self._slopes[0], self._slopes[3] = self._slopes[3], self._slopes[0]
+            self._first_slope_valid = True
+
+            self.time += dt
+            self.num_steps += 1
+            self.dt = min(dt * factor, self.max_dt)
+
+    def advance(self, end_time):
+        """
+        Integrates until the given time. The last step is shortened to end exactly at that time
+        :param end_time: Time at which the integration stops
+        :return: None
+        """
+        while self.time < end_time:
+            proposed_dt = self.dt
+            if self.time + self.dt > end_time:
+                self.dt = end_time - self.time
+                self.step()
+                self.dt = max(self.dt, proposed_dt)
+            else:
+                self.step()
+
+    def statistics(self):
+        """
+        Step statistics of the integration
+        :return: Dictionary with the number of accepted and rejected steps, the number of evaluations of the
+                right hand side, and the current time step
+        """
+        return {
+            'accepted': self.num_steps,
+            'rejected': self.num_rejected,
+            'rhs_evaluations': self.num_rhs_evaluations,
+            'dt': self.dt
+        }
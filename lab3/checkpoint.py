@@ -0,0 +1,171 @@
+#!/usr/bin/python3
+import importlib
+import json
+import os
+import numpy as np
+
+
+FIELDS = ('deviation_a', 'deviation_b', 'increment_a', 'increment_b')
+
+
+def constructor_parameters(stepper):
+    """
+    Parameters that are needed to construct the stepper again. Every stepper class that supports checkpoints
+    declares them in checkpoint_parameters and stores them as attributes with the same name
+    :param stepper: Reaction diffusion stepper
+    :return: Dictionary of the parameters
+    """
+    names = getattr(type(stepper), 'checkpoint_parameters', None)
+    if names is None:
+        raise TypeError('%s does not support checkpoints' % type(stepper).__name__)
+    return {name: getattr(stepper, name) for name in names}
+
+
+def _encode_parameters(parameters):
+    """
+    Converts the parameters to arrays that can be stored in an npz file. Pairs (species a, species b) are stored
+    as two entries, such that the values of both species may have different shapes
+    :param parameters: Dictionary of the parameters
+    :return: Dictionary of arrays
+    """
+    arrays = {}
+    for name, value in parameters.items():
+        if value is None:
+            arrays['none:%s' % name] = np.array(0)
+        elif isinstance(value, np.dtype):
+            arrays['param:%s' % name] = np.array(value.name)
+        elif isinstance(value, (tuple, list)):
+            arrays['pair:%s:0' % name] = np.asarray(value[0])
+            arrays['pair:%s:1' % name] = np.asarray(value[1])
+        else:
+            arrays['param:%s' % name] = np.asarray(value)
+    return arrays
+
+
+def _decode_value(array):
+    """
+    Converts a stored array back to a scalar, a string or an array
+    :param array: Stored array
+    :return: Value
+    """
+    return array.item() if array.ndim == 0 else array
+
+
+def _decode_parameters(checkpoint):
+    """
+    Restores the parameters from the entries of an npz file
+    :param checkpoint: Loaded npz file
+    :return: Dictionary of the parameters
+    """
+    parameters = {}
+    for key in checkpoint.files:
+        kind, _, name = key.partition(':')
+        if kind == 'none':
+            parameters[name] = None
+        elif kind == 'param':
+            parameters[name] = _decode_value(checkpoint[key])
+        elif kind == 'pair' and name.endswith(':0'):
+            name = name[:-2]
+            parameters[name] = (
+                _decode_value(checkpoint['pair:%s:0' % name]),
+                _decode_value(checkpoint['pair:%s:1' % name])
+            )
+    return parameters
+
+
+def _rng_arrays(rng):
+    """
+    State of a random number generator as arrays
+    :param rng: numpy Generator or RandomState. If None, the global state of np.random is used
+    :return: Dictionary of arrays
+    """
+    if isinstance(rng, np.random.Generator):
+        return {'rng:kind': np.array('generator'), 'rng:state': np.array(json.dumps(rng.bit_generator.state))}
+    state = np.random.get_state() if rng is None else rng.get_state()
+    return {
+        'rng:kind': np.array('legacy'),
+        'rng:keys': state[1],
+        'rng:position': np.array(state[2]),
+        'rng:has_gauss': np.array(state[3]),
+        'rng:cached_gaussian': np.array(state[4])
+    }
+
+
+def _restore_rng(checkpoint, rng):
+    """
+    Restores the state of a random number generator
+    :param checkpoint: Loaded npz file
+    :param rng: numpy Generator or RandomState. If None, the global state of np.random is restored
+    :return: None
+    """
+    kind = checkpoint['rng:kind'].item()
+    if isinstance(rng, np.random.Generator):
+        if kind != 'generator':
+            raise ValueError('The checkpoint holds the state of the legacy random number generator')
+        rng.bit_generator.state = json.loads(checkpoint['rng:state'].item())
+        return
+    if kind != 'legacy':
+        raise ValueError('The checkpoint holds the state of a numpy Generator')
+    state = (
+        'MT19937',
+        checkpoint['rng:keys'],
+        checkpoint['rng:position'].item(),
+        checkpoint['rng:has_gauss'].item(),
+        checkpoint['rng:cached_gaussian'].item()
+    )
+    if rng is None:
+        np.random.set_state(state)
+    else:
+        rng.set_state(state)
+
+
+def save_checkpoint(path, stepper, rng=None):
+    """
+    Saves the fields, the time, the parameters of a stepper and the state of the random number generator into a
+    compressed binary file. The file is written to a temporary file first and then moved into place, such that an
+    interruption while saving does not destroy the previous checkpoint
+    :param path: Output file
+    :param stepper: Reaction diffusion stepper
+    :param rng: numpy Generator or RandomState. If None, the global state of np.random is saved
+    :return: None
+    """
+    arrays = _encode_parameters(constructor_parameters(stepper))
+    arrays.update(_rng_arrays(rng))
+    for name in FIELDS:
+        arrays['field:%s' % name] = np.asarray(getattr(stepper, name))
+    for name in stepper.checkpoint_attributes:
+        arrays['state:%s' % name] = np.asarray(getattr(stepper, name))
+    arrays['class:module'] = np.array(type(stepper).__module__)
+    arrays['class:name'] = np.array(type(stepper).__name__)
+
+    temporary_path = '%s.tmp' % path
+    with open(temporary_path, 'wb') as checkpoint_file:
+        np.savez_compressed(checkpoint_file, **arrays)
+    os.replace(temporary_path, path)
+
+
+def load_checkpoint(path, rng=None, **overrides):
+    """
+    Constructs the stepper that was saved in a checkpoint, such that the run continues exactly where it stopped
+    :param path: Checkpoint file
+    :param rng: numpy Generator or RandomState whose state is restored. If None, the global state of np.random is
+            restored
+    :param overrides: Parameters of the stepper that replace the saved ones, e.g. the number of workers
+    :return: The stepper
+    """
+    with np.load(path) as checkpoint:
+        module = importlib.import_module(checkpoint['class:module'].item())
+        stepper_class = getattr(module, checkpoint['class:name'].item())
+        parameters = _decode_parameters(checkpoint)
+        parameters.update(overrides)
+        stepper = stepper_class(
+            checkpoint['field:deviation_a'],
+            checkpoint['field:deviation_b'],
+            **parameters
+        )
+        for name in FIELDS[2:]:
+            getattr(stepper, name)[...] = checkpoint['field:%s' % name]
+        for name in stepper.checkpoint_attributes:
+            setattr(stepper, name, _decode_value(checkpoint['state:%s' % name]))
+        _restore_rng(checkpoint, rng)
+    return stepper
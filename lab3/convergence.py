@@ -0,0 +1,134 @@
+#!/usr/bin/python3
+import numpy as np
+
+
+CONVERGENCE_STATES = ('undetermined', 'steady', 'periodic')
+
+
+class ConvergenceMonitor:
+    """
+    Online monitor that watches the increments of a reaction diffusion stepper and detects when the pattern has
+    stopped changing or has settled into a periodic regime. A steady state is reached once the max-norm of the
+    rate of change stayed below the tolerance for a whole window of steps. Periodic regimes are detected with the
+    Poincare section given by the maxima of the spatial mean of species a. The monitor works on a single simulation
+    or on a batch of simulations stacked along leading axes, in which case every simulation has its own state
+    """
+    def __init__(
+            self,
+            steady_tol=1e-6,
+            window=100,
+            rel_tol=1e-3,
+            num_confirm=3,
+            batch_ndim=0
+    ):
+        """
+        Constructor
+        :param steady_tol: Upper bound of the max-norm of the rate of change (increment / dt) for a steady state
+        :param window: Number of successive steps below the steady tolerance that are needed to confirm it
+        :param rel_tol: Relative tolerance for successive periods and maxima to be considered equal
+        :param num_confirm: Number of successive matching cycles that are needed to confirm a periodic regime
+        :param batch_ndim: Number of leading axes that hold independent simulations
+        """
+        self.steady_tol = steady_tol
+        self.window = window
+        self.rel_tol = rel_tol
+        self.num_confirm = num_confirm
+        self.batch_ndim = batch_ndim
+
+        self.state = None
+        self.convergence_time = None
+        self.period = None
+        self.rate_norm = None
+
+        self._quiet_steps = None
+        self._quiet_since = None
+        self._prev_time = None
+        self._prev_slope = None
+        self._section_time = None
+        self._section_value = None
+        self._matches = None
+
+    def _reduce(self, field, function):
+        """
+        Reduces a field over the spatial axes
+        :param field: Field with the batch axes in front
+        :param function: Reduction, e.g. np.max
+        :return: Array with the batch shape
+        """
+        return function(field, axis=tuple(range(self.batch_ndim, field.ndim)))
+
+    def _start(self, batch_shape):
+        """
+        Allocates the per simulation state
+        :param batch_shape: Shape of the batch axes
+        :return: None
+        """
+        self.state = np.full(batch_shape, 'undetermined', dtype='<U12')
+        self.convergence_time = np.full(batch_shape, np.nan)
+        self.period = np.full(batch_shape, np.nan)
+        self._quiet_steps = np.zeros(batch_shape, dtype=int)
+        self._quiet_since = np.full(batch_shape, np.nan)
+        self._section_time = np.full(batch_shape, np.nan)
+        self._section_value = np.full(batch_shape, np.nan)
+        self._matches = np.zeros(batch_shape, dtype=int)
+
+    @property
+    def converged(self):
+        """
+        :return: True if all simulations reached a steady state or a periodic regime
+        """
+        return self.state is not None and bool(np.all(self.state != 'undetermined'))
+
+    def update(self, time, dt, increment_a, increment_b, deviation_a):
+        """
+        Feeds the increments of a time step to the monitor
+        :param time: Time after the step
+        :param dt: Length of the step
+        :param increment_a: Change of species a during the step
+        :param increment_b: Change of species b during the step
+        :param deviation_a: Species a after the step
+        :return: True if all simulations have converged, False otherwise
+        """
+        if self.state is None:
+            self._start(increment_a.shape[:self.batch_ndim])
+        undetermined = self.state == 'undetermined'
+
+        # Steady state: windowed max-norm of the rate of change
+        self.rate_norm = np.maximum(
+            self._reduce(np.abs(increment_a), np.max),
+            self._reduce(np.abs(increment_b), np.max)
+        ) / dt
+        quiet = self.rate_norm < self.steady_tol
+        self._quiet_since = np.where(quiet & (self._quiet_steps == 0), time - dt, self._quiet_since)
+        self._quiet_steps = np.where(quiet, self._quiet_steps + 1, 0)
+        steady = undetermined & (self._quiet_steps >= self.window)
+        self.state = np.where(steady, 'steady', self.state)
+        self.convergence_time = np.where(steady, self._quiet_since, self.convergence_time)
+
+        # Periodic regime: maxima of the spatial mean of species a, where its slope changes sign
+        slope = self._reduce(increment_a, np.mean) / dt
+        if self._prev_slope is not None:
+            crossing = (self._prev_slope > 0) & (slope <= 0) & undetermined & ~steady
+            weight = self._prev_slope / np.where(crossing, self._prev_slope - slope, 1.)
+            section_time = self._prev_time + weight * (time - self._prev_time)
+            section_value = self._reduce(deviation_a, np.mean)
+
+            period = section_time - self._section_time
+            scale = np.maximum(np.abs(section_value), np.finfo(float).tiny)
+            match = (
+                (np.abs(period - self.period) <= self.rel_tol * period)
+                & (np.abs(section_value - self._section_value) <= self.rel_tol * scale)
+            )
+            self._matches = np.where(crossing, np.where(match, self._matches + 1, 0), self._matches)
+            self.period = np.where(crossing, period, self.period)
+            self._section_time = np.where(crossing, section_time, self._section_time)
+            self._section_value = np.where(crossing, section_value, self._section_value)
+
+            periodic = crossing & (self._matches >= self.num_confirm)
+            self.state = np.where(periodic, 'periodic', self.state)
+            self.convergence_time = np.where(periodic, time, self.convergence_time)
+
+        self._prev_time = time
+        self._prev_slope = slope
+        self.period = np.where(self.state == 'steady', np.nan, self.period)
+        return self.converged
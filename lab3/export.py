@@ -0,0 +1,77 @@
+#!/usr/bin/python3
+import multiprocessing as mp
+import numpy as np
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+
+def draw_history(fig, history_a, history_b, suptitle='One-dimensional reaction-diffusion system'):
+    """
+    Draws the histories of both species of a one dimensional system as raster images. In contrast to pcolor,
+    imshow draws a single image instead of one polygon per cell
+    :param fig: Figure into which the histories are drawn
+    :param history_a: History of species a with shape (number of records, number of cells)
+    :param history_b: History of species b with shape (number of records, number of cells)
+    :param suptitle: Title of the figure
+    :return: None
+    """
+    (ax1, ax2) = fig.subplots(2, 1)
+    for ax, history, title in [(ax1, history_a, 'Species A'), (ax2, history_b, 'Species B')]:
+        history = np.asarray(history)
+        image = ax.imshow(
+            history,
+            aspect='auto',
+            origin='lower',
+            interpolation='nearest',
+            extent=(0, history.shape[1], 0, history.shape[0])
+        )
+        fig.colorbar(image, ax=ax)
+        ax.set_ylabel('Time')
+        ax.set_title(title)
+    fig.suptitle(suptitle)
+    ax2.set_xlabel('Dimension')
+    fig.tight_layout(rect=[0, 0.03, 1, 0.95])
+
+
+def save_history_figure(path, history_a, history_b, suptitle='One-dimensional reaction-diffusion system'):
+    """
+    Renders the histories headlessly and saves them to a file. The figure is not registered with pyplot and is
+    released after saving
+    :param path: Output file
+    :param history_a: History of species a with shape (number of records, number of cells)
+    :param history_b: History of species b with shape (number of records, number of cells)
+    :param suptitle: Title of the figure
+    :return: The output file
+    """
+    fig = Figure()
+    FigureCanvasAgg(fig)
+    draw_history(fig, history_a, history_b, suptitle=suptitle)
+    fig.savefig(path)
+    fig.clear()
+    return path
+
+
+def _save_job(job):
+    """
+    Saves the figure of a single export job
+    :param job: Tuple (path, history_a, history_b)
+    :return: The output file
+    """
+    return save_history_figure(*job)
+
+
+def export_histories(jobs, num_processes=None):
+    """
+    Saves the figures of many recorded histories, e.g. the outputs of a parameter sweep, in parallel worker
+    processes
+    :param jobs: List of (path, history_a, history_b)
+    :param num_processes: Number of worker processes. If None, the number of cores is used
+    :return: List of the output files
+    """
+    if num_processes is None:
+        num_processes = mp.cpu_count()
+    num_processes = max(1, min(num_processes, len(jobs)))
+    if num_processes == 1:
+        return [_save_job(job) for job in jobs]
+    with mp.Pool(num_processes) as pool:
+        return pool.map(_save_job, jobs, chunksize=max(1, len(jobs) // (4 * num_processes)))
@@ -0,0 +1,183 @@
+#!/usr/bin/python3
+import numpy as np
+from reaction_diffusion import species_pair
+from spectral import laplacian_symbol
+from sweep import stack_parameters
+
+
+PATTERN_CLASSES = np.asarray([
+    'stable',
+    'homogeneous',
+    'oscillatory',
+    'turing',
+    'wave'
+])
+
+
+def reaction_jacobian(interact_a=1., interact_b=-1.):
+    """
+    Jacobian of the reaction terms of react_diff at the equilibrium. The non-linear breakdown is cubic and does
+    not contribute
+    :param interact_a: Interaction coefficient of species a. Either shared or a tuple (species a, species b)
+    :param interact_b: Interaction coefficient of species b. Either shared or a tuple (species a, species b)
+    :return: Jacobian(s) with shape (..., 2, 2). Parameters that are arrays are broadcast against each other. An
+            array is shared by both species, a grid of one species only needs a tuple, e.g. (grid, 1.)
+    """
+    interact_a = species_pair(interact_a)
+    interact_b = species_pair(interact_b)
+    entries = np.broadcast_arrays(interact_a[0], interact_b[0], interact_a[1], interact_b[1])
+    return np.stack(entries, axis=-1).reshape(entries[0].shape + (2, 2))
+
+
+def dispersion_relation(laplacian_eigenvalues, interact_a=1., interact_b=-1., diffusion_coef=(1., 3.)):
+    """
+    Eigenvalues of the linearized reaction diffusion system for every Fourier mode, i.e. of
+    J + diag(diffusion_coef) * lambda_k, where lambda_k is the eigenvalue of the second derivative of the mode.
+    The eigenvalues of the 2x2 matrices are computed in closed form, such that the whole parameter grid is
+    handled at once
+    :param laplacian_eigenvalues: Eigenvalues of the second derivative with shape (number of modes,), e.g. from
+            laplacian_symbol
+    :param interact_a: Interaction coefficient of species a. Either shared or a tuple (species a, species b)
+    :param interact_b: Interaction coefficient of species b. Either shared or a tuple (species a, species b)
+    :param diffusion_coef: Diffusion coefficient. Either shared or a tuple (species a, species b)
+    :return: Complex growth rates with shape (..., number of modes, 2), the larger real part first
+    """
+    jacobian = reaction_jacobian(interact_a, interact_b)[..., np.newaxis, :, :]
+    diffusion_a, diffusion_b = [
+        np.asarray(coef, dtype=float)[..., np.newaxis] for coef in species_pair(diffusion_coef)
+    ]
+    laplacian_eigenvalues = np.asarray(laplacian_eigenvalues, dtype=float)
+
+    diagonal_a = jacobian[..., 0, 0] + diffusion_a * laplacian_eigenvalues
+    diagonal_b = jacobian[..., 1, 1] + diffusion_b * laplacian_eigenvalues
+    half_trace = (diagonal_a + diagonal_b) / 2.
+    determinant = diagonal_a * diagonal_b - jacobian[..., 0, 1] * jacobian[..., 1, 0]
+    root = np.sqrt(half_trace**2 - determinant + 0j)
+    return np.stack([half_trace + root, half_trace - root], axis=-1)
+
+
+def turing_band(interact_a=1., interact_b=-1., diffusion_coef=(1., 3.), discrete=True):
+    """
+    Band of wave numbers whose modes grow without oscillating, i.e. where the determinant
+    det(q) = D_a D_b q^2 - (D_a J_bb + D_b J_aa) q + det(J) of the linearized system is negative, with q = -lambda_k
+    :param interact_a: Interaction coefficient of species a. Either shared or a tuple (species a, species b)
+    :param interact_b: Interaction coefficient of species b. Either shared or a tuple (species a, species b)
+    :param diffusion_coef: Diffusion coefficient. Either shared or a tuple (species a, species b)
+    :param discrete: Flag to determine whether q refers to the three point stencil on a grid with unit spacing
+            (q = 2 - 2 cos k) or to the continuous second derivative (q = k^2)
+    :return: Lower and upper wave number of the band. NaN where no mode is unstable
+    """
+    jacobian = reaction_jacobian(interact_a, interact_b)
+    diffusion_a, diffusion_b = [np.asarray(coef, dtype=float) for coef in species_pair(diffusion_coef)]
+    quadratic = diffusion_a * diffusion_b
+    linear = diffusion_a * jacobian[..., 1, 1] + diffusion_b * jacobian[..., 0, 0]
+    constant = np.linalg.det(jacobian)
+    quadratic, linear, constant = np.broadcast_arrays(quadratic, linear, constant)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        root = np.sqrt(linear**2 - 4 * quadratic * constant)
+        lower = np.where(
+            quadratic > 0,
+            (linear - root) / (2 * quadratic),
+            np.where(linear > 0, constant / linear, 0.)
+        )
+        upper = np.where(
+            quadratic > 0,
+            (linear + root) / (2 * quadratic),
+            np.where(linear > 0, np.inf, np.where(linear < 0, constant / linear, np.inf))
+        )
+    has_band = np.where(
+        quadratic > 0,
+        (linear**2 > 4 * quadratic * constant) & (upper > 0),
+        np.where(linear == 0, constant < 0, upper > np.maximum(lower, 0))
+    )
+    lower = np.maximum(lower, 0.)
+
+    if discrete:
+        has_band &= lower < 4.
+        wave_number_lower = np.arccos(1 - np.clip(lower, 0., 4.) / 2.)
+        wave_number_upper = np.arccos(1 - np.clip(upper, 0., 4.) / 2.)
+    else:
+        wave_number_lower, wave_number_upper = np.sqrt(lower), np.sqrt(upper)
+    return np.where(has_band, wave_number_lower, np.nan), np.where(has_band, wave_number_upper, np.nan)
+
+
+def pattern_prediction(
+        interact_a=1.,
+        interact_b=-1.,
+        diffusion_coef=(1., 3.),
+        number_of_cells=50,
+        growth_tol=1e-10
+):
+    """
+    Predicts from the linear stability of the equilibrium whether a pattern forms, vectorized over all parameter
+    combinations that are given as arrays. An array is shared by both species, while a tuple such as (grid, grid)
+    or (grid, 1.) gives the values per species. The modes are those of a periodic one dimensional grid. The class is
+    given by the fastest growing mode: 'stable' if all modes decay, 'homogeneous' or 'oscillatory' if the uniform
+    mode grows fastest (without or with oscillation), and 'turing' or 'wave' for a spatial mode (stationary or
+    travelling pattern)
+    :param interact_a: Interaction coefficient of species a. Either shared or a tuple (species a, species b)
+    :param interact_b: Interaction coefficient of species b. Either shared or a tuple (species a, species b)
+    :param diffusion_coef: Diffusion coefficient. Either shared or a tuple (species a, species b)
+    :param number_of_cells: Number of cells of the grid
+    :param growth_tol: Growth rates above -growth_tol count as growing, such that neutral modes, whose fate is
+            decided by the non-linear terms, are not classified as stable
+    :return: Dictionary with the growth rate and wave number of the fastest mode, the wavelength (in cells) and
+            the oscillation frequency of the fastest mode, the class names, a flag whether a spatial pattern forms,
+            and the lower and upper wave number of the Turing band
+    """
+    wave_numbers = 2 * np.pi * np.fft.rfftfreq(number_of_cells)
+    laplacian_eigenvalues = laplacian_symbol((number_of_cells,))
+    growth = dispersion_relation(laplacian_eigenvalues, interact_a, interact_b, diffusion_coef)[..., 0]
+    fastest = growth.real.argmax(axis=-1)
+    fastest_growth = np.take_along_axis(growth, fastest[..., np.newaxis], axis=-1)[..., 0]
+
+    is_growing = fastest_growth.real > -growth_tol
+    is_oscillating = np.abs(fastest_growth.imag) > 0
+    is_spatial = fastest > 0
+    class_index = np.zeros(fastest.shape, dtype=int)
+    class_index[is_growing & ~is_spatial & ~is_oscillating] = 1
+    class_index[is_growing & ~is_spatial & is_oscillating] = 2
+    class_index[is_growing & is_spatial & ~is_oscillating] = 3
+    class_index[is_growing & is_spatial & is_oscillating] = 4
+
+    band_lower, band_upper = turing_band(interact_a, interact_b, diffusion_coef)
+    fastest_wave_number = wave_numbers[fastest]
+    with np.errstate(divide='ignore'):
+        wavelength = np.where(is_spatial, 2 * np.pi / fastest_wave_number, np.inf)
+    return {
+        'growth_rate': fastest_growth.real,
+        'wave_number': fastest_wave_number,
+        'wavelength': wavelength,
+        'frequency': np.abs(fastest_growth.imag),
+        'pattern_class': PATTERN_CLASSES[class_index],
+        'forms_pattern': is_growing & is_spatial,
+        'band_lower': band_lower,
+        'band_upper': band_upper
+    }
+
+
+def select_parameter_sets(
+        parameter_sets,
+        number_of_cells=50,
+        keep=('turing', 'wave'),
+        **fixed_params
+):
+    """
+    Prunes a parameter sweep to the parameter sets for which the linear stability predicts a class of interest,
+    by default the formation of a spatial pattern, such that simulations are only run where something can happen
+    :param parameter_sets: List of dictionaries with parameters of the ReactDiffStepper (see run_sweep)
+    :param number_of_cells: Number of cells of the grid
+    :param keep: Pattern classes whose parameter sets are kept
+    :param fixed_params: Parameters that are shared by all sets (interact_a, interact_b, diffusion_coef)
+    :return: List of the kept parameter sets and the prediction for all parameter sets
+    """
+    params = {'interact_a': 1., 'interact_b': -1., 'diffusion_coef': (1., 3.)}
+    params.update(fixed_params)
+    params.update(stack_parameters(parameter_sets, 0))
+    prediction = pattern_prediction(number_of_cells=number_of_cells, **params)
+    kept = [
+        parameter_set for parameter_set, pattern_class in zip(parameter_sets, prediction['pattern_class'])
+        if pattern_class in keep
+    ]
+    return kept, prediction
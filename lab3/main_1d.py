@@ -1,5 +1,9 @@
 #!/usr/bin/python3
 from reaction_diffusion import *
+from sweep import run_sweep
+from export import draw_history, export_histories
+from linear_stability import select_parameter_sets
+from phase_plane import reaction_field, draw_phase_portrait
 import matplotlib.pyplot as plt
 import numpy as np
 import matplotlib.colors as mcolors
@@ -10,7 +14,9 @@ def single_state_diff(
         time_step=0.1,
         number_timesteps=3000,
         diff_equi_a=0.14,
-        save_plots=True
+        save_plots=True,
+        record_rate=1,
+        max_snapshots=None
 ):
     """
     Implements the behaviro if a single cell is not in equilibrium
@@ -19,6 +25,8 @@ def single_state_diff(
     :param number_timesteps: Number of time steps
     :param diff_equi_a: The deviation from equilibrium for the single cell for the concentration of species a
     :param save_plots: Flag to determine whether to save or to plot the figures
+    :param record_rate: Number of time steps between two recorded states
+    :param max_snapshots: Maximal number of recorded states. If None, all recorded states are kept
     :return: None
     """
     time_array = np.arange(0, number_timesteps * time_step, time_step)
@@ -26,34 +34,22 @@ def single_state_diff(
     deviation_b = np.zeros(number_of_cells)
     deviation_a[np.random.randint(number_of_cells)] = diff_equi_a
 
-    history_a = [deviation_a]
-    history_b = [deviation_b]
-    for _ in time_array:
-        deviation_a_update, _ = react_diff(
-            deviation_a,
-            deviation_b,
-            diffusion_coef=1.,
-            dt=time_step
-        )
-        deviation_b_update, _ = react_diff(
-            deviation_a,
-            deviation_b,
-            diffusion_coef=3.,
-            is_a_substance=False,
-            dt=time_step
-        )
-        deviation_a = deviation_a_update
-        deviation_b = deviation_b_update
-
-        history_a.append(deviation_a)
-        history_b.append(deviation_b)
-
-    a_min, a_max = np.asarray(history_a).min(), np.asarray(history_a).max()
-    b_min, b_max = np.asarray(history_b).min(), np.asarray(history_b).max()
+    stepper = ReactDiffStepper(
+        deviation_a,
+        deviation_b,
+        diffusion_coef=(1., 3.),
+        dt=time_step
+    )
+    if max_snapshots is None:
+        max_snapshots = time_array.size // record_rate + 1
+    history = HistoryBuffer(deviation_a.shape, max_snapshots=max_snapshots, record_rate=record_rate)
+    stepper.run(time_array.size, history=history)
+
+    (a_min, b_min), (a_max, b_max) = history.minimum, history.maximum
     fig, (ax1, ax2) = plt.subplots(2, 1)
-    pc_a = ax1.pcolor(np.asarray(history_a), vmin=a_min, vmax=a_max)
+    pc_a = ax1.pcolor(history.snapshots(0), vmin=a_min, vmax=a_max)
     fig.colorbar(pc_a, ax=ax1)
-    pc_b = ax2.pcolor(np.asarray(history_b), vmin=b_min, vmax=b_max)
+    pc_b = ax2.pcolor(history.snapshots(1), vmin=b_min, vmax=b_max)
     fig.colorbar(pc_b, ax=ax2)
     fig.suptitle('One-dimensional reaction-diffusion system')
     ax1.set_ylabel('Time')
@@ -74,7 +70,9 @@ def random_state(
         time_step=0.1,
         number_timesteps=3000,
         rand_upper_bound=0.1,
-        save_plots=True
+        save_plots=True,
+        record_rate=1,
+        max_snapshots=None
 ):
     """
     Sets all cells to a random initial state
@@ -84,40 +82,30 @@ def random_state(
     :param rand_upper_bound: Upper bound of the random values for the species
             that are assigned to the cells
     :param save_plots: Flag to determine whether to save or to plot the figures
+    :param record_rate: Number of time steps between two recorded states
+    :param max_snapshots: Maximal number of recorded states. If None, all recorded states are kept
     :return: None
     """
     time_array = np.arange(0, number_timesteps * time_step, time_step)
 
     deviation_a = np.random.rand(number_of_cells) * rand_upper_bound
     deviation_b = np.random.rand(number_of_cells) * rand_upper_bound
-    history_a = [deviation_a]
-    history_b = [deviation_b]
-    for _ in time_array:
-        deviation_a_update, _ = react_diff(
-            deviation_a,
-            deviation_b,
-            diffusion_coef=1.,
-            dt=time_step
-        )
-        deviation_b_update, _ = react_diff(
-            deviation_a,
-            deviation_b,
-            diffusion_coef=3.,
-            is_a_substance=False,
-            dt=time_step
-        )
-        deviation_a = deviation_a_update
-        deviation_b = deviation_b_update
-
-        history_a.append(deviation_a)
-        history_b.append(deviation_b)
-
-    a_min, a_max = np.asarray(history_a).min(), np.asarray(history_a).max()
-    b_min, b_max = np.asarray(history_b).min(), np.asarray(history_b).max()
+    stepper = ReactDiffStepper(
+        deviation_a,
+        deviation_b,
+        diffusion_coef=(1., 3.),
+        dt=time_step
+    )
+    if max_snapshots is None:
+        max_snapshots = time_array.size // record_rate + 1
+    history = HistoryBuffer(deviation_a.shape, max_snapshots=max_snapshots, record_rate=record_rate)
+    stepper.run(time_array.size, history=history)
+
+    (a_min, b_min), (a_max, b_max) = history.minimum, history.maximum
     fig, (ax1, ax2) = plt.subplots(2, 1)
-    pc_a = ax1.pcolor(np.asarray(history_a), vmin=a_min, vmax=a_max)
+    pc_a = ax1.pcolor(history.snapshots(0), vmin=a_min, vmax=a_max)
     fig.colorbar(pc_a, ax=ax1)
-    pc_b = ax2.pcolor(np.asarray(history_b), vmin=b_min, vmax=b_max)
+    pc_b = ax2.pcolor(history.snapshots(1), vmin=b_min, vmax=b_max)
     fig.colorbar(pc_b, ax=ax2)
     fig.suptitle('One-dimensional reaction-diffusion system')
     ax1.set_ylabel('Time')
@@ -133,6 +121,17 @@ def random_state(
         plt.show()
 
 
+def _monitor_arguments(convergence_tol):
+    """
+    Arguments of run_sweep for early stopping
+    :param convergence_tol: Tolerance of the rate of change for a steady state or None to disable early stopping
+    :return: Dictionary of keyword arguments
+    """
+    if convergence_tol is None:
+        return {}
+    return {'monitor_kwargs': {'steady_tol': convergence_tol}}
+
+
 def diffusion_coeff_change(
         number_of_cells=50,
         time_step=0.1,
@@ -141,7 +140,11 @@ def diffusion_coeff_change(
         diff_a_range_upper_bound=5,
         diff_b_range_upper_bound=4,
         diff_range_step=0.5,
-        save_plots=True
+        save_plots=True,
+        num_processes=1,
+        convergence_tol=None,
+        prune=False,
+        max_snapshots=None
 ):
     """
     Diffusion coefficients are gradually changed to determine impact on the system
@@ -153,57 +156,46 @@ def diffusion_coeff_change(
     :param diff_b_range_upper_bound: Upper bound of the diffusion coefficients for species b
     :param diff_range_step: Step size between the diffusion coefficients
     :param save_plots: Flag to determine whether to save or to plot figures
+    :param num_processes: Number of processes among which the batched simulations are split
+    :param convergence_tol: Tolerance of the rate of change below which a pattern is steady. If given, the sweep
+            stops once all simulations reached a steady state or a periodic regime
+    :param prune: Flag to determine whether only parameter sets for which the linear stability predicts a pattern
+            are simulated
+    :param max_snapshots: Maximal number of recorded states per simulation. If None, all recorded states are kept
     :return: None
     """
     time_array = np.arange(0, number_timesteps * time_step, time_step)
 
     diff_a_range = np.arange(0, diff_a_range_upper_bound, diff_range_step)
     diff_b_range = np.arange(0, diff_b_range_upper_bound, diff_range_step)
-    for diff_a in diff_a_range:
-        for diff_b in diff_b_range:
-            deviation_a = np.random.rand(number_of_cells) * rand_upper_bound
-            deviation_b = np.random.rand(number_of_cells) * rand_upper_bound
-            history_a = [deviation_a]
-            history_b = [deviation_b]
-            for _ in time_array:
-                deviation_a_update, _ = react_diff(
-                    deviation_a,
-                    deviation_b,
-                    diffusion_coef=diff_a,
-                    dt=time_step
-                )
-                deviation_b_update, _ = react_diff(
-                    deviation_a,
-                    deviation_b,
-                    diffusion_coef=diff_b,
-                    is_a_substance=False,
-                    dt=time_step
-                )
-                deviation_a = deviation_a_update
-                deviation_b = deviation_b_update
-
-                history_a.append(deviation_a)
-                history_b.append(deviation_b)
-
-            a_min, a_max = np.asarray(history_a).min(), np.asarray(history_a).max()
-            b_min, b_max = np.asarray(history_b).min(), np.asarray(history_b).max()
-            fig, (ax1, ax2) = plt.subplots(2, 1)
-            pc_a = ax1.pcolor(np.asarray(history_a), vmin=a_min, vmax=a_max)
-            fig.colorbar(pc_a, ax=ax1)
-            pc_b = ax2.pcolor(np.asarray(history_b), vmin=b_min, vmax=b_max)
-            fig.colorbar(pc_b, ax=ax2)
-            fig.suptitle('One-dimensional reaction-diffusion system')
-            ax1.set_ylabel('Time')
-            ax1.set_title('Species A')
-            ax2.set_ylabel('Time')
-            ax2.set_title('Species B')
-            ax2.set_xlabel('Dimension')
-            fig.tight_layout(rect=[0, 0.03, 1, 0.95])
-
-            if save_plots:
-                plt.savefig('img/1d-diffusion_coeff_change-{0}-{1}.png'.format(diff_a, diff_b))
-            else:
-                plt.show()
+    parameter_sets = [
+        {'diffusion_coef': (diff_a, diff_b)} for diff_a in diff_a_range for diff_b in diff_b_range
+    ]
+    if prune:
+        parameter_sets, _ = select_parameter_sets(parameter_sets, number_of_cells=number_of_cells)
+        if not parameter_sets:
+            return
+    # All combinations are simulated together in one batch
+    histories_a, histories_b = run_sweep(
+        parameter_sets,
+        np.random.rand(len(parameter_sets), number_of_cells) * rand_upper_bound,
+        np.random.rand(len(parameter_sets), number_of_cells) * rand_upper_bound,
+        time_array.size,
+        dt=time_step,
+        num_processes=num_processes,
+        max_snapshots=max_snapshots,
+        **_monitor_arguments(convergence_tol)
+    )[:2]
+    # The figures are rendered headlessly in parallel and released after saving
+    if save_plots:
+        export_histories([
+            ('img/1d-diffusion_coeff_change-{0}-{1}.png'.format(*params['diffusion_coef']), history_a, history_b)
+            for params, history_a, history_b in zip(parameter_sets, histories_a, histories_b)
+        ])
+    else:
+        for history_a, history_b in zip(histories_a, histories_b):
+            draw_history(plt.figure(), history_a, history_b)
+            plt.show()
 
 
 def change_interact_b(
@@ -214,7 +206,11 @@ def change_interact_b(
         interact_b_start=-1,
         interact_b_end=-2,
         interact_range_step=-0.1,
-        save_plots=True
+        save_plots=True,
+        num_processes=1,
+        convergence_tol=None,
+        prune=False,
+        max_snapshots=None
 ):
     """
     Change influence of the concentration b
@@ -226,56 +222,46 @@ def change_interact_b(
     :param interact_b_end: End value of the interaction coefficients of b
     :param interact_range_step: Step size of the interaction coefficients of b
     :param save_plots: Flag to determine whether to save or to plot figures
+    :param num_processes: Number of processes among which the batched simulations are split
+    :param convergence_tol: Tolerance of the rate of change below which a pattern is steady. If given, the sweep
+            stops once all simulations reached a steady state or a periodic regime
+    :param prune: Flag to determine whether only parameter sets for which the linear stability predicts a pattern
+            are simulated
+    :param max_snapshots: Maximal number of recorded states per simulation. If None, all recorded states are kept
     :return: None
     """
     time_array = np.arange(0, number_timesteps * time_step, time_step)
     interact_b_range = np.arange(interact_b_start, interact_b_end, interact_range_step)
 
-    for interact_b in interact_b_range:
-        deviation_a = np.random.rand(number_of_cells) * rand_upper_bound
-        deviation_b = np.random.rand(number_of_cells) * rand_upper_bound
-        history_a = [deviation_a]
-        history_b = [deviation_b]
-
-        for _ in time_array:
-            deviation_a_update, _ = react_diff(
-                deviation_a,
-                deviation_b,
-                diffusion_coef=1.,
-                interact_b=interact_b,
-                dt=time_step
-            )
-            deviation_b_update, _ = react_diff(
-                deviation_a,
-                deviation_b,
-                diffusion_coef=3.,
-                is_a_substance=False,
-                dt=time_step
-            )
-            deviation_a = deviation_a_update
-            deviation_b = deviation_b_update
-
-            history_a.append(deviation_a)
-            history_b.append(deviation_b)
-
-        a_min, a_max = np.asarray(history_a).min(), np.asarray(history_a).max()
-        b_min, b_max = np.asarray(history_b).min(), np.asarray(history_b).max()
-        fig, (ax1, ax2) = plt.subplots(2, 1)
-        pc_a = ax1.pcolor(np.asarray(history_a), vmin=a_min, vmax=a_max)
-        fig.colorbar(pc_a, ax=ax1)
-        pc_b = ax2.pcolor(np.asarray(history_b), vmin=b_min, vmax=b_max)
-        fig.colorbar(pc_b, ax=ax2)
-        fig.suptitle('One-dimensional reaction-diffusion system')
-        ax1.set_ylabel('Time')
-        ax1.set_title('Species A')
-        ax2.set_ylabel('Time')
-        ax2.set_title('Species B')
-        ax2.set_xlabel('Dimension')
-        fig.tight_layout(rect=[0, 0.03, 1, 0.95])
-
-        if save_plots:
-            plt.savefig('img/1d-change_interact_b-{0}.png'.format(interact_b))
-        else:
+    parameter_sets = [{'interact_b': (interact_b, -1.)} for interact_b in interact_b_range]
+    if prune:
+        parameter_sets, _ = select_parameter_sets(
+            parameter_sets,
+            number_of_cells=number_of_cells,
+            diffusion_coef=(1., 3.)
+        )
+        if not parameter_sets:
+            return
+    histories_a, histories_b = run_sweep(
+        parameter_sets,
+        np.random.rand(len(parameter_sets), number_of_cells) * rand_upper_bound,
+        np.random.rand(len(parameter_sets), number_of_cells) * rand_upper_bound,
+        time_array.size,
+        dt=time_step,
+        num_processes=num_processes,
+        max_snapshots=max_snapshots,
+        diffusion_coef=(1., 3.),
+        **_monitor_arguments(convergence_tol)
+    )[:2]
+    # The figures are rendered headlessly in parallel and released after saving
+    if save_plots:
+        export_histories([
+            ('img/1d-change_interact_b-{0}.png'.format(params['interact_b'][0]), history_a, history_b)
+            for params, history_a, history_b in zip(parameter_sets, histories_a, histories_b)
+        ])
+    else:
+        for history_a, history_b in zip(histories_a, histories_b):
+            draw_history(plt.figure(), history_a, history_b)
             plt.show()
 
 
@@ -287,7 +273,11 @@ def change_interact_a(
         interact_a_start=1,
         interact_a_end=2,
         interact_range_step=0.1,
-        save_plots=True
+        save_plots=True,
+        num_processes=1,
+        convergence_tol=None,
+        prune=False,
+        max_snapshots=None
 ):
     """
     Change influence of the concentration b
@@ -299,56 +289,47 @@ def change_interact_a(
     :param interact_a_end: End value of the interaction coefficients of a
     :param interact_range_step: Step size of the interaction coefficients of a
     :param save_plots: Flag to determine whether to save or to plot figures
+    :param num_processes: Number of processes among which the batched simulations are split
+    :param convergence_tol: Tolerance of the rate of change below which a pattern is steady. If given, the sweep
+            stops once all simulations reached a steady state or a periodic regime
+    :param prune: Flag to determine whether only parameter sets for which the linear stability predicts a pattern
+            are simulated
+    :param max_snapshots: Maximal number of recorded states per simulation. If None, all recorded states are kept
     :return: None
     """
     time_array = np.arange(0, number_timesteps * time_step, time_step)
 
     interact_a_range = np.arange(interact_a_start, interact_a_end, interact_range_step)
 
-    for interact_a in interact_a_range:
-        deviation_a = np.random.rand(number_of_cells) * rand_upper_bound
-        deviation_b = np.random.rand(number_of_cells) * rand_upper_bound
-        history_a = [deviation_a]
-        history_b = [deviation_b]
-        for _ in time_array:
-            deviation_a_update, _ = react_diff(
-                deviation_a,
-                deviation_b,
-                interact_a=interact_a,
-                diffusion_coef=1.,
-                dt=time_step
-            )
-            deviation_b_update, _ = react_diff(
-                deviation_a,
-                deviation_b,
-                diffusion_coef=3.,
-                is_a_substance=False,
-                dt=time_step
-            )
-            deviation_a = deviation_a_update
-            deviation_b = deviation_b_update
-
-            history_a.append(deviation_a)
-            history_b.append(deviation_b)
-
-        a_min, a_max = np.asarray(history_a).min(), np.asarray(history_a).max()
-        b_min, b_max = np.asarray(history_b).min(), np.asarray(history_b).max()
-        fig, (ax1, ax2) = plt.subplots(2, 1)
-        pc_a = ax1.pcolor(np.asarray(history_a), vmin=a_min, vmax=a_max)
-        fig.colorbar(pc_a, ax=ax1)
-        pc_b = ax2.pcolor(np.asarray(history_b), vmin=b_min, vmax=b_max)
-        fig.colorbar(pc_b, ax=ax2)
-        fig.suptitle('One-dimensional reaction-diffusion system')
-        ax1.set_ylabel('Time')
-        ax1.set_title('Species A')
-        ax2.set_ylabel('Time')
-        ax2.set_title('Species B')
-        ax2.set_xlabel('Dimension')
-        fig.tight_layout(rect=[0, 0.03, 1, 0.95])
-
-        if save_plots:
-            plt.savefig('img/1d-change_interact_a-{0}.png'.format(interact_a))
-        else:
+    parameter_sets = [{'interact_a': (interact_a, 1.)} for interact_a in interact_a_range]
+    if prune:
+        parameter_sets, _ = select_parameter_sets(
+            parameter_sets,
+            number_of_cells=number_of_cells,
+            diffusion_coef=(1., 3.)
+        )
+        if not parameter_sets:
+            return
+    histories_a, histories_b = run_sweep(
+        parameter_sets,
+        np.random.rand(len(parameter_sets), number_of_cells) * rand_upper_bound,
+        np.random.rand(len(parameter_sets), number_of_cells) * rand_upper_bound,
+        time_array.size,
+        dt=time_step,
+        num_processes=num_processes,
+        max_snapshots=max_snapshots,
+        diffusion_coef=(1., 3.),
+        **_monitor_arguments(convergence_tol)
+    )[:2]
+    # The figures are rendered headlessly in parallel and released after saving
+    if save_plots:
+        export_histories([
+            ('img/1d-change_interact_a-{0}.png'.format(params['interact_a'][0]), history_a, history_b)
+            for params, history_a, history_b in zip(parameter_sets, histories_a, histories_b)
+        ])
+    else:
+        for history_a, history_b in zip(histories_a, histories_b):
+            draw_history(plt.figure(), history_a, history_b)
             plt.show()
 
 
@@ -382,27 +363,17 @@ def phase_portrait(
 
     plt.clf()
     for num, color in enumerate(list(mcolors.BASE_COLORS)[:trials]):
-        phase_plane_vecs_a = []
-        phase_plane_vecs_b = []
         deviation_a = np.random.rand(1)*rand_upper_bound
         deviation_b = np.random.rand(1)*rand_upper_bound
-        for interact_a in interact_a_range:
-            for interact_b in interact_b_range:
-                _, differential_a = react_diff(
-                    deviation_a,
-                    deviation_b,
-                    interact_a=interact_a,
-                    interact_b=interact_b
-                )
-                _, differential_b = react_diff(
-                    deviation_a,
-                    deviation_b,
-                    diffusion_coef=3.,
-                    is_a_substance=False
-                )
-
-                phase_plane_vecs_a.append(differential_a)
-                phase_plane_vecs_b.append(differential_b)
+        # The whole grid of interaction coefficients of species a is evaluated in one broadcast call. Species b
+        # keeps the default coefficients
+        phase_plane_vecs_a, phase_plane_vecs_b = reaction_field(
+            deviation_a,
+            deviation_b,
+            interact_a=(A, 1.),
+            interact_b=(B, -1.)
+        )
+        phase_plane_vecs_b = np.broadcast_to(phase_plane_vecs_b, A.shape)
 
         plt.quiver(A, B, phase_plane_vecs_a, phase_plane_vecs_b, color=color,
                    label='Trial {:}: a: {:.2f}, b: {:.2f}'.format(num, deviation_a[0], deviation_b[0]))
@@ -417,11 +388,63 @@ def phase_portrait(
         plt.show()
 
 
+def phase_plane(
+        a_range=(-3., 3.),
+        b_range=(-3., 3.),
+        num_points=(316, 316),
+        num_trajectories=50,
+        number_timesteps=2000,
+        time_step=0.01,
+        interact_a=1.,
+        interact_b=-1.,
+        nonlin_break=0.1,
+        save_plots=True
+):
+    """
+    Plots the phase portrait of the well-mixed reaction system over the states of both species, together with the
+    nullclines and the trajectories of random initial states
+    :param a_range: Lower and upper bound of species a
+    :param b_range: Lower and upper bound of species b
+    :param num_points: Number of grid points along a and b at which the vector field is evaluated
+    :param num_trajectories: Number of trajectories that are integrated together
+    :param number_timesteps: Number of time steps of the trajectories
+    :param time_step: Margin of the time steps
+    :param interact_a: Interaction coefficient of species a. Either shared or a pair (species a, species b)
+    :param interact_b: Interaction coefficient of species b. Either shared or a pair (species a, species b)
+    :param nonlin_break: Non-linear breakdown. Either shared or a pair (species a, species b)
+    :param save_plots: Flag to determine whether to save or to plot figures
+    :return: None
+    """
+    initial_states = np.stack([
+        np.random.uniform(a_range[0], a_range[1], num_trajectories),
+        np.random.uniform(b_range[0], b_range[1], num_trajectories)
+    ])
+    fig, ax = plt.subplots()
+    draw_phase_portrait(
+        ax,
+        a_range=a_range,
+        b_range=b_range,
+        num_points=num_points,
+        initial_states=initial_states,
+        number_timesteps=number_timesteps,
+        dt=time_step,
+        interact_a=interact_a,
+        interact_b=interact_b,
+        nonlin_break=nonlin_break
+    )
+    fig.suptitle('Phase portrait of the reaction system')
+    if save_plots:
+        plt.savefig('img/1d-phase_plane.png')
+    else:
+        plt.show()
+
+
 if __name__ == '__main__':
     # single_state_diff(save_plots=False)
     # random_state(save_plots=False)
     # diffusion_coeff_change(save_plots=True)
     # change_interact_b(save_plots=True)
     # change_interact_a(save_plots=True)
+    # phase_plane(save_plots=False)
     phase_portrait(save_plots=False)
 
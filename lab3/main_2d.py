@@ -1,7 +1,55 @@
 #!/usr/bin/python3
 from reaction_diffusion import *
+from semi_implicit import IMEXStepper
+from parallel import DecomposedStepper
+from active_region import ActiveRegionStepper
+from multi_species import MultiSpeciesStepper, cubic_breakdown
+from next_subvolume import NextSubvolumeSimulator
+from rendering import SnapshotRenderer
+from checkpoint import save_checkpoint, load_checkpoint
+import os
 import numpy as np
-import matplotlib.pyplot as plt
+
+
+def _resume(checkpoint_path, stepper_class, deviation_a, deviation_b, **stepper_kwargs):
+    """
+    Resumes the stepper from the checkpoint if it exists, otherwise a new stepper is created
+    :param checkpoint_path: Checkpoint file or None
+    :param stepper_class: Class of the new stepper
+    :param deviation_a: Initial deviation of the equilibrium of species a
+    :param deviation_b: Initial deviation of the equilibrium of species b
+    :param stepper_kwargs: Parameters of the new stepper
+    :return: The stepper
+    """
+    if checkpoint_path is not None and os.path.exists(checkpoint_path):
+        return load_checkpoint(checkpoint_path)
+    return stepper_class(deviation_a, deviation_b, **stepper_kwargs)
+
+
+def _advance(stepper, number_timesteps, snap_shot_rate, snapshot, checkpoint_path=None, checkpoint_rate=1000):
+    """
+    Advances a stepper in chunks of steps up to the next snapshot or checkpoint. Every call of step has a fixed
+    cost, e.g. a round trip to the workers of the DecomposedStepper, which is paid once per chunk
+    :param stepper: Reaction diffusion stepper
+    :param number_timesteps: Total number of time steps, including those of a resumed run
+    :param snap_shot_rate: Number of time steps between two snapshots
+    :param snapshot: Function without arguments that submits the current state to the renderer
+    :param checkpoint_path: File to which the state is saved regularly or None
+    :param checkpoint_rate: Number of time steps between two checkpoints
+    :return: None
+    """
+    snapshot()
+    while stepper.num_steps < number_timesteps:
+        stop = min(number_timesteps, (stepper.num_steps // snap_shot_rate + 1) * snap_shot_rate)
+        if checkpoint_path is not None:
+            stop = min(stop, (stepper.num_steps // checkpoint_rate + 1) * checkpoint_rate)
+        stepper.step(stop - stepper.num_steps)
+        if stepper.num_steps % snap_shot_rate == 0:
+            snapshot()
+        if checkpoint_path is not None and stepper.num_steps % checkpoint_rate == 0:
+            save_checkpoint(checkpoint_path, stepper)
+    if checkpoint_path is not None:
+        save_checkpoint(checkpoint_path, stepper)
 
 
 def random_state(
@@ -9,7 +57,14 @@ def random_state(
         time_step=0.01,
         number_timesteps=3000,
         rand_upper_bound=0.1,
-        snap_shot_rate=100
+        snap_shot_rate=100,
+        semi_implicit=False,
+        num_workers=1,
+        dtype=np.float64,
+        render_mode='live',
+        output_path=None,
+        checkpoint_path=None,
+        checkpoint_rate=1000
 ):
     """
     Two dimensional reaction diffusion system that starts with a random initial state
@@ -18,41 +73,58 @@ def random_state(
     :param number_timesteps: Number of time steps
     :param rand_upper_bound: Upper bound for random initial values
     :param snap_shot_rate: Rate that determines how frequently the system state is plotted
+    :param semi_implicit: Flag to determine whether diffusion is treated implicitly, which allows larger time steps
+    :param num_workers: Number of processes among which the grid is split. Only used for the explicit update
+    :param dtype: Data type of the fields of the explicit update. np.float32 halves the memory traffic on large
+            grids, its accuracy can be checked with precision.compare_precision
+    :param render_mode: Either 'live' to show the snapshots, or 'gif' or 'video' to encode them to a file
+    :param output_path: Output file for the render modes 'gif' and 'video'
+    :param checkpoint_path: File to which the state is saved regularly. If it exists, the run resumes from it
+    :param checkpoint_rate: Number of time steps between two checkpoints
     :return: None
     """
-    time_array = np.arange(0, number_timesteps * time_step, time_step)
-
     deviation_a = np.random.rand(shape[0], shape[1]) * rand_upper_bound
     deviation_b = np.random.rand(shape[0], shape[1]) * rand_upper_bound
 
-    for num, _ in enumerate(time_array):
-        deviation_a_update, _ = react_diff(
-            deviation_a,
-            deviation_b,
-            diffusion_coef=1.,
-            dt=time_step,
-            is_1d=False
+    if semi_implicit:
+        stepper_class, stepper_kwargs = IMEXStepper, {}
+    elif num_workers > 1:
+        stepper_class, stepper_kwargs = DecomposedStepper, {'num_workers': num_workers, 'dtype': dtype}
+    else:
+        stepper_class, stepper_kwargs = ReactDiffStepper, {'dtype': dtype}
+    stepper = _resume(
+        checkpoint_path,
+        stepper_class,
+        deviation_a,
+        deviation_b,
+        diffusion_coef=(1., 3.),
+        dt=time_step,
+        **stepper_kwargs
+    )
+    renderer = None
+    try:
+        # Snapshots are rendered in a separate process, the loop only hands them over
+        renderer = SnapshotRenderer(
+            titles=('Species A',),
+            mode=render_mode,
+            path=output_path,
+            suptitle='Two dimensional reaction diffusion system w/ random start state',
+            drop_when_full=render_mode == 'live'
         )
-        deviation_b_update, _ = react_diff(
-            deviation_a,
-            deviation_b,
-            diffusion_coef=3.,
-            is_a_substance=False,
-            dt=time_step,
-            is_1d=False
+        _advance(
+            stepper,
+            number_timesteps,
+            snap_shot_rate,
+            lambda: renderer.submit(stepper.time, stepper.deviation_a),
+            checkpoint_path,
+            checkpoint_rate
         )
-        deviation_a = deviation_a_update
-        deviation_b = deviation_b_update
-
-        plt.xlabel('X direction')
-        plt.ylabel('Y direction')
-        plt.title('Two dimensional reaction diffusion system w/ random start state')
-        if num % snap_shot_rate == 0:
-            plt.imshow(deviation_a)
-            plt.pause(0.1)
-            plt.draw()
-
-    plt.show()
+    finally:
+        # The workers, the shared memory and the renderer are released even if the run is interrupted
+        if isinstance(stepper, DecomposedStepper):
+            stepper.close()
+        if renderer is not None:
+            renderer.close()
 
 
 def single_high_a_state(
@@ -61,7 +133,15 @@ def single_high_a_state(
         num_changed_states=1,
         number_timesteps=3000,
         snap_shot_rate=100,
-        initial_value=0.14
+        initial_value=0.14,
+        semi_implicit=False,
+        num_workers=1,
+        active_tol=None,
+        dtype=np.float64,
+        render_mode='live',
+        output_path=None,
+        checkpoint_path=None,
+        checkpoint_rate=1000
 ):
     """
     Two dimensional reaction diffusion system that starts with single cells with initial high values
@@ -72,10 +152,18 @@ def single_high_a_state(
     :param num_changed_states: Number of states that are changed
     :param snap_shot_rate: Rate that determines how frequently the system state is plotted
     :param initial_value: Inital value for species a
+    :param semi_implicit: Flag to determine whether diffusion is treated implicitly, which allows larger time steps
+    :param num_workers: Number of processes among which the grid is split. Only used for the explicit update
+    :param active_tol: If given, the explicit update is restricted to the region around the perturbed cells, and
+            deviations up to this value are negligible (see ActiveRegionStepper)
+    :param dtype: Data type of the fields of the explicit update. np.float32 halves the memory traffic on large
+            grids, its accuracy can be checked with precision.compare_precision
+    :param render_mode: Either 'live' to show the snapshots, or 'gif' or 'video' to encode them to a file
+    :param output_path: Output file for the render modes 'gif' and 'video'
+    :param checkpoint_path: File to which the state is saved regularly. If it exists, the run resumes from it
+    :param checkpoint_rate: Number of time steps between two checkpoints
     :return: None
     """
-    time_array = np.arange(0, number_timesteps * time_step, time_step)
-
     deviation_a = np.zeros(shape)
     deviation_b = np.zeros(shape)
 
@@ -85,54 +173,157 @@ def single_high_a_state(
             index = np.random.randint(shape[0]), np.random.randint(1)
         deviation_a[index] = initial_value
 
-    for num, _ in enumerate(time_array):
-        deviation_a_update, _ = react_diff(
-            deviation_a,
-            deviation_b,
-            diffusion_coef=1.,
-            dt=time_step,
-            is_1d=False
+    if semi_implicit:
+        stepper_class, stepper_kwargs = IMEXStepper, {}
+    elif num_workers > 1:
+        stepper_class, stepper_kwargs = DecomposedStepper, {'num_workers': num_workers, 'dtype': dtype}
+    elif active_tol is not None:
+        stepper_class, stepper_kwargs = ActiveRegionStepper, {'active_tol': active_tol, 'dtype': dtype}
+    else:
+        stepper_class, stepper_kwargs = ReactDiffStepper, {'dtype': dtype}
+    stepper = _resume(
+        checkpoint_path,
+        stepper_class,
+        deviation_a,
+        deviation_b,
+        diffusion_coef=(1., 3.),
+        dt=time_step,
+        **stepper_kwargs
+    )
+    renderer = None
+    try:
+        renderer = SnapshotRenderer(
+            titles=('Species A', 'Species B'),
+            mode=render_mode,
+            path=output_path,
+            suptitle='Two dimensional reaction diffusion system w/ single high value for species A',
+            drop_when_full=render_mode == 'live'
         )
-        deviation_b_update, _ = react_diff(
-            deviation_a,
-            deviation_b,
-            diffusion_coef=3.,
-            is_a_substance=False,
-            dt=time_step,
-            is_1d=False
+        _advance(
+            stepper,
+            number_timesteps,
+            snap_shot_rate,
+            lambda: renderer.submit(stepper.time, stepper.deviation_a, stepper.deviation_b),
+            checkpoint_path,
+            checkpoint_rate
         )
-        deviation_a = deviation_a_update
-        deviation_b = deviation_b_update
-
-        plt.figure(1)
-        plt.xlabel('X direction')
-        plt.ylabel('Y direction')
-        plt.title('Two dimensional reaction diffusion system w/ \n'
-                  'single high value for species A. Plot species A')
-
-        plt.figure(2)
-        plt.xlabel('X direction')
-        plt.ylabel('Y direction')
-        plt.title('Two dimensional reaction diffusion system w/ \n'
-                  'single high value for species A. Plot species B')
-        if num % snap_shot_rate == 0:
-            plt.figure(1)
-            plt.imshow(deviation_a)
-            plt.pause(0.1)
-            plt.draw()
-
-            plt.figure(2)
-            plt.imshow(deviation_b)
-            plt.pause(0.1)
-            plt.draw()
-
-    plt.show()
+    finally:
+        # The workers, the shared memory and the renderer are released even if the run is interrupted
+        if isinstance(stepper, DecomposedStepper):
+            stepper.close()
+        if renderer is not None:
+            renderer.close()
+
+
+def multi_species_state(
+        shape=(50, 50),
+        interaction=((1., -1., 0.), (1., -1., 0.), (0.5, 0., -1.)),
+        diffusion_coef=(1., 3., 6.),
+        nonlin_break=0.1,
+        time_step=0.01,
+        number_timesteps=3000,
+        rand_upper_bound=0.1,
+        snap_shot_rate=100,
+        render_mode='live',
+        output_path=None
+):
+    """
+    Two dimensional reaction diffusion system with any number of species that starts with a random initial state
+    :param shape: Shape of the two dim plain
+    :param interaction: Interaction matrix. Entry (k, j) is the effect of species j on species k
+    :param diffusion_coef: Diffusion coefficient of every species
+    :param nonlin_break: Non-linear breakdown. Either shared or one value per species
+    :param time_step: Margin of the time steps
+    :param number_timesteps: Number of time steps
+    :param rand_upper_bound: Upper bound for random initial values
+    :param snap_shot_rate: Rate that determines how frequently the system state is plotted
+    :param render_mode: Either 'live' to show the snapshots, or 'gif' or 'video' to encode them to a file
+    :param output_path: Output file for the render modes 'gif' and 'video'
+    :return: None
+    """
+    num_species = len(interaction)
+    species = np.random.rand(num_species, shape[0], shape[1]) * rand_upper_bound
+    stepper = MultiSpeciesStepper(
+        species,
+        interaction,
+        diffusion_coef=diffusion_coef,
+        nonlinear=cubic_breakdown(nonlin_break),
+        dt=time_step
+    )
+    renderer = SnapshotRenderer(
+        titles=['Species %d' % (num + 1) for num in range(num_species)],
+        mode=render_mode,
+        path=output_path,
+        suptitle='Two dimensional reaction diffusion system w/ %d species' % num_species,
+        drop_when_full=render_mode == 'live'
+    )
+    try:
+        _advance(stepper, number_timesteps, snap_shot_rate, lambda: renderer.submit(stepper.time, *stepper.species))
+    finally:
+        renderer.close()
+
+
+def stochastic_state(
+        shape=(20, 20),
+        system_size=10.,
+        end_time=50.,
+        snap_shot_interval=5.,
+        rand_upper_bound=0.1,
+        seed=None,
+        render_mode='live',
+        output_path=None
+):
+    """
+    Two dimensional stochastic reaction diffusion system that starts with a random initial state. Molecular noise
+    is stronger for smaller system sizes
+    :param shape: Shape of the two dim plain
+    :param system_size: Number of molecules per unit of concentration in one cell
+    :param end_time: Time at which the simulation stops
+    :param snap_shot_interval: Time between two plotted system states
+    :param rand_upper_bound: Upper bound for random initial values
+    :param seed: Seed of the random number generator of the simulation
+    :param render_mode: Either 'live' to show the snapshots, or 'gif' or 'video' to encode them to a file
+    :param output_path: Output file for the render modes 'gif' and 'video'
+    :return: None
+    """
+    deviation_a = np.random.rand(shape[0], shape[1]) * rand_upper_bound
+    deviation_b = np.random.rand(shape[0], shape[1]) * rand_upper_bound
+
+    simulator = NextSubvolumeSimulator(
+        deviation_a,
+        deviation_b,
+        diffusion_coef=(1., 3.),
+        system_size=system_size,
+        seed=seed
+    )
+    renderer = SnapshotRenderer(
+        titles=('Species A', 'Species B'),
+        mode=render_mode,
+        path=output_path,
+        suptitle='Two dimensional stochastic reaction diffusion system',
+        drop_when_full=render_mode == 'live'
+    )
+    try:
+        for sample_time in np.arange(snap_shot_interval, end_time + snap_shot_interval / 2., snap_shot_interval):
+            simulator.advance(sample_time)
+            renderer.submit(simulator.time, simulator.deviation_a, simulator.deviation_b)
+    finally:
+        renderer.close()
 
 
 if __name__ == '__main__':
     # random_state(shape=(50, 50), number_timesteps=7000, snap_shot_rate=200, time_step=0.005)
     # random_state(shape=(50, 10), number_timesteps=5000, snap_shot_rate=1000)
     # single_high_a_state(number_timesteps=5000, snap_shot_rate=1000, num_changed_states=1)
+    # single_high_a_state(shape=(400, 400), number_timesteps=5000, snap_shot_rate=500, active_tol=1e-12)
+    # random_state(shape=(50, 50), number_timesteps=350, snap_shot_rate=10, time_step=0.1, semi_implicit=True)
+    # random_state(shape=(1000, 1000), number_timesteps=3000, snap_shot_rate=500, time_step=0.01, num_workers=4)
+    # random_state(shape=(1000, 1000), number_timesteps=3000, snap_shot_rate=500, time_step=0.01, dtype=np.float32)
+    # multi_species_state(shape=(50, 50), number_timesteps=5000, snap_shot_rate=500)
+    # stochastic_state(shape=(20, 20), system_size=10., end_time=50., snap_shot_interval=5.)
+    # random_state(shape=(50, 50), number_timesteps=7000, snap_shot_rate=50, render_mode='gif', output_path='rd.gif')
+    # random_state(shape=(200, 200), number_timesteps=100000, render_mode='gif', output_path='rd.gif',
+    #              checkpoint_path='rd_checkpoint.npz')
     single_high_a_state(
         shape=(50, 50),
         number_timesteps=7000,
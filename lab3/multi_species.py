@@ -0,0 +1,191 @@
+#!/usr/bin/python3
+import numpy as np
+from reaction_diffusion import BOUNDARIES, fill_ghost_cells, interior, nabla_sq_padded
+
+
+def _species_column(value, num_species, grid_ndim, dtype=np.float64):
+    """
+    Expands a per species parameter such that it broadcasts against fields with shape (K, *grid)
+    :param value: Scalar that is shared by all species or one value per species
+    :param num_species: Number of species K
+    :param grid_ndim: Number of dimensions of the grid
+    :param dtype: Data type of the parameter
+    :return: Array with shape (K, 1, ..., 1)
+    """
+    value = np.asarray(value, dtype=dtype)
+    if value.ndim == 0:
+        value = np.full(num_species, value, dtype=dtype)
+    if value.shape != (num_species,):
+        raise ValueError('Expected one value per species, i.e. %d values' % num_species)
+    return value.reshape((num_species,) + (1,) * grid_ndim)
+
+
+def cubic_breakdown(nonlin_break=0.1):
+    """
+    Non-linear breakdown -nonlin_break_k * s_k^3 of every species, as in react_diff
+    :param nonlin_break: Breakdown coefficient. Either shared or one value per species
+    :return: Non-linear reaction term, i.e. a function (species, out) that writes the terms of all species into out
+    """
+    def breakdown(species, out):
+        coefficients = _species_column(nonlin_break, species.shape[0], species.ndim - 1, species.dtype)
+        np.multiply(species, species, out=out)
+        out *= species
+        out *= -coefficients
+        return out
+    return breakdown
+
+
+def react_diff_multi(
+        species,
+        interaction,
+        diffusion_coef=1.,
+        nonlinear=None,
+        dt=0.1,
+        stencil=None,
+        boundary='periodic',
+        boundary_value=0.
+):
+    """
+    Equation describing the dynamics of a reaction diffusion system with K species, which are updated together.
+    The change of species k is sum_j interaction[k, j] * s_j + nonlinear(s)_k + diffusion_coef[k] * nabla^2 s_k
+    :param species: Deviations of the equilibrium of all species, stacked to shape (K, *grid)
+    :param interaction: Interaction matrix with shape (K, K). Entry (k, j) is the effect of species j on species k
+    :param diffusion_coef: Diffusion coefficient. Either shared or one value per species
+    :param nonlinear: Non-linear reaction terms, a function (species, out) that writes the terms of all species
+            into out (e.g. cubic_breakdown). If None, the reaction is linear
+    :param dt: Change in time
+    :param stencil: Name of the stencil of the second derivative (see STENCILS)
+    :param boundary: Boundary condition. Either 'periodic', 'neumann' or 'dirichlet'
+    :param boundary_value: Value of the deviation outside of the domain for Dirichlet boundaries. Either shared or
+            one value per species
+    :return: Updated species and the change of the species, both with shape (K, *grid)
+    """
+    species = np.asarray(species, dtype=float)
+    num_species, grid_ndim = species.shape[0], species.ndim - 1
+    interaction = np.asarray(interaction, dtype=float)
+    if interaction.shape != (num_species, num_species):
+        raise ValueError('The interaction matrix needs to have the shape (%d, %d)' % (num_species, num_species))
+
+    padded = np.pad(species, [(0, 0)] + [(1, 1)] * grid_ndim)
+    value = boundary_value if np.ndim(boundary_value) == 0 else _species_column(
+        boundary_value, num_species, grid_ndim - 1
+    )
+    fill_ghost_cells(padded, boundary, value, axes=range(1, padded.ndim))
+    delta = nabla_sq_padded(padded, stencil=stencil, batch_ndim=1)
+    delta *= _species_column(diffusion_coef, num_species, grid_ndim)
+    delta += np.einsum('kj,j...->k...', interaction, species)
+    if nonlinear is not None:
+        delta += nonlinear(species, np.empty_like(species))
+    return species + delta * dt, delta * dt
+
+
+class MultiSpeciesStepper:
+    """
+    Reaction diffusion system with K species that are stacked into one array with shape (K, *grid) and advanced
+    in place. The species are coupled linearly by a KxK interaction matrix, every species has its own diffusion
+    coefficient, and the non-linear reaction terms are pluggable. A step treats all species in one vectorized
+    pass: the species axis is a batch axis of the second derivative, and the linear coupling is a single
+    contraction over the species axis. As for the ReactDiffStepper, the species live in a buffer that is padded
+    by one layer of ghost cells, and every step reuses the same scratch arrays
+    """
+    def __init__(
+            self,
+            species,
+            interaction,
+            diffusion_coef=1.,
+            nonlinear=None,
+            dt=0.1,
+            stencil=None,
+            boundary='periodic',
+            boundary_value=0.,
+            dtype=np.float64
+    ):
+        """
+        Constructor
+        :param species: Initial deviations of the equilibrium of all species with shape (K, *grid)
+        :param interaction: Interaction matrix with shape (K, K). Entry (k, j) is the effect of species j on
+                species k
+        :param diffusion_coef: Diffusion coefficient. Either shared or one value per species
+        :param nonlinear: Non-linear reaction terms, a function (species, out) that writes the terms of all species
+                into out (e.g. cubic_breakdown). If None, the reaction is linear
+        :param dt: Change in time
+        :param stencil: Name of the stencil of the second derivative (see STENCILS)
+        :param boundary: Boundary condition. Either 'periodic', 'neumann' or 'dirichlet'
+        :param boundary_value: Value of the deviation outside of the domain for Dirichlet boundaries. Either shared
+                or one value per species
+        :param dtype: Data type of the fields and the parameters, e.g. np.float32
+        """
+        dtype = np.dtype(dtype)
+        species = np.asarray(species, dtype=dtype)
+        num_species, grid_ndim = species.shape[0], species.ndim - 1
+        interaction = np.asarray(interaction, dtype=dtype)
+        if interaction.shape != (num_species, num_species):
+            raise ValueError('The interaction matrix needs to have the shape (%d, %d)' % (num_species, num_species))
+        if boundary not in BOUNDARIES:
+            raise ValueError('Boundary condition %s is not supported. Choose one of %s' % (boundary, BOUNDARIES))
+
+        self._padded = np.zeros((num_species,) + tuple(length + 2 for length in species.shape[1:]), dtype=dtype)
+        self.species = self._padded[interior(species.ndim, batch_ndim=1)]
+        self.species[...] = species
+
+        self.num_species = num_species
+        self.interaction = interaction
+        self.diffusion_coef = _species_column(diffusion_coef, num_species, grid_ndim, dtype)
+        self.nonlinear = nonlinear
+        self.dt = dt
+        self.stencil = stencil
+        self.boundary = boundary
+        # The ghost cells of one face have one dimension less than the padded buffer
+        self.boundary_value = np.asarray(boundary_value, dtype=dtype)[()] if np.ndim(boundary_value) == 0 else \
+            _species_column(boundary_value, num_species, grid_ndim - 1, dtype)
+        self.time = 0.
+        self.num_steps = 0
+
+        self.increment = np.zeros_like(self.species)
+        self._scratch = np.empty_like(self.species)
+
+    def rate(self, out):
+        """
+        Computes the change in time (delta) of all species into the output buffer
+        :param out: Output buffer with shape (K, *grid)
+        :return: The output buffer
+        """
+        scratch = self._scratch
+        fill_ghost_cells(self._padded, self.boundary, self.boundary_value, axes=range(1, self._padded.ndim))
+        nabla_sq_padded(self._padded, out=out, stencil=self.stencil, scratch=scratch, batch_ndim=1)
+        out *= self.diffusion_coef
+
+        np.einsum('kj,j...->k...', self.interaction, self.species, out=scratch)
+        out += scratch
+        if self.nonlinear is not None:
+            out += self.nonlinear(self.species, scratch)
+        return out
+
+    def step(self, num_steps=1):
+        """
+        Advances all species in place
+        :param num_steps: Number of time steps
+        :return: None
+        """
+        for _ in range(num_steps):
+            self.rate(self.increment)
+            self.increment *= self.dt
+            self.species += self.increment
+            self.time += self.dt
+            self.num_steps += 1
+
+    def run(self, num_steps, history=None):
+        """
+        Advances all species and records them after every step
+        :param num_steps: Number of time steps
+        :param history: HistoryBuffer with one field per species. If it is empty, the current state is recorded
+                first
+        :return: The history
+        """
+        if history is not None and history.num_snapshots == 0:
+            history.record(self.time, *self.species)
+        for _ in range(num_steps):
+            self.step()
+            if history is not None:
+                history.record(self.time, *self.species)
+        return history
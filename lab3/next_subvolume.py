@@ -0,0 +1,325 @@
+#!/usr/bin/python3
+import math
+import numpy as np
+from reaction_diffusion import species_pair
+
+
+STOCHASTIC_BOUNDARIES = ('periodic', 'neumann')
+
+
+class IndexedPriorityQueue:
+    """
+    Binary min-heap over a fixed set of items whose keys can be changed. The position of every item in the heap is
+    stored, such that changing the key of an item costs O(log n) and the item with the smallest key is found in
+    O(1). The heap is kept in plain lists, since single elements of lists are accessed much faster than those of
+    numpy arrays
+    """
+    def __init__(self, keys):
+        """
+        Constructor
+        :param keys: Initial key of every item
+        """
+        self.keys = [float(key) for key in keys]
+        self._heap = sorted(range(len(self.keys)), key=self.keys.__getitem__)
+        self._position = [0] * len(self.keys)
+        for position, item in enumerate(self._heap):
+            self._position[item] = position
+
+    def top(self):
+        """
+        :return: Item with the smallest key and its key
+        """
+        item = self._heap[0]
+        return item, self.keys[item]
+
+    def update(self, item, key):
+        """
+        Changes the key of an item and restores the heap order
+        :param item: Index of the item
+        :param key: New key
+        :return: None
+        """
+        old_key = self.keys[item]
+        self.keys[item] = key
+        if key < old_key:
+            self._sift_up(self._position[item])
+        else:
+            self._sift_down(self._position[item])
+
+    def _swap(self, position, other):
+        """
+        Swaps two entries of the heap
+        :param position: Position of the first entry
+        :param other: Position of the second entry
+        :return: None
+        """
+        heap = self._heap
+        heap[position], heap[other] = heap[other], heap[position]
+        self._position[heap[position]] = position
+        self._position[heap[other]] = other
+
+    def _sift_up(self, position):
+        """
+        Moves an entry towards the root until its parent has a smaller key
+        :param position: Position of the entry
+        :return: None
+        """
+        heap, keys = self._heap, self.keys
+        while position > 0:
+            parent = (position - 1) // 2
+            if keys[heap[parent]] <= keys[heap[position]]:
+                break
+            self._swap(position, parent)
+            position = parent
+
+    def _sift_down(self, position):
+        """
+        Moves an entry towards the leaves until both children have larger keys
+        :param position: Position of the entry
+        :return: None
+        """
+        heap, keys = self._heap, self.keys
+        size = len(heap)
+        while True:
+            smallest = position
+            for child in (2 * position + 1, 2 * position + 2):
+                if child < size and keys[heap[child]] < keys[heap[smallest]]:
+                    smallest = child
+            if smallest == position:
+                break
+            self._swap(position, smallest)
+            position = smallest
+
+
+def _neighbours(shape, boundary):
+    """
+    Neighbours of every cell of a grid that molecules can jump to
+    :param shape: Shape of the grid
+    :param boundary: Either 'periodic' (opposite faces are neighbours) or 'neumann' (reflecting faces)
+    :return: List with the flat indices of the neighbours of every cell
+    """
+    indices = np.arange(int(np.prod(shape))).reshape(shape)
+    neighbours = [[] for _ in range(indices.size)]
+    for axis, length in enumerate(shape):
+        for shift in (-1, 1):
+            source = [slice(None)] * len(shape)
+            if boundary == 'periodic':
+                target = np.roll(indices, -shift, axis=axis)
+            else:
+                # Cells at the face have no neighbour in this direction
+                source[axis] = slice(1, None) if shift < 0 else slice(None, -1)
+                target = indices[tuple(source)] + shift * indices.strides[axis] // indices.itemsize
+            for cell, neighbour in zip(indices[tuple(source)].ravel(), target.ravel()):
+                # Along an axis with two cells, both directions lead to the same neighbour, as for the stencil
+                if cell != neighbour:
+                    neighbours[cell].append(int(neighbour))
+    return neighbours
+
+
+class NextSubvolumeSimulator:
+    """
+    Spatial stochastic reaction diffusion system with the two species kinetics of react_diff, simulated exactly
+    with the next-subvolume method. The grid is divided into subvolumes (cells) that hold molecule counts.
+    Every cell has a total propensity of its reactions and of the jumps of its molecules to neighbouring cells,
+    and the time of its next event is kept in an indexed priority queue. An event only changes the cell and, for a
+    jump, one neighbour, such that only their propensities and queue entries are updated, and the cost of an event
+    is O(log number of cells).
+    The species are counted as equilibrium concentration plus deviation, scaled by the system size. The net
+    reaction rate of each species, Omega * (interact_a * a + interact_b * b - nonlin_break * s^3), is split into a
+    production channel (if it is positive) and a degradation channel (if it is negative), such that the mean field
+    of the process is the deterministic model. The noise decreases with the system size
+    """
+    def __init__(
+            self,
+            deviation_a,
+            deviation_b,
+            interact_a=1.,
+            interact_b=-1.,
+            nonlin_break=0.1,
+            diffusion_coef=(1., 3.),
+            system_size=100.,
+            equilibrium=3.,
+            boundary='periodic',
+            seed=None
+    ):
+        """
+        Constructor
+        :param deviation_a: Initial deviation of the equilibrium of species a
+        :param deviation_b: Initial deviation of the equilibrium of species b
+        :param interact_a: Interaction coefficient of species a. Either shared or a pair (species a, species b)
+        :param interact_b: Interaction coefficient of species b. Either shared or a pair (species a, species b)
+        :param nonlin_break: Non-linear breakdown. Either shared or a pair (species a, species b)
+        :param diffusion_coef: Diffusion coefficient. Either shared or a pair (species a, species b)
+        :param system_size: Number of molecules per unit of concentration in one cell
+        :param equilibrium: Concentration at the equilibrium. Either shared or a pair (species a, species b). It
+                needs to be large enough for the counts to stay positive
+        :param boundary: Boundary condition. Either 'periodic' or 'neumann' (reflecting)
+        :param seed: Seed of the random number generator
+        """
+        deviation_a = np.asarray(deviation_a, dtype=float)
+        deviation_b = np.asarray(deviation_b, dtype=float)
+        if deviation_a.shape != deviation_b.shape:
+            raise ValueError('Both species need to have the same shape')
+        if boundary not in STOCHASTIC_BOUNDARIES:
+            raise ValueError(
+                'Boundary condition %s is not supported. Choose one of %s' % (boundary, STOCHASTIC_BOUNDARIES)
+            )
+
+        self.shape = deviation_a.shape
+        self.interact_a = [float(value) for value in species_pair(interact_a)]
+        self.interact_b = [float(value) for value in species_pair(interact_b)]
+        self.nonlin_break = [float(value) for value in species_pair(nonlin_break)]
+        self.diffusion_coef = [float(value) for value in species_pair(diffusion_coef)]
+        self.system_size = float(system_size)
+        self.equilibrium = [float(value) for value in species_pair(equilibrium)]
+        self.boundary = boundary
+        self.time = 0.
+        self.num_events = 0
+        self.num_reactions = 0
+
+        self._rng = np.random.default_rng(seed)
+        self._uniforms = []
+        self._neighbours = _neighbours(self.shape, boundary)
+        self._counts = [
+            np.maximum(np.round((deviation + equilibrium) * self.system_size), 0).astype(int).ravel().tolist()
+            for deviation, equilibrium in zip((deviation_a, deviation_b), self.equilibrium)
+        ]
+        self._rates = [self._cell_rate(cell) for cell in range(deviation_a.size)]
+        self._queue = IndexedPriorityQueue([self._waiting_time(rate) for rate in self._rates])
+
+    @property
+    def deviation_a(self):
+        """
+        :return: Deviation of the equilibrium concentration of species a
+        """
+        return np.reshape(self._counts[0], self.shape) / self.system_size - self.equilibrium[0]
+
+    @property
+    def deviation_b(self):
+        """
+        :return: Deviation of the equilibrium concentration of species b
+        """
+        return np.reshape(self._counts[1], self.shape) / self.system_size - self.equilibrium[1]
+
+    def _uniform(self):
+        """
+        Uniform random number in (0, 1]. The numbers are drawn in blocks, since single draws from numpy are slow
+        :return: Random number
+        """
+        if not self._uniforms:
+            self._uniforms = (1. - self._rng.random(4096)).tolist()
+        return self._uniforms.pop()
+
+    def _waiting_time(self, rate):
+        """
+        Time of the next event of a cell with the given total propensity
+        :param rate: Total propensity
+        :return: Absolute time of the next event, infinite if nothing can happen
+        """
+        if rate <= 0:
+            return math.inf
+        return self.time - math.log(self._uniform()) / rate
+
+    def _channels(self, cell):
+        """
+        Propensities of the events of a cell
+        :param cell: Flat index of the cell
+        :return: List of (production a, degradation a, production b, degradation b, jump a, jump b)
+        """
+        count_a, count_b = self._counts[0][cell], self._counts[1][cell]
+        deviation_a = count_a / self.system_size - self.equilibrium[0]
+        deviation_b = count_b / self.system_size - self.equilibrium[1]
+        channels = []
+        for species, count, substance in ((0, count_a, deviation_a), (1, count_b, deviation_b)):
+            net_rate = self.system_size * (
+                self.interact_a[species] * deviation_a
+                + self.interact_b[species] * deviation_b
+                - self.nonlin_break[species] * substance**3
+            )
+            channels.append(max(net_rate, 0.))
+            channels.append(-net_rate if net_rate < 0 and count > 0 else 0.)
+        num_neighbours = len(self._neighbours[cell])
+        channels.append(self.diffusion_coef[0] * count_a * num_neighbours)
+        channels.append(self.diffusion_coef[1] * count_b * num_neighbours)
+        return channels
+
+    def _cell_rate(self, cell):
+        """
+        :param cell: Flat index of the cell
+        :return: Total propensity of the cell
+        """
+        return sum(self._channels(cell))
+
+    def _fire(self, cell):
+        """
+        Performs one event of a cell, chosen according to the propensities
+        :param cell: Flat index of the cell
+        :return: Flat index of the neighbour that received a molecule, or None for a reaction
+        """
+        channels = self._channels(cell)
+        threshold = self._uniform() * sum(channels)
+        for channel, rate in enumerate(channels):
+            if 0 < rate and threshold <= rate:
+                break
+            threshold -= rate
+        else:
+            # Rounding errors can leave a small remainder, which belongs to the last possible event
+            channel = max(num for num, rate in enumerate(channels) if rate > 0)
+
+        if channel < 4:
+            self._counts[channel // 2][cell] += 1 if channel % 2 == 0 else -1
+            self.num_reactions += 1
+            return None
+        species = channel - 4
+        neighbours = self._neighbours[cell]
+        target = neighbours[min(int(self._uniform() * len(neighbours)), len(neighbours) - 1)]
+        self._counts[species][cell] -= 1
+        self._counts[species][target] += 1
+        return target
+
+    def _reschedule(self, cell, reuse):
+        """
+        Updates the propensity and the next event time of a cell after its counts changed
+        :param cell: Flat index of the cell
+        :param reuse: Flag to determine whether the pending event time is rescaled instead of drawn anew. This is
+                valid for cells whose own event did not fire (Gibson and Bruck, 2000)
+        :return: None
+        """
+        old_rate, rate = self._rates[cell], self._cell_rate(cell)
+        self._rates[cell] = rate
+        pending = self._queue.keys[cell]
+        if reuse and old_rate > 0 and rate > 0 and pending < math.inf:
+            self._queue.update(cell, self.time + old_rate / rate * (pending - self.time))
+        else:
+            self._queue.update(cell, self._waiting_time(rate))
+
+    def advance(self, end_time):
+        """
+        Performs all events up to the given time
+        :param end_time: Time at which the simulation stops
+        :return: None
+        """
+        while True:
+            cell, event_time = self._queue.top()
+            if event_time > end_time:
+                break
+            self.time = event_time
+            target = self._fire(cell)
+            self.num_events += 1
+            self._reschedule(cell, reuse=False)
+            if target is not None:
+                self._reschedule(target, reuse=True)
+        self.time = end_time
+
+    def run(self, sample_times, history=None):
+        """
+        Advances the simulation and records both species at the sample times
+        :param sample_times: Increasing times at which the state is recorded
+        :param history: HistoryBuffer for species a and b
+        :return: The history
+        """
+        for sample_time in sample_times:
+            self.advance(sample_time)
+            if history is not None:
+                history.record(self.time, self.deviation_a, self.deviation_b)
+        return history
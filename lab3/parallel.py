@@ -0,0 +1,339 @@
+#!/usr/bin/python3
+import multiprocessing as mp
+from multiprocessing import shared_memory
+import queue
+import traceback
+import numpy as np
+from reaction_diffusion import ReactDiffStepper, check_stencil, fill_ghost_cells, interior, BOUNDARIES
+
+
+def split_domain(length, num_tiles):
+    """
+    Splits the first axis of the grid into contiguous tiles of nearly equal size
+    :param length: Number of cells along the first axis
+    :param num_tiles: Number of tiles
+    :return: List of (start, stop) of every tile
+    """
+    bounds = np.linspace(0, length, num_tiles + 1).round().astype(int)
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+class _TileStepper(ReactDiffStepper):
+    """
+    Stepper for a single tile of the decomposed domain. The species and the increments of the tile are views of
+    the fields in shared memory, and the tile reads its halo, i.e. the ghost cells and the boundary rows of the
+    neighbouring tiles, directly from the padded fields
+    """
+    def __init__(self, padded_a, padded_b, increment_a, increment_b, **kwargs):
+        """
+        Constructor
+        :param padded_a: View of the padded field of species a that covers the tile and its halo
+        :param padded_b: View of the padded field of species b that covers the tile and its halo
+        :param increment_a: View of the increment of species a that covers the tile
+        :param increment_b: View of the increment of species b that covers the tile
+        :param kwargs: Parameters of the ReactDiffStepper
+        """
+        self._shared_padded = [padded_a, padded_b]
+        self._shared_increments = [increment_a, increment_b]
+        ndim = padded_a.ndim
+        super().__init__(padded_a[interior(ndim)], padded_b[interior(ndim)], **kwargs)
+
+    def _allocate_fields(self, deviation_a, deviation_b):
+        """
+        Uses the fields in shared memory instead of allocating private copies. Only the scratch array is private
+        :param deviation_a: View of the interior of the padded field of species a
+        :param deviation_b: View of the interior of the padded field of species b
+        :return: None
+        """
+        self._padded = self._shared_padded
+        self._padded_stage = None
+        self._interior = interior(deviation_a.ndim)
+        self.deviation_a = self._shared_padded[0][self._interior]
+        self.deviation_b = self._shared_padded[1][self._interior]
+        self.increment_a, self.increment_b = self._shared_increments
+        self._scratch = np.empty_like(self.deviation_a)
+
+    def _pad(self, substance, species):
+        """
+        The halo is refreshed by the workers before the rates are computed
+        :param substance: Field of the species
+        :param species: Index of the species (0 for a, 1 for b)
+        :return: Padded field of the tile
+        """
+        return self._shared_padded[species]
+
+
+def _attach(name, shape, dtype=np.float64):
+    """
+    Attaches to a shared memory block and interprets it as array
+    :param name: Name of the shared memory block
+    :param shape: Shape of the array
+    :param dtype: Data type of the array
+    :return: Tuple of the shared memory object and the array
+    """
+    memory = shared_memory.SharedMemory(name=name)
+    return memory, np.ndarray(shape, dtype=dtype, buffer=memory.buf)
+
+
+def _worker(tile, bounds, names, padded_shape, stepper_kwargs, barrier, commands, done):
+    """
+    Worker process that advances one tile. Every step consists of three phases that are separated by barriers:
+    refreshing the ghost cells, computing the rates from the old values of all tiles, and applying the increments
+    :param tile: Index of the tile
+    :param bounds: (start, stop) of the tile along the first axis
+    :param names: Names of the shared memory blocks of the padded fields a and b and the increments a and b
+    :param padded_shape: Shape of the padded fields
+    :param stepper_kwargs: Parameters of the ReactDiffStepper
+    :param barrier: Barrier shared by all workers
+    :param commands: Queue with the number of steps to perform. None stops the worker
+    :param done: Queue on which the worker reports finished commands as (tile, None). If the worker fails, it
+            reports (tile, traceback), aborts the barrier such that the other workers do not wait forever, and stops
+    :return: None
+    """
+    shape = tuple(length - 2 for length in padded_shape)
+    dtype = stepper_kwargs['dtype']
+    memories, arrays = zip(*[_attach(name, padded_shape, dtype) for name in names[:2]] +
+                           [_attach(name, shape, dtype) for name in names[2:]])
+    padded_a, padded_b, increment_a, increment_b = arrays
+    start, stop = bounds
+    boundary = stepper_kwargs['boundary']
+    boundary_value = np.broadcast_to(stepper_kwargs['boundary_value'], (2,))
+    ndim = len(shape)
+
+    rows = (slice(start, stop),)
+    padded_rows = (slice(start + 1, stop + 1),)
+    stepper = None
+    try:
+        stepper = _TileStepper(
+            padded_a[start:stop + 2],
+            padded_b[start:stop + 2],
+            increment_a[rows],
+            increment_b[rows],
+            **stepper_kwargs
+        )
+        while True:
+            num_steps = commands.get()
+            if num_steps is None:
+                break
+            for _ in range(num_steps):
+                # Ghost cells along the other axes of the own rows, then the ghost rows of the first axis
+                for padded, value in zip((padded_a, padded_b), boundary_value):
+                    fill_ghost_cells(padded[padded_rows], boundary, value, axes=range(1, ndim))
+                barrier.wait()
+                if tile == 0:
+                    for padded, value in zip((padded_a, padded_b), boundary_value):
+                        fill_ghost_cells(padded, boundary, value, axes=(0,))
+                barrier.wait()
+
+                stepper.rate(stepper.deviation_a, stepper.deviation_b, 0, stepper.increment_a)
+                stepper.rate(stepper.deviation_a, stepper.deviation_b, 1, stepper.increment_b)
+                barrier.wait()
+
+                stepper.increment_a *= stepper.dt
+                stepper.increment_b *= stepper.dt
+                stepper.deviation_a += stepper.increment_a
+                stepper.deviation_b += stepper.increment_b
+            done.put((tile, None))
+    except Exception:
+        # The error is reported before the barrier is aborted, such that it arrives before the errors of the
+        # other workers, which only see the broken barrier
+        done.put((tile, traceback.format_exc()))
+        barrier.abort()
+    finally:
+        # The views need to be released before the shared memory can be closed
+        del stepper, padded_a, padded_b, increment_a, increment_b, arrays
+        for memory in memories:
+            memory.close()
+
+
+class DecomposedStepper:
+    """
+    Reaction diffusion system with two species whose grid is split along the first axis into tiles that are
+    advanced by separate worker processes. The padded fields live in shared memory, such that the halo exchange
+    between neighbouring tiles is a read of the neighbours' boundary rows after a barrier. Every tile uses the
+    physics of the ReactDiffStepper, and the result is the same as for a single ReactDiffStepper. The stepper
+    holds processes and shared memory and needs to be closed, e.g. by using it as context manager
+    """
+    checkpoint_parameters = (
+        'interact_a',
+        'interact_b',
+        'nonlin_break',
+        'diffusion_coef',
+        'dt',
+        'stencil',
+        'boundary',
+        'boundary_value',
+        'num_workers',
+        'dtype'
+    )
+    checkpoint_attributes = ('time', 'num_steps')
+
+    def __init__(
+            self,
+            deviation_a,
+            deviation_b,
+            interact_a=1.,
+            interact_b=-1.,
+            nonlin_break=0.1,
+            diffusion_coef=(1., 3.),
+            dt=0.1,
+            stencil=None,
+            boundary='periodic',
+            boundary_value=0.,
+            num_workers=None,
+            dtype=np.float64
+    ):
+        """
+        Constructor
+        :param deviation_a: Initial deviation of the equilibrium of species a
+        :param deviation_b: Initial deviation of the equilibrium of species b
+        :param interact_a: Interaction coefficient of species a. Either shared or a pair (species a, species b)
+        :param interact_b: Interaction coefficient of species b. Either shared or a pair (species a, species b)
+        :param nonlin_break: Non-linear breakdown. Either shared or a pair (species a, species b)
+        :param diffusion_coef: Diffusion coefficient. Either shared or a pair (species a, species b)
+        :param dt: Change in time
+        :param stencil: Name of the stencil of the second derivative (see STENCILS)
+        :param boundary: Boundary condition. Either 'periodic', 'neumann' or 'dirichlet'
+        :param boundary_value: Value of the deviation outside of the domain for Dirichlet boundaries. Either shared
+                or a pair (species a, species b)
+        :param num_workers: Number of worker processes. If None, the number of cores is used. There are at most as
+                many workers as cells along the first axis
+        :param dtype: Data type of the fields and the parameters, e.g. np.float32
+        """
+        dtype = np.dtype(dtype)
+        deviation_a = np.asarray(deviation_a, dtype=dtype)
+        deviation_b = np.asarray(deviation_b, dtype=dtype)
+        if deviation_a.shape != deviation_b.shape:
+            raise ValueError('Both species need to have the same shape')
+        if boundary not in BOUNDARIES:
+            raise ValueError('Boundary condition %s is not supported. Choose one of %s' % (boundary, BOUNDARIES))
+        check_stencil(deviation_a.ndim, stencil)
+        if num_workers is None:
+            num_workers = mp.cpu_count()
+        num_workers = max(1, min(num_workers, deviation_a.shape[0]))
+
+        self.interact_a = interact_a
+        self.interact_b = interact_b
+        self.nonlin_break = nonlin_break
+        self.diffusion_coef = diffusion_coef
+        self.dt = dt
+        self.stencil = stencil
+        self.boundary = boundary
+        self.boundary_value = boundary_value
+        self.dtype = dtype
+        self.time = 0.
+        self.num_steps = 0
+        self.num_workers = num_workers
+        self.tiles = split_domain(deviation_a.shape[0], num_workers)
+
+        padded_shape = tuple(length + 2 for length in deviation_a.shape)
+        self._memories = []
+        arrays = []
+        for shape in [padded_shape, padded_shape, deviation_a.shape, deviation_a.shape]:
+            memory = shared_memory.SharedMemory(create=True, size=max(int(np.prod(shape)) * dtype.itemsize, 1))
+            self._memories.append(memory)
+            arrays.append(np.ndarray(shape, dtype=dtype, buffer=memory.buf))
+        padded_a, padded_b, self.increment_a, self.increment_b = arrays
+        self.deviation_a = padded_a[interior(deviation_a.ndim)]
+        self.deviation_b = padded_b[interior(deviation_a.ndim)]
+        self.deviation_a[...] = deviation_a
+        self.deviation_b[...] = deviation_b
+        self.increment_a[...] = 0
+        self.increment_b[...] = 0
+
+        stepper_kwargs = {
+            'interact_a': interact_a,
+            'interact_b': interact_b,
+            'nonlin_break': nonlin_break,
+            'diffusion_coef': diffusion_coef,
+            'dt': dt,
+            'stencil': stencil,
+            'boundary': boundary,
+            'boundary_value': boundary_value,
+            'dtype': dtype
+        }
+        names = [memory.name for memory in self._memories]
+        barrier = mp.Barrier(num_workers)
+        self._barrier = barrier
+        self._done = mp.Queue()
+        self._commands = [mp.Queue() for _ in range(num_workers)]
+        self._workers = [
+            mp.Process(
+                target=_worker,
+                args=(tile, bounds, names, padded_shape, stepper_kwargs, barrier, commands, self._done),
+                daemon=True
+            )
+            for tile, (bounds, commands) in enumerate(zip(self.tiles, self._commands))
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    def step(self, num_steps=1):
+        """
+        Advances both species in place. The workers synchronise among each other during the steps and report
+        back once all steps of this call are done
+        :param num_steps: Number of time steps
+        :return: None
+        """
+        if self._workers is None:
+            raise RuntimeError('The stepper has been closed')
+        for commands in self._commands:
+            commands.put(num_steps)
+        for _ in self._workers:
+            tile, error = self._wait_for_worker()
+            if error is not None:
+                raise RuntimeError('The worker of tile %d failed:\n%s' % (tile, error))
+        self.time += num_steps * self.dt
+        self.num_steps += num_steps
+
+    def _wait_for_worker(self, poll_interval=1.):
+        """
+        Waits for the next report of a worker. While waiting, the workers are checked regularly, such that a
+        worker that died without reporting (e.g. killed by a signal) does not block the stepper forever
+        :param poll_interval: Time in seconds between two checks of the workers
+        :return: Tuple of the tile and the traceback of the worker, None if the command succeeded
+        """
+        while True:
+            try:
+                return self._done.get(timeout=poll_interval)
+            except queue.Empty:
+                dead = [tile for tile, worker in enumerate(self._workers) if not worker.is_alive()]
+                if dead:
+                    # Releases the other workers from the barrier
+                    self._barrier.abort()
+                    raise RuntimeError(
+                        'The worker of tile %d exited with code %s' % (dead[0], self._workers[dead[0]].exitcode)
+                    )
+
+    def close(self, timeout=10.):
+        """
+        Stops the workers and releases the shared memory. The fields are copied out of the shared memory before,
+        such that they remain accessible
+        :param timeout: Time in seconds that every worker gets to stop before it is terminated
+        :return: None
+        """
+        if self._workers is None:
+            return
+        for commands in self._commands:
+            commands.put(None)
+        for worker in self._workers:
+            worker.join(timeout)
+            if worker.is_alive():
+                worker.terminate()
+                worker.join()
+        self._workers = None
+
+        self.deviation_a = self.deviation_a.copy()
+        self.deviation_b = self.deviation_b.copy()
+        self.increment_a = self.increment_a.copy()
+        self.increment_b = self.increment_b.copy()
+        for memory in self._memories:
+            memory.close()
+            memory.unlink()
+        self._memories = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -0,0 +1,146 @@
+#!/usr/bin/python3
+import numpy as np
+from matplotlib.collections import LineCollection
+from reaction_diffusion import species_pair
+
+
+def reaction_field(deviation_a, deviation_b, interact_a=1., interact_b=-1., nonlin_break=0.1):
+    """
+    Vector field of the well-mixed system, i.e. the change in time of both species without diffusion. All
+    arguments broadcast against each other, such that a whole grid of states (or of parameters) is evaluated in
+    one call
+    :param deviation_a: Deviation of the equilibrium of species a
+    :param deviation_b: Deviation of the equilibrium of species b
+    :param interact_a: Interaction coefficient of species a. Either shared or a pair (species a, species b)
+    :param interact_b: Interaction coefficient of species b. Either shared or a pair (species a, species b)
+    :param nonlin_break: Non-linear breakdown. Either shared or a pair (species a, species b)
+    :return: Change in time of species a and species b
+    """
+    interact_a = species_pair(interact_a)
+    interact_b = species_pair(interact_b)
+    nonlin_break = species_pair(nonlin_break)
+    return tuple(
+        interact_a[species] * deviation_a + interact_b[species] * deviation_b - nonlin_break[species] * substance**3
+        for species, substance in enumerate((deviation_a, deviation_b))
+    )
+
+
+def vector_field(a_range=(-3., 3.), b_range=(-3., 3.), num_points=(300, 300), **params):
+    """
+    Evaluates the vector field on a regular grid of states
+    :param a_range: Lower and upper bound of species a
+    :param b_range: Lower and upper bound of species b
+    :param num_points: Number of grid points along a and b
+    :param params: Parameters of reaction_field
+    :return: Grids of species a and b and the change in time of both species, all with shape
+            (points along b, points along a)
+    """
+    grid_a, grid_b = np.meshgrid(
+        np.linspace(a_range[0], a_range[1], num_points[0]),
+        np.linspace(b_range[0], b_range[1], num_points[1])
+    )
+    return (grid_a, grid_b) + reaction_field(grid_a, grid_b, **params)
+
+
+def integrate_trajectories(initial_a, initial_b, number_timesteps=1000, dt=0.01, record_rate=1, **params):
+    """
+    Integrates many initial conditions of the well-mixed system together with the classical Runge-Kutta scheme.
+    Every stage is a single vectorized evaluation of reaction_field for the whole batch
+    :param initial_a: Initial deviations of species a, one per trajectory
+    :param initial_b: Initial deviations of species b, one per trajectory
+    :param number_timesteps: Number of time steps
+    :param dt: Change in time
+    :param record_rate: Number of time steps between two recorded states
+    :param params: Parameters of reaction_field
+    :return: Trajectories of species a and b with shape (number of records, number of trajectories). The first
+            record is the initial state, the last one the final state
+    """
+    state = np.stack(np.broadcast_arrays(
+        np.asarray(initial_a, dtype=float).ravel(),
+        np.asarray(initial_b, dtype=float).ravel()
+    ))
+
+    def rhs(current):
+        return np.stack(reaction_field(current[0], current[1], **params))
+
+    # The final state is recorded as well if record_rate does not divide number_timesteps
+    num_records = -(-number_timesteps // record_rate) + 1
+    trajectories = np.empty((num_records,) + state.shape)
+    trajectories[0] = state
+    for step in range(1, number_timesteps + 1):
+        k1 = rhs(state)
+        k2 = rhs(state + dt / 2. * k1)
+        k3 = rhs(state + dt / 2. * k2)
+        k4 = rhs(state + dt * k3)
+        state = state + dt / 6. * (k1 + 2 * k2 + 2 * k3 + k4)
+        if step % record_rate == 0 or step == number_timesteps:
+            trajectories[-(-step // record_rate)] = state
+    return trajectories[:, 0], trajectories[:, 1]
+
+
+def draw_phase_portrait(
+        ax,
+        a_range=(-3., 3.),
+        b_range=(-3., 3.),
+        num_points=(300, 300),
+        num_arrows=25,
+        initial_states=None,
+        number_timesteps=1000,
+        dt=0.01,
+        **params
+):
+    """
+    Draws the phase portrait of the well-mixed system. The speed of the flow is shown as raster image of the whole
+    grid, the direction by arrows on a coarser grid, the nullclines as zero contours of the vector field, and
+    optionally the trajectories of many initial states as a single line collection. Every layer is one artist,
+    such that dense grids of 10^5 points stay interactive
+    :param ax: Axes into which the portrait is drawn
+    :param a_range: Lower and upper bound of species a
+    :param b_range: Lower and upper bound of species b
+    :param num_points: Number of grid points along a and b
+    :param num_arrows: Number of arrows along each axis
+    :param initial_states: Initial deviations (a, b) of the trajectories with shape (2, number of trajectories).
+            If None, no trajectories are drawn
+    :param number_timesteps: Number of time steps of the trajectories
+    :param dt: Change in time of the trajectories
+    :param params: Parameters of reaction_field
+    :return: None
+    """
+    grid_a, grid_b, change_a, change_b = vector_field(a_range, b_range, num_points, **params)
+    speed = np.hypot(change_a, change_b)
+    image = ax.imshow(
+        np.log10(speed + np.finfo(float).tiny),
+        origin='lower',
+        extent=(a_range[0], a_range[1], b_range[0], b_range[1]),
+        aspect='auto',
+        cmap='Greys',
+        alpha=0.5
+    )
+    ax.figure.colorbar(image, ax=ax, label='log10 speed')
+
+    stride = (max(1, num_points[1] // num_arrows), max(1, num_points[0] // num_arrows))
+    arrows = (slice(None, None, stride[0]), slice(None, None, stride[1]))
+    norm = np.maximum(speed[arrows], np.finfo(float).tiny)
+    ax.quiver(grid_a[arrows], grid_b[arrows], change_a[arrows] / norm, change_b[arrows] / norm, alpha=0.6)
+
+    ax.contour(grid_a, grid_b, change_a, levels=[0.], colors='tab:blue')
+    ax.contour(grid_a, grid_b, change_b, levels=[0.], colors='tab:red')
+    ax.plot([], [], color='tab:blue', label='Nullcline of A')
+    ax.plot([], [], color='tab:red', label='Nullcline of B')
+
+    if initial_states is not None:
+        trajectory_a, trajectory_b = integrate_trajectories(
+            initial_states[0],
+            initial_states[1],
+            number_timesteps=number_timesteps,
+            dt=dt,
+            **params
+        )
+        lines = np.stack([trajectory_a.T, trajectory_b.T], axis=-1)
+        ax.add_collection(LineCollection(lines, colors='tab:green', linewidths=0.8, label='Trajectories'))
+
+    ax.set_xlim(a_range)
+    ax.set_ylim(b_range)
+    ax.set_xlabel('Species A')
+    ax.set_ylabel('Species B')
+    ax.legend(loc='upper right')
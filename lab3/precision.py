@@ -0,0 +1,86 @@
+#!/usr/bin/python3
+import numpy as np
+from reaction_diffusion import ReactDiffStepper
+
+
+def pattern_statistics(field):
+    """
+    Statistics that characterise a pattern independently of the exact values of single cells
+    :param field: Field of one species
+    :return: Dictionary with the mean, the standard deviation, the minimum, the maximum and the dominant wavelength
+            (in cells) of the field. The dominant wavelength is the one of the strongest non-uniform Fourier mode,
+            infinite if the field is uniform
+    """
+    field = np.asarray(field, dtype=np.float64)
+    power = np.abs(np.fft.rfftn(field))**2
+    power.flat[0] = 0.
+    frequencies = np.meshgrid(
+        *([np.fft.fftfreq(length) for length in field.shape[:-1]] + [np.fft.rfftfreq(field.shape[-1])]),
+        indexing='ij'
+    )
+    strongest = np.unravel_index(np.argmax(power), power.shape)
+    frequency = np.sqrt(sum(axis_frequencies[strongest]**2 for axis_frequencies in frequencies))
+    return {
+        'mean': field.mean(),
+        'std': field.std(),
+        'min': field.min(),
+        'max': field.max(),
+        'wavelength': 1. / frequency if power.max() > 0 else np.inf
+    }
+
+
+def compare_precision(
+        deviation_a,
+        deviation_b,
+        number_timesteps,
+        dtype=np.float32,
+        reference_dtype=np.float64,
+        stepper_class=ReactDiffStepper,
+        rtol=1e-2,
+        **stepper_kwargs
+):
+    """
+    Validates a reduced precision run by simulating the same system with both data types and comparing the
+    statistics of the resulting patterns. Cell-wise values may drift apart over long runs, since small rounding
+    differences can shift the pattern, hence the statistics are the criterion for acceptance
+    :param deviation_a: Initial deviation of the equilibrium of species a
+    :param deviation_b: Initial deviation of the equilibrium of species b
+    :param number_timesteps: Number of time steps
+    :param dtype: Reduced data type
+    :param reference_dtype: Data type of the reference run
+    :param stepper_class: Class of the stepper, which needs to accept the dtype parameter
+    :param rtol: Accepted relative deviation of the statistics, relative to the standard deviation of the reference
+            pattern for the mean, the minimum and the maximum
+    :param stepper_kwargs: Further parameters of the stepper
+    :return: Dictionary with the statistics of both runs per species, the maximal cell-wise difference per species,
+            the largest relative deviation of the statistics and a flag whether the reduced run is acceptable
+    """
+    results = {}
+    for name, run_dtype in [('reference', reference_dtype), ('reduced', dtype)]:
+        stepper = stepper_class(deviation_a, deviation_b, dtype=run_dtype, **stepper_kwargs)
+        stepper.step(number_timesteps)
+        results[name] = (stepper.deviation_a.astype(np.float64), stepper.deviation_b.astype(np.float64))
+
+    comparison = {'reference': [], 'reduced': [], 'max_abs_error': [], 'relative_error': 0.}
+    for reference, reduced in zip(results['reference'], results['reduced']):
+        reference_statistics = pattern_statistics(reference)
+        reduced_statistics = pattern_statistics(reduced)
+        comparison['reference'].append(reference_statistics)
+        comparison['reduced'].append(reduced_statistics)
+        comparison['max_abs_error'].append(np.max(np.abs(reference - reduced)))
+
+        scale = max(reference_statistics['std'], np.finfo(np.float64).tiny)
+        errors = [
+            abs(reduced_statistics[key] - reference_statistics[key]) / scale for key in ('mean', 'min', 'max')
+        ]
+        errors.append(abs(reduced_statistics['std'] - reference_statistics['std']) / scale)
+        reference_wavelength, reduced_wavelength = reference_statistics['wavelength'], reduced_statistics['wavelength']
+        if reduced_wavelength != reference_wavelength:
+            errors.append(
+                abs(reduced_wavelength - reference_wavelength) / reference_wavelength
+                if np.isfinite(reference_wavelength) else np.inf
+            )
+        comparison['relative_error'] = max(comparison['relative_error'], max(errors))
+
+    comparison['acceptable'] = bool(comparison['relative_error'] <= rtol)
+    return comparison
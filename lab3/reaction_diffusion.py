@@ -1,5 +1,8 @@
 #!/usr/bin/python3
+import itertools
 import numpy as np
+import scipy.sparse as sp
+from scipy.sparse.csgraph import reverse_cuthill_mckee
 
 
 def nabla_sq_1d(substance):
@@ -35,7 +38,10 @@ def react_diff(
         diffusion_coef=1.,
         dt=0.1,
         is_a_substance=True,
-        is_1d=True
+        is_1d=True,
+        stencil=None,
+        boundary='periodic',
+        boundary_value=0.
 ):
     """
     Equation describing the dynamics of a reaction diffusion system with two
@@ -49,13 +55,22 @@ def react_diff(
     :param dt: Change in time
     :param is_a_substance: Flag to determine whether it is species a or b
     :param is_1d: Flag to determine whether reaction-diffusion takes place in one dimension
+    :param stencil: Name of the stencil of the second derivative (see STENCILS). If given, or if the species has
+            more than two dimensions, the generic N-dimensional second derivative is used
+    :param boundary: Boundary condition. Either 'periodic', 'neumann' or 'dirichlet'
+    :param boundary_value: Value of the deviation outside of the domain for Dirichlet boundaries
     :return: Updated substance value, expressed as a deviation from the equilibrium
     """
     if is_a_substance:
         substance = deviation_a
     else:
         substance = deviation_b
-    if is_1d:
+    if boundary != 'periodic':
+        padded = np.pad(substance, 1)
+        nabla_sq = nabla_sq_padded(fill_ghost_cells(padded, boundary, boundary_value), stencil=stencil)
+    elif stencil is not None or (not is_1d and substance.ndim != 2):
+        nabla_sq = nabla_sq_nd(substance, stencil=stencil)
+    elif is_1d:
         nabla_sq = nabla_sq_1d(substance)
     else:
         nabla_sq = nabla_sq_2d(substance)
@@ -63,3 +78,702 @@ def react_diff(
             + diffusion_coef * nabla_sq
     return substance + delta * dt, delta * dt
 
+
+def species_pair(value, dtype=None):
+    """
+    Expands a parameter to one value per species. Only tuples are pairs, every other value (including arrays,
+    e.g. a parameter grid) is shared by both species
+    :param value: Scalar or array that is shared by both species or a tuple (species a, species b)
+    :param dtype: If given, both values are converted to this data type, such that arithmetic with fields of
+            that type does not promote them to a wider type
+    :return: Tuple with the value for species a and species b
+    """
+    if isinstance(value, tuple):
+        if len(value) != 2:
+            raise ValueError('A pair of parameters needs one value per species, got %d values' % len(value))
+        value_a, value_b = value
+    else:
+        value_a, value_b = value, value
+    if dtype is not None:
+        value_a, value_b = np.asarray(value_a, dtype=dtype)[()], np.asarray(value_b, dtype=dtype)[()]
+    return value_a, value_b
+
+
+def _stencil(offsets, weights, divisor):
+    """
+    Groups the neighbour offsets of a stencil by their weight
+    :param offsets: List of neighbour offsets
+    :param weights: Integer weight for each offset
+    :param divisor: Common divisor of all weights
+    :return: Tuple of the divisor and a dictionary that maps every weight to its offsets
+    """
+    groups = {}
+    for offset, weight in zip(offsets, weights):
+        groups.setdefault(weight, []).append(offset)
+    return divisor, groups
+
+
+def _neighbour_offsets(ndim, max_nonzero):
+    """
+    All offsets to neighbouring cells with entries in {-1, 0, 1}
+    :param ndim: Number of dimensions
+    :param max_nonzero: Maximal number of non-zero entries
+    :return: List of offsets
+    """
+    offsets = itertools.product([-1, 0, 1], repeat=ndim)
+    return [offset for offset in offsets if 0 < np.count_nonzero(offset) <= max_nonzero]
+
+
+# Stencils of the second derivative as (divisor, {integer weight: neighbour offsets}). The centre weight follows
+# from the requirement that the weights sum up to zero
+STENCILS = {
+    '3-point': _stencil(_neighbour_offsets(1, 1), [1, 1], 1),
+    '5-point': _stencil(_neighbour_offsets(2, 1), [1] * 4, 1),
+    '9-point': _stencil(
+        _neighbour_offsets(2, 2),
+        [4 if np.count_nonzero(offset) == 1 else 1 for offset in _neighbour_offsets(2, 2)],
+        6
+    ),
+    '7-point': _stencil(_neighbour_offsets(3, 1), [1] * 6, 1),
+    '27-point': _stencil(
+        _neighbour_offsets(3, 3),
+        [{1: 14, 2: 3, 3: 1}[np.count_nonzero(offset)] for offset in _neighbour_offsets(3, 3)],
+        30
+    )
+}
+DEFAULT_STENCILS = {1: '3-point', 2: '5-point', 3: '7-point'}
+
+
+def check_stencil(ndim, stencil=None):
+    """
+    Checks that a stencil of the second derivative exists and matches the dimension of the field
+    :param ndim: Number of dimensions of the field
+    :param stencil: Name of the stencil (see STENCILS). None selects the default stencil, which always matches
+    :return: None
+    """
+    if stencil is None:
+        return
+    if stencil not in STENCILS:
+        raise ValueError('Stencil %s is not supported. Choose one of %s' % (stencil, tuple(STENCILS)))
+    if len(next(iter(STENCILS[stencil][1].values()))[0]) != ndim:
+        raise ValueError('Stencil %s does not match the dimension %d' % (stencil, ndim))
+
+
+def _stencil_groups(ndim, stencil=None):
+    """
+    Looks up a stencil of the second derivative
+    :param ndim: Number of dimensions of the field
+    :param stencil: Name of the stencil (see STENCILS). If None, the nearest-neighbour stencil of the dimension
+            is used (3-point in 1D, 5-point in 2D, 7-point in 3D, 2N+1-point otherwise)
+    :return: Tuple of the divisor and a dictionary that maps every weight to its offsets
+    """
+    check_stencil(ndim, stencil)
+    if stencil is None:
+        stencil = DEFAULT_STENCILS.get(ndim)
+    if stencil is None:
+        return _stencil(_neighbour_offsets(ndim, 1), [1] * 2 * ndim, 1)
+    return STENCILS[stencil]
+
+
+def _shifted_blocks(shape, offset):
+    """
+    Pairs of slices that add the periodic neighbour at the given offset to every cell. Along each axis
+    with a non-zero offset, the grid is split into the interior and the wrapped boundary part
+    :param shape: Shape of the grid
+    :param offset: Offset of the neighbour
+    :return: List of (destination slices, source slices)
+    """
+    parts_per_axis = []
+    for length, shift in zip(shape, offset):
+        if shift == 0 or length == 1:
+            parts_per_axis.append([(slice(None), slice(None))])
+        elif shift > 0:
+            parts_per_axis.append([(slice(None, -1), slice(1, None)), (slice(-1, None), slice(None, 1))])
+        else:
+            parts_per_axis.append([(slice(1, None), slice(None, -1)), (slice(None, 1), slice(-1, None))])
+    return [
+        (tuple(part[0] for part in parts), tuple(part[1] for part in parts))
+        for parts in itertools.product(*parts_per_axis)
+    ]
+
+
+def nabla_sq_nd(substance, out=None, stencil=None, scratch=None):
+    """
+    Second derivative of the vector function of the species on a periodic grid of any dimension. In contrast to
+    nabla_sq_1d and nabla_sq_2d, the neighbours are added through strided slices into a preallocated output
+    array, such that no copies of the field are made
+    :param substance: species
+    :param out: Array with the same shape as the species in which the result is stored. If None, it is allocated
+    :param stencil: Name of the stencil (see STENCILS). If None, the nearest-neighbour stencil of the dimension
+            is used (3-point in 1D, 5-point in 2D, 7-point in 3D, 2N+1-point otherwise)
+    :param scratch: Buffer with the same shape as the species. Only needed for stencils with several weights.
+            If None, it is allocated when needed
+    :return: The second derivative
+    """
+    if out is None:
+        out = np.empty_like(substance)
+    divisor, groups = _stencil_groups(substance.ndim, stencil)
+
+    centre_weight = -sum(weight * len(offsets) for weight, offsets in groups.items())
+    np.multiply(substance, centre_weight / float(divisor), out=out)
+    for weight, offsets in groups.items():
+        if weight == divisor:
+            target = out
+        else:
+            if scratch is None:
+                scratch = np.empty_like(substance)
+            scratch[...] = 0
+            target = scratch
+        for offset in offsets:
+            for destination, source in _shifted_blocks(substance.shape, offset):
+                target[destination] += substance[source]
+        if target is not out:
+            scratch *= weight / float(divisor)
+            out += scratch
+    return out
+
+
+BOUNDARIES = ('periodic', 'neumann', 'dirichlet')
+
+
+def interior(ndim, width=1, batch_ndim=0):
+    """
+    Slices of the interior of a field that is padded with ghost cells
+    :param ndim: Number of dimensions
+    :param width: Number of ghost cells on each side
+    :param batch_ndim: Number of leading batch axes that are not padded
+    :return: Tuple of slices
+    """
+    return (slice(None),) * batch_ndim + (slice(width, -width),) * (ndim - batch_ndim)
+
+
+def fill_ghost_cells(padded, boundary='periodic', boundary_value=0., axes=None):
+    """
+    Refreshes the ghost cells of a field that is padded by one cell on each side in place. Only the faces of the
+    array are written, i.e. the cost scales with the surface and not with the volume. The axes are handled one after
+    the other with full slices along the other axes, such that edges and corners are set as well
+    :param padded: Field with one layer of ghost cells
+    :param boundary: Boundary condition. Either 'periodic', 'neumann' (no flux, the ghost cell repeats the
+            boundary cell) or 'dirichlet' (the ghost cells hold a fixed value)
+    :param boundary_value: Value of the ghost cells for Dirichlet boundaries
+    :param axes: Axes along which the ghost cells are refreshed. If None, all axes are refreshed
+    :return: The padded field
+    """
+    if axes is None:
+        axes = range(padded.ndim)
+    for axis in axes:
+        lower_ghost, upper_ghost = [slice(None)] * padded.ndim, [slice(None)] * padded.ndim
+        lower_ghost[axis], upper_ghost[axis] = 0, -1
+        if boundary == 'periodic':
+            lower_source, upper_source = -2, 1
+        elif boundary == 'neumann':
+            lower_source, upper_source = 1, -2
+        elif boundary == 'dirichlet':
+            padded[tuple(lower_ghost)] = boundary_value
+            padded[tuple(upper_ghost)] = boundary_value
+            continue
+        else:
+            raise ValueError('Boundary condition %s is not supported. Choose one of %s' % (boundary, BOUNDARIES))
+        lower_cells, upper_cells = list(lower_ghost), list(upper_ghost)
+        lower_cells[axis], upper_cells[axis] = lower_source, upper_source
+        padded[tuple(lower_ghost)] = padded[tuple(lower_cells)]
+        padded[tuple(upper_ghost)] = padded[tuple(upper_cells)]
+    return padded
+
+
+def nabla_sq_padded(padded, out=None, stencil=None, scratch=None, batch_ndim=0):
+    """
+    Second derivative of a species that is padded by one layer of ghost cells. Since the ghost cells hold the
+    boundary condition, every neighbour is a single strided slice of the padded field
+    :param padded: Field with one layer of up-to-date ghost cells
+    :param out: Array with the shape of the interior in which the result is stored. If None, it is allocated
+    :param stencil: Name of the stencil (see STENCILS). If None, the nearest-neighbour stencil is used
+    :param scratch: Buffer with the shape of the interior. Only needed for stencils with several weights
+    :param batch_ndim: Number of leading batch axes, e.g. independent simulations, that are neither padded nor
+            coupled by the second derivative
+    :return: The second derivative on the interior
+    """
+    substance = padded[interior(padded.ndim, batch_ndim=batch_ndim)]
+    if out is None:
+        out = np.empty_like(substance)
+    divisor, groups = _stencil_groups(padded.ndim - batch_ndim, stencil)
+    batch = (slice(None),) * batch_ndim
+
+    centre_weight = -sum(weight * len(offsets) for weight, offsets in groups.items())
+    np.multiply(substance, centre_weight / float(divisor), out=out)
+    for weight, offsets in groups.items():
+        if weight == divisor:
+            target = out
+        else:
+            if scratch is None:
+                scratch = np.empty_like(substance)
+            scratch[...] = 0
+            target = scratch
+        for offset in offsets:
+            neighbour = tuple(
+                slice(1 + shift, length - 1 + shift) for length, shift in zip(padded.shape[batch_ndim:], offset)
+            )
+            target += padded[batch + neighbour]
+        if target is not out:
+            scratch *= weight / float(divisor)
+            out += scratch
+    return out
+
+
+class HistoryBuffer:
+    """
+    Preallocated history of several fields (e.g. both species) with a fixed number of snapshots. A snapshot is
+    taken every record_rate-th call of record, or earlier if a field changed by more than the change threshold
+    since the last snapshot. When the buffer is full, every second snapshot is dropped and the record rate is
+    doubled, such that the memory does not depend on the number of steps. The minimum and maximum of every field
+    over all snapshots are kept up to date
+    """
+    def __init__(
+            self,
+            shape,
+            max_snapshots=1000,
+            num_fields=2,
+            record_rate=1,
+            change_threshold=None,
+            dtype=np.float64
+    ):
+        """
+        Constructor
+        :param shape: Shape of the fields
+        :param max_snapshots: Maximal number of stored snapshots
+        :param num_fields: Number of fields that are recorded together
+        :param record_rate: Number of calls of record between two snapshots
+        :param change_threshold: If not None, a snapshot is also taken once the maximal absolute change of a field
+                since the last snapshot exceeds this value
+        :param dtype: Data type of the stored snapshots, e.g. np.float32 to halve the memory
+        """
+        self.data = np.empty((num_fields, max_snapshots) + tuple(shape), dtype=dtype)
+        self.times = np.empty(max_snapshots)
+        self.minimum = np.full(num_fields, np.inf)
+        self.maximum = np.full(num_fields, -np.inf)
+        self.record_rate = record_rate
+        self.change_threshold = change_threshold
+        self.num_snapshots = 0
+        self._calls_since_snapshot = 0
+
+    def _changed(self, fields):
+        """
+        Checks whether a field changed by more than the threshold since the last snapshot
+        :param fields: Current fields
+        :return: True if the change exceeds the threshold
+        """
+        if self.change_threshold is None:
+            return False
+        last = self.num_snapshots - 1
+        return any(
+            np.max(np.abs(field - self.data[num, last])) > self.change_threshold for num, field in enumerate(fields)
+        )
+
+    def record(self, time, *fields, force=False):
+        """
+        Stores the fields if a snapshot is due. The first call always takes a snapshot
+        :param time: Current time
+        :param fields: Current fields, one per recorded field
+        :param force: Flag to determine whether a snapshot is taken even if it is not due, e.g. of the final state
+        :return: True if a snapshot was taken
+        """
+        self._calls_since_snapshot += 1
+        if self.num_snapshots > 0 and self._calls_since_snapshot < self.record_rate and not force \
+                and not self._changed(fields):
+            return False
+
+        if self.num_snapshots == self.times.size:
+            kept = self.num_snapshots // 2 + self.num_snapshots % 2
+            self.data[:, :kept] = self.data[:, :self.num_snapshots:2]
+            self.times[:kept] = self.times[:self.num_snapshots:2]
+            self.num_snapshots = kept
+            self.record_rate *= 2
+
+        for num, field in enumerate(fields):
+            self.data[num, self.num_snapshots] = field
+            self.minimum[num] = min(self.minimum[num], field.min())
+            self.maximum[num] = max(self.maximum[num], field.max())
+        self.times[self.num_snapshots] = time
+        self.num_snapshots += 1
+        self._calls_since_snapshot = 0
+        return True
+
+    def snapshots(self, num=0):
+        """
+        Recorded snapshots of one field
+        :param num: Index of the field
+        :return: View with shape (number of snapshots, ...)
+        """
+        return self.data[num, :self.num_snapshots]
+
+    def snapshot_times(self):
+        """
+        Times of the recorded snapshots
+        :return: View with one time per snapshot
+        """
+        return self.times[:self.num_snapshots]
+
+
+class ReactDiffStepper:
+    """
+    Reaction diffusion system with two species that is advanced in place. Both species live in preallocated
+    buffers that are padded by one layer of ghost cells, and every step reuses the same scratch arrays, so that
+    no temporary arrays are allocated. The ghost cells carry the boundary condition and are refreshed before the
+    second derivative is computed. With periodic boundaries, a step yields the same result as calling react_diff
+    for species a and species b with the old values
+    """
+    # Constructor arguments apart from the initial species that are stored as attributes with the same name and
+    # saved in a checkpoint. None if the stepper cannot be checkpointed
+    checkpoint_parameters = (
+        'interact_a',
+        'interact_b',
+        'nonlin_break',
+        'diffusion_coef',
+        'dt',
+        'stencil',
+        'boundary',
+        'boundary_value',
+        'batch_ndim',
+        'dtype'
+    )
+    # Attributes apart from the fields and the constructor parameters that are restored from a checkpoint
+    checkpoint_attributes = ('time', 'num_steps')
+
+    def __init__(
+            self,
+            deviation_a,
+            deviation_b,
+            interact_a=1.,
+            interact_b=-1.,
+            nonlin_break=0.1,
+            diffusion_coef=(1., 3.),
+            dt=0.1,
+            stencil=None,
+            boundary='periodic',
+            boundary_value=0.,
+            batch_ndim=0,
+            dtype=np.float64
+    ):
+        """
+        Constructor
+        :param deviation_a: Initial deviation of the equilibrium of species a
+        :param deviation_b: Initial deviation of the equilibrium of species b
+        :param interact_a: Interaction coefficient of species a. Either shared or a pair (species a, species b)
+        :param interact_b: Interaction coefficient of species b. Either shared or a pair (species a, species b)
+        :param nonlin_break: Non-linear breakdown. Either shared or a pair (species a, species b)
+        :param diffusion_coef: Diffusion coefficient. Either shared or a pair (species a, species b)
+        :param dt: Change in time
+        :param stencil: Name of the stencil of the second derivative (see STENCILS). If None, the
+                nearest-neighbour stencil of the dimension of the species is used
+        :param boundary: Boundary condition. Either 'periodic', 'neumann' or 'dirichlet'
+        :param boundary_value: Value of the deviation outside of the domain for Dirichlet boundaries. Either shared
+                or a pair (species a, species b)
+        :param batch_ndim: Number of leading axes of the species that hold independent simulations. Parameters
+                can then be arrays that broadcast against the species, e.g. with shape (batch size, 1)
+        :param dtype: Data type of the fields and the parameters. np.float32 halves the memory traffic of the
+                steps at the cost of accuracy (see precision.compare_precision)
+        """
+        dtype = np.dtype(dtype)
+        deviation_a = np.asarray(deviation_a, dtype=dtype)
+        deviation_b = np.asarray(deviation_b, dtype=dtype)
+        if deviation_a.shape != deviation_b.shape:
+            raise ValueError('Both species need to have the same shape')
+        if boundary not in BOUNDARIES:
+            raise ValueError('Boundary condition %s is not supported. Choose one of %s' % (boundary, BOUNDARIES))
+
+        self.interact_a = species_pair(interact_a, dtype)
+        self.interact_b = species_pair(interact_b, dtype)
+        self.nonlin_break = species_pair(nonlin_break, dtype)
+        self.diffusion_coef = species_pair(diffusion_coef, dtype)
+        self.dt = dt
+        self.stencil = stencil
+        self.boundary = boundary
+        self.boundary_value = species_pair(boundary_value, dtype)
+        self.batch_ndim = batch_ndim
+        self.dtype = dtype
+        self.time = 0.
+        self.num_steps = 0
+        self._allocate_fields(deviation_a, deviation_b)
+
+    def _allocate_fields(self, deviation_a, deviation_b):
+        """
+        Allocates the species, their increments and the scratch array. The species are views of the interior of
+        buffers that are padded by one layer of ghost cells
+        :param deviation_a: Initial deviation of the equilibrium of species a
+        :param deviation_b: Initial deviation of the equilibrium of species b
+        :return: None
+        """
+        batch_ndim = self.batch_ndim
+        padded_shape = deviation_a.shape[:batch_ndim] + tuple(length + 2 for length in deviation_a.shape[batch_ndim:])
+        self._padded = [np.zeros(padded_shape, dtype=self.dtype) for _ in range(2)]
+        self._padded_stage = None
+        self._interior = interior(deviation_a.ndim, batch_ndim=batch_ndim)
+        self.deviation_a = self._padded[0][self._interior]
+        self.deviation_b = self._padded[1][self._interior]
+        self.deviation_a[...] = deviation_a
+        self.deviation_b[...] = deviation_b
+
+        self.increment_a = np.zeros_like(self.deviation_a)
+        self.increment_b = np.zeros_like(self.deviation_b)
+        self._scratch = np.empty_like(self.deviation_a)
+
+    def _pad(self, substance, species):
+        """
+        Padded field of a species with refreshed ghost cells. The species of the stepper already live in padded
+        buffers, other fields (e.g. intermediate stages) are copied into a padded stage buffer
+        :param substance: Field of the species
+        :param species: Index of the species (0 for a, 1 for b)
+        :return: Padded field
+        """
+        padded = self._padded[species]
+        if substance is not (self.deviation_a, self.deviation_b)[species]:
+            if self._padded_stage is None:
+                self._padded_stage = np.zeros_like(padded)
+            padded = self._padded_stage
+            padded[self._interior] = substance
+        return fill_ghost_cells(
+            padded,
+            self.boundary,
+            self.boundary_value[species],
+            axes=range(self.batch_ndim, padded.ndim)
+        )
+
+    def _laplacian(self, substance, species, out):
+        """
+        Second derivative of a species on the grid
+        :param substance: Field of the species
+        :param species: Index of the species (0 for a, 1 for b)
+        :param out: Output buffer
+        :return: The output buffer
+        """
+        return nabla_sq_padded(
+            self._pad(substance, species),
+            out=out,
+            stencil=self.stencil,
+            scratch=self._scratch,
+            batch_ndim=self.batch_ndim
+        )
+
+    def rate(self, deviation_a, deviation_b, species, out):
+        """
+        Computes the change in time (delta) of one species into the output buffer
+        :param deviation_a: Deviation of the equilibrium of species a
+        :param deviation_b: Deviation of the equilibrium of species b
+        :param species: Index of the species (0 for a, 1 for b)
+        :param out: Output buffer
+        :return: The output buffer
+        """
+        scratch = self._scratch
+        substance = deviation_a if species == 0 else deviation_b
+        self._laplacian(substance, species, out)
+        out *= self.diffusion_coef[species]
+
+        np.multiply(substance, substance, out=scratch)
+        scratch *= substance
+        scratch *= self.nonlin_break[species]
+        out -= scratch
+
+        np.multiply(deviation_a, self.interact_a[species], out=scratch)
+        out += scratch
+        np.multiply(deviation_b, self.interact_b[species], out=scratch)
+        out += scratch
+        return out
+
+    def step(self, num_steps=1):
+        """
+        Advances both species in place
+        :param num_steps: Number of time steps
+        :return: None
+        """
+        for _ in range(num_steps):
+            self.rate(self.deviation_a, self.deviation_b, 0, self.increment_a)
+            self.rate(self.deviation_a, self.deviation_b, 1, self.increment_b)
+            self.increment_a *= self.dt
+            self.increment_b *= self.dt
+            self.deviation_a += self.increment_a
+            self.deviation_b += self.increment_b
+            self.time += self.dt
+            self.num_steps += 1
+
+    def run(self, num_steps, history=None, monitor=None):
+        """
+        Advances both species and records them after every step
+        :param num_steps: Maximal number of time steps
+        :param history: HistoryBuffer for species a and b. If it is empty, the current state is recorded first
+        :param monitor: ConvergenceMonitor that is updated after every step. The run stops early once the monitor
+                detects a steady state or a periodic regime
+        :return: The history
+        """
+        if history is not None and history.num_snapshots == 0:
+            history.record(self.time, self.deviation_a, self.deviation_b)
+        for _ in range(num_steps):
+            time_before = self.time
+            self.step()
+            if history is not None:
+                history.record(self.time, self.deviation_a, self.deviation_b)
+            if monitor is not None and monitor.update(
+                    self.time,
+                    self.time - time_before,
+                    self.increment_a,
+                    self.increment_b,
+                    self.deviation_a
+            ):
+                break
+        return history
+
+
+def mesh_edges(faces):
+    """
+    Edges of a mesh whose vertices are the cells, e.g. a Delaunay triangulation of the cell centres. Two cells are
+    adjacent if they are consecutive corners of a face
+    :param faces: Corner indices of the faces with shape (number of faces, corners per face)
+    :return: Unique edges with shape (number of edges, 2), the smaller index first
+    """
+    faces = np.asarray(faces, dtype=np.int64)
+    edges = np.stack([faces, np.roll(faces, -1, axis=1)], axis=-1).reshape(-1, 2)
+    edges.sort(axis=1)
+    return np.unique(edges[edges[:, 0] != edges[:, 1]], axis=0)
+
+
+def graph_laplacian(edges, num_cells=None, weights=None, dtype=np.float64):
+    """
+    Graph Laplacian L = A - D of an undirected cell graph as sparse CSR matrix, where A is the weighted adjacency
+    matrix and D the diagonal matrix of the weighted degrees. It takes the place of the second derivative, i.e.
+    the edge list of a periodic grid with unit weights yields the same as nabla_sq_1d and nabla_sq_2d. The
+    construction and the product with a field both cost O(number of cells + number of edges)
+    :param edges: Pairs of adjacent cells with shape (number of edges, 2). Every edge is listed once, repeated
+            edges add up their weights
+    :param num_cells: Number of cells. If None, the largest index in the edge list plus one
+    :param weights: Coupling of every edge, e.g. the contact area over the distance of the cells. If None, all
+            edges have the weight one
+    :param dtype: Data type of the entries
+    :return: Laplacian as sparse CSR matrix with shape (num_cells, num_cells)
+    """
+    edges = np.asarray(edges, dtype=np.int64).reshape(-1, 2)
+    if num_cells is None:
+        num_cells = int(edges.max()) + 1 if edges.size else 0
+    weights = np.broadcast_to(np.asarray(1. if weights is None else weights, dtype=dtype), (edges.shape[0],))
+    first, second = edges[:, 0], edges[:, 1]
+    laplacian = sp.coo_matrix(
+        (
+            np.concatenate([weights, weights, -weights, -weights]),
+            (np.concatenate([first, second, first, second]), np.concatenate([second, first, first, second]))
+        ),
+        shape=(num_cells, num_cells),
+        dtype=dtype
+    ).tocsr()
+    # Self loops cancel out with their contribution to the degree
+    laplacian.eliminate_zeros()
+    return laplacian
+
+
+def locality_order(laplacian):
+    """
+    Ordering of the cells that clusters adjacent cells in memory (reverse Cuthill-McKee). It reduces the bandwidth
+    of the Laplacian, such that the neighbours that a product with a field reads are close to each other
+    :param laplacian: Graph Laplacian as sparse matrix
+    :return: Permutation, i.e. the original index of the cell at every new position
+    """
+    return reverse_cuthill_mckee(sp.csr_matrix(laplacian), symmetric_mode=True).astype(np.int64)
+
+
+class GraphStepper(ReactDiffStepper):
+    """
+    Reaction diffusion system with two species on an arbitrary graph of cells, e.g. an irregular tissue, instead of
+    a regular grid. The species are vectors with one value per cell, and the second derivative is the product
+    with the sparse graph Laplacian, which is built once. A step costs O(number of cells + number of edges).
+    Optionally, the cells are renumbered with locality_order, such that the neighbours of a cell are close to it
+    in memory. The fields of the stepper are then stored in the new order, and to_cell_order maps them back.
+    Checkpoints are not supported, since the Laplacian is not a plain array
+    """
+    checkpoint_parameters = None
+
+    def __init__(
+            self,
+            deviation_a,
+            deviation_b,
+            laplacian,
+            interact_a=1.,
+            interact_b=-1.,
+            nonlin_break=0.1,
+            diffusion_coef=(1., 3.),
+            dt=0.1,
+            reorder=False,
+            dtype=np.float64
+    ):
+        """
+        Constructor
+        :param deviation_a: Initial deviation of the equilibrium of species a, one value per cell
+        :param deviation_b: Initial deviation of the equilibrium of species b, one value per cell
+        :param laplacian: Graph Laplacian as sparse matrix (see graph_laplacian) or edge list with shape
+                (number of edges, 2) from which it is built
+        :param interact_a: Interaction coefficient of species a. Either shared or a pair (species a, species b)
+        :param interact_b: Interaction coefficient of species b. Either shared or a pair (species a, species b)
+        :param nonlin_break: Non-linear breakdown. Either shared or a pair (species a, species b)
+        :param diffusion_coef: Diffusion coefficient. Either shared or a pair (species a, species b)
+        :param dt: Change in time
+        :param reorder: Flag to determine whether the cells are renumbered for memory locality
+        :param dtype: Data type of the fields and the parameters, e.g. np.float32
+        """
+        deviation_a = np.ravel(deviation_a)
+        deviation_b = np.ravel(deviation_b)
+        if not sp.issparse(laplacian):
+            laplacian = graph_laplacian(laplacian, num_cells=deviation_a.size, dtype=dtype)
+        if laplacian.shape != (deviation_a.size, deviation_a.size):
+            raise ValueError('The Laplacian needs to have one row and one column per cell')
+        laplacian = sp.csr_matrix(laplacian, dtype=dtype)
+
+        self.permutation = locality_order(laplacian) if reorder else np.arange(deviation_a.size)
+        if reorder:
+            laplacian = laplacian[self.permutation][:, self.permutation]
+            deviation_a = deviation_a[self.permutation]
+            deviation_b = deviation_b[self.permutation]
+        self._inverse_permutation = np.argsort(self.permutation)
+        laplacian.sort_indices()
+
+        super().__init__(
+            deviation_a,
+            deviation_b,
+            interact_a=interact_a,
+            interact_b=interact_b,
+            nonlin_break=nonlin_break,
+            diffusion_coef=diffusion_coef,
+            dt=dt,
+            dtype=dtype
+        )
+        self.laplacian = laplacian
+        self.reorder = reorder
+
+    def to_cell_order(self, field):
+        """
+        Maps a field of the stepper back to the original numbering of the cells
+        :param field: Field with one value per cell in the order of the stepper
+        :return: Field in the original order of the cells
+        """
+        return field[self._inverse_permutation]
+
+    def _allocate_fields(self, deviation_a, deviation_b):
+        """
+        Allocates the species, their increments and the scratch array. The graph has no ghost cells, hence the
+        species are not padded
+        :param deviation_a: Initial deviation of the equilibrium of species a
+        :param deviation_b: Initial deviation of the equilibrium of species b
+        :return: None
+        """
+        self.deviation_a = deviation_a.copy()
+        self.deviation_b = deviation_b.copy()
+        self.increment_a = np.zeros_like(self.deviation_a)
+        self.increment_b = np.zeros_like(self.deviation_b)
+        self._scratch = np.empty_like(self.deviation_a)
+
+    def _laplacian(self, substance, species, out):
+        """
+        Second derivative of a species on the graph, i.e. the product with the graph Laplacian, written into the
+        output buffer
+        :param substance: Field of the species
+        :param species: Index of the species (0 for a, 1 for b)
+        :param out: Output buffer
+        :return: The output buffer
+        """
+        np.copyto(out, self.laplacian @ substance)
+        return out
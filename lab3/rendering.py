@@ -0,0 +1,192 @@
+#!/usr/bin/python3
+import multiprocessing as mp
+import queue
+import numpy as np
+
+
+RENDER_MODES = ('live', 'gif', 'video')
+
+
+def _render(frames, mode, path, titles, suptitle, xlabel, ylabel, fps, dpi):
+    """
+    Rendering process. The figure and its images are created once, every frame only updates the image data,
+    the colour limits and the time in the title
+    :param frames: Queue of (time, fields) tuples. None ends the rendering
+    :param mode: Either 'live', 'gif' or 'video'
+    :param path: Output file for 'gif' and 'video'
+    :param titles: Title of every field
+    :param suptitle: Title of the figure
+    :param xlabel: Label of the x axis
+    :param ylabel: Label of the y axis
+    :param fps: Frames per second of the encoded file
+    :param dpi: Resolution of the encoded file
+    :return: None
+    """
+    import matplotlib
+    if mode != 'live':
+        matplotlib.use('Agg', force=True)
+    import matplotlib.pyplot as plt
+    from matplotlib import animation
+
+    frame = frames.get()
+    if frame is None:
+        return
+    time, fields = frame
+    fig, axes = plt.subplots(1, len(fields), squeeze=False, figsize=(4 * len(fields), 4))
+    images = []
+    for ax, field, title in zip(axes[0], fields, titles):
+        images.append(ax.imshow(field))
+        ax.set_title(title)
+        ax.set_xlabel(xlabel)
+        ax.set_ylabel(ylabel)
+    heading = fig.suptitle('')
+
+    def draw(time, fields):
+        for image, field in zip(images, fields):
+            image.set_data(field)
+            image.set_clim(field.min(), field.max())
+        heading.set_text('%s (t = %.2f)' % (suptitle, time))
+
+    if mode == 'live':
+        plt.ion()
+        plt.show()
+        while frame is not None:
+            draw(*frame)
+            fig.canvas.draw_idle()
+            fig.canvas.flush_events()
+            frame = frames.get()
+        plt.ioff()
+        plt.show()
+        return
+
+    writer = animation.PillowWriter(fps=fps) if mode == 'gif' else animation.FFMpegWriter(fps=fps)
+    with writer.saving(fig, path, dpi):
+        while frame is not None:
+            draw(*frame)
+            writer.grab_frame()
+            frame = frames.get()
+    plt.close(fig)
+
+
+class SnapshotRenderer:
+    """
+    Renders snapshots of the simulation in a separate process, such that the solver never waits on matplotlib.
+    Snapshots are handed over through a bounded queue. If the renderer falls behind and the queue is full,
+    snapshots are dropped instead of blocking the solver. Frames are either shown live or encoded headlessly to a
+    GIF or a video file
+    """
+    def __init__(
+            self,
+            titles=('Species A',),
+            mode='live',
+            path=None,
+            suptitle='Two dimensional reaction diffusion system',
+            xlabel='X direction',
+            ylabel='Y direction',
+            fps=10,
+            dpi=100,
+            queue_size=8,
+            drop_when_full=True
+    ):
+        """
+        Constructor
+        :param titles: Title of every rendered field
+        :param mode: Either 'live', 'gif' or 'video'. Videos are encoded with ffmpeg, which needs to be installed
+        :param path: Output file for 'gif' and 'video'
+        :param suptitle: Title of the figure
+        :param xlabel: Label of the x axis
+        :param ylabel: Label of the y axis
+        :param fps: Frames per second of the encoded file
+        :param dpi: Resolution of the encoded file
+        :param queue_size: Maximal number of snapshots that wait for rendering
+        :param drop_when_full: Flag to determine whether snapshots are dropped when the queue is full. Otherwise,
+                the solver waits until there is space in the queue, e.g. to encode every snapshot into a file
+        """
+        if mode not in RENDER_MODES:
+            raise ValueError('Render mode %s is not supported. Choose one of %s' % (mode, RENDER_MODES))
+        if mode != 'live' and path is None:
+            raise ValueError('An output path is needed for render mode %s' % mode)
+
+        self.mode = mode
+        self.drop_when_full = drop_when_full
+        self.num_submitted = 0
+        self.num_dropped = 0
+        self._frames = mp.Queue(maxsize=queue_size)
+        self._process = mp.Process(
+            target=_render,
+            args=(self._frames, mode, path, list(titles), suptitle, xlabel, ylabel, fps, dpi),
+            daemon=True
+        )
+        self._process.start()
+
+    def submit(self, time, *fields):
+        """
+        Hands a snapshot over to the rendering process. The fields are copied, such that the solver can continue
+        to modify them in place
+        :param time: Time of the snapshot
+        :param fields: One field per title
+        :return: True if the snapshot was queued, False if it was dropped
+        """
+        self._check_alive()
+        frame = (time, [np.array(field, copy=True) for field in fields])
+        self.num_submitted += 1
+        if self.drop_when_full:
+            try:
+                self._frames.put(frame, block=False)
+            except queue.Full:
+                self.num_dropped += 1
+                return False
+            return True
+        self._put(frame)
+        return True
+
+    def _check_alive(self):
+        """
+        Raises an error if the rendering process stopped before it was closed, e.g. because ffmpeg is missing
+        :return: None
+        """
+        if not self._process.is_alive():
+            raise RuntimeError('The rendering process exited with code %s' % self._process.exitcode)
+
+    def _put(self, item, poll_interval=1.):
+        """
+        Waits until there is space in the queue. While waiting, the rendering process is checked regularly, such
+        that a renderer that died does not block the solver forever
+        :param item: Frame or None to end the rendering
+        :param poll_interval: Time in seconds between two checks of the rendering process
+        :return: None
+        """
+        while True:
+            try:
+                self._frames.put(item, timeout=poll_interval)
+                return
+            except queue.Full:
+                self._check_alive()
+
+    def close(self, timeout=60.):
+        """
+        Waits until all queued snapshots are rendered and, in live mode, until the window is closed
+        :param timeout: Time in seconds that the renderer gets to encode the remaining snapshots of a 'gif' or a
+                'video' before it is terminated. In live mode, the renderer waits for the window to be closed
+        :return: None
+        """
+        if self._process is None:
+            return
+        process = self._process
+        try:
+            if process.is_alive():
+                self._put(None)
+                process.join(None if self.mode == 'live' else timeout)
+                if process.is_alive():
+                    process.terminate()
+                    process.join()
+        finally:
+            self._process = None
+        if process.exitcode != 0:
+            raise RuntimeError('The rendering process exited with code %s' % process.exitcode)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -0,0 +1,124 @@
+#!/usr/bin/python3
+import numpy as np
+import scipy.sparse as sp
+from scipy.sparse.linalg import splu
+from reaction_diffusion import ReactDiffStepper
+
+
+_FACTORIZATION_CACHE = {}
+
+
+def laplacian_matrix(shape):
+    """
+    Sparse matrix of the second derivative on a periodic grid, acting on the flattened (C-ordered) field.
+    The result is the same as for nabla_sq_1d and nabla_sq_2d
+    :param shape: Shape of the grid
+    :return: Laplacian as sparse CSR matrix
+    """
+    size = int(np.prod(shape))
+    laplacian = sp.csr_matrix((size, size))
+    for axis, length in enumerate(shape):
+        shift = sp.eye(length, k=1) + sp.eye(length, k=-(length - 1))
+        laplacian_1d = shift + shift.T - 2 * sp.eye(length)
+        before = sp.eye(int(np.prod(shape[:axis])))
+        after = sp.eye(int(np.prod(shape[axis + 1:])))
+        laplacian = laplacian + sp.kron(sp.kron(before, laplacian_1d), after)
+    return laplacian.tocsr()
+
+
+def implicit_diffusion_solver(shape, diffusion_coef, dt):
+    """
+    LU factorization of (I - dt * D * Laplacian) for the implicit diffusion step. The factorization is
+    computed once per shape, diffusion coefficient and time step and reused afterwards
+    :param shape: Shape of the grid
+    :param diffusion_coef: Diffusion coefficient
+    :param dt: Change in time
+    :return: SuperLU object whose solve method applies the inverse
+    """
+    key = (tuple(shape), float(diffusion_coef), float(dt))
+    if key not in _FACTORIZATION_CACHE:
+        size = int(np.prod(shape))
+        system = sp.eye(size) - dt * diffusion_coef * laplacian_matrix(shape)
+        _FACTORIZATION_CACHE[key] = splu(system.tocsc())
+    return _FACTORIZATION_CACHE[key]
+
+
+class IMEXStepper(ReactDiffStepper):
+    """
+    Semi-implicit (IMEX Euler) reaction diffusion system with two species. The reaction terms are
+    treated explicitly, the diffusion implicitly, i.e.
+    (I - dt * D * Laplacian) s_new = s + dt * reaction(a, b).
+    Since the diffusion no longer limits the stability, the time step is only bounded by the reaction dynamics
+    """
+    checkpoint_parameters = ('interact_a', 'interact_b', 'nonlin_break', 'diffusion_coef', 'dt')
+
+    def __init__(
+            self,
+            deviation_a,
+            deviation_b,
+            interact_a=1.,
+            interact_b=-1.,
+            nonlin_break=0.1,
+            diffusion_coef=(1., 3.),
+            dt=0.1
+    ):
+        """
+        Constructor
+        :param deviation_a: Initial deviation of the equilibrium of species a
+        :param deviation_b: Initial deviation of the equilibrium of species b
+        :param interact_a: Interaction coefficient of species a. Either shared or a pair (species a, species b)
+        :param interact_b: Interaction coefficient of species b. Either shared or a pair (species a, species b)
+        :param nonlin_break: Non-linear breakdown. Either shared or a pair (species a, species b)
+        :param diffusion_coef: Diffusion coefficient. Either shared or a pair (species a, species b)
+        :param dt: Change in time
+        """
+        super().__init__(
+            deviation_a,
+            deviation_b,
+            interact_a=interact_a,
+            interact_b=interact_b,
+            nonlin_break=nonlin_break,
+            diffusion_coef=diffusion_coef,
+            dt=dt
+        )
+        self._solvers = [
+            implicit_diffusion_solver(self.deviation_a.shape, coef, dt) for coef in self.diffusion_coef
+        ]
+
+    def _explicit_part(self, substance, species, out):
+        """
+        Computes s + dt * reaction for one species into the output buffer
+        :param substance: Field of the species
+        :param species: Index of the species (0 for a, 1 for b)
+        :param out: Output buffer
+        :return: None
+        """
+        scratch = self._scratch
+        np.multiply(substance, substance, out=out)
+        out *= substance
+        out *= -self.nonlin_break[species]
+        np.multiply(self.deviation_a, self.interact_a[species], out=scratch)
+        out += scratch
+        np.multiply(self.deviation_b, self.interact_b[species], out=scratch)
+        out += scratch
+        out *= self.dt
+        out += substance
+
+    def step(self, num_steps=1):
+        """
+        Advances both species in place
+        :param num_steps: Number of time steps
+        :return: None
+        """
+        for _ in range(num_steps):
+            self._explicit_part(self.deviation_a, 0, self.increment_a)
+            self._explicit_part(self.deviation_b, 1, self.increment_b)
+            for species, substance, increment in [
+                (0, self.deviation_a, self.increment_a),
+                (1, self.deviation_b, self.increment_b)
+            ]:
+                updated = self._solvers[species].solve(increment.ravel()).reshape(substance.shape)
+                np.subtract(updated, substance, out=increment)
+                substance[...] = updated
+            self.time += self.dt
+            self.num_steps += 1
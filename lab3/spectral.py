@@ -0,0 +1,164 @@
+#!/usr/bin/python3
+import numpy as np
+from reaction_diffusion import ReactDiffStepper
+
+
+_COEFFICIENT_CACHE = {}
+
+
+def laplacian_symbol(shape):
+    """
+    Eigenvalues of the periodic second derivative (as in nabla_sq_1d and nabla_sq_2d) for the modes of the
+    real FFT of a field with the given shape
+    :param shape: Shape of the grid
+    :return: Eigenvalues with the shape of the real FFT
+    """
+    wave_numbers = [2 * np.pi * np.fft.fftfreq(length) for length in shape[:-1]]
+    wave_numbers.append(2 * np.pi * np.fft.rfftfreq(shape[-1]))
+    grids = np.meshgrid(*wave_numbers, indexing='ij')
+    return sum(2 * np.cos(grid) - 2 for grid in grids)
+
+
+def etdrk4_coefficients(shape, dt, diffusion_coef, linear_coef=0., num_contour_points=32):
+    """
+    Coefficients of the exponential time-differencing Runge-Kutta scheme of fourth order (Cox and Matthews)
+    for the linear operator diffusion_coef * Laplacian + linear_coef. The phi-functions are evaluated with
+    the contour integral of Kassam and Trefethen to avoid cancellation for small eigenvalues. The coefficients
+    are computed once per shape, time step and operator and reused afterwards
+    :param shape: Shape of the grid
+    :param dt: Change in time
+    :param diffusion_coef: Diffusion coefficient
+    :param linear_coef: Linear reaction coefficient of the species with itself
+    :param num_contour_points: Number of points on the contour
+    :return: Tuple (E, E2, Q, f1, f2, f3) of arrays with the shape of the real FFT
+    """
+    key = (tuple(shape), float(dt), float(diffusion_coef), float(linear_coef), num_contour_points)
+    if key in _COEFFICIENT_CACHE:
+        return _COEFFICIENT_CACHE[key]
+
+    linear = diffusion_coef * laplacian_symbol(shape) + linear_coef
+    scaled = dt * linear
+    roots = np.exp(1j * np.pi * (np.arange(1, num_contour_points + 1) - 0.5) / num_contour_points)
+    contour = scaled[..., np.newaxis] + roots
+    exp_contour = np.exp(contour)
+
+    coefficients = (
+        np.exp(scaled),
+        np.exp(scaled / 2.),
+        dt * np.real(np.mean((np.exp(contour / 2.) - 1) / contour, axis=-1)),
+        dt * np.real(np.mean((-4 - contour + exp_contour * (4 - 3 * contour + contour**2)) / contour**3, axis=-1)),
+        dt * np.real(np.mean((2 + contour + exp_contour * (contour - 2)) / contour**3, axis=-1)),
+        dt * np.real(np.mean((-4 - 3 * contour - contour**2 + exp_contour * (4 - contour)) / contour**3, axis=-1))
+    )
+    _COEFFICIENT_CACHE[key] = coefficients
+    return coefficients
+
+
+class ETDRK4Stepper(ReactDiffStepper):
+    """
+    Spectral reaction diffusion system with two species on a periodic domain, integrated with the
+    exponential time-differencing Runge-Kutta scheme of fourth order. The diffusion and the linear
+    self-interaction of each species are integrated exactly in Fourier space, the cross interaction and
+    the non-linear breakdown are treated with the fourth order scheme. Every step costs a few FFTs,
+    i.e. O(N log N), and the time step is not limited by the diffusion
+    """
+    checkpoint_parameters = ('interact_a', 'interact_b', 'nonlin_break', 'diffusion_coef', 'dt')
+
+    def __init__(
+            self,
+            deviation_a,
+            deviation_b,
+            interact_a=1.,
+            interact_b=-1.,
+            nonlin_break=0.1,
+            diffusion_coef=(1., 3.),
+            dt=0.1
+    ):
+        """
+        Constructor
+        :param deviation_a: Initial deviation of the equilibrium of species a
+        :param deviation_b: Initial deviation of the equilibrium of species b
+        :param interact_a: Interaction coefficient of species a. Either shared or a pair (species a, species b)
+        :param interact_b: Interaction coefficient of species b. Either shared or a pair (species a, species b)
+        :param nonlin_break: Non-linear breakdown. Either shared or a pair (species a, species b)
+        :param diffusion_coef: Diffusion coefficient. Either shared or a pair (species a, species b)
+        :param dt: Change in time
+        """
+        super().__init__(
+            deviation_a,
+            deviation_b,
+            interact_a=interact_a,
+            interact_b=interact_b,
+            nonlin_break=nonlin_break,
+            diffusion_coef=diffusion_coef,
+            dt=dt
+        )
+        shape = self.deviation_a.shape
+        # The self-interaction is part of the linear operator: interact_a for a and interact_b for b
+        self._coefficients = [
+            etdrk4_coefficients(shape, dt, self.diffusion_coef[0], self.interact_a[0]),
+            etdrk4_coefficients(shape, dt, self.diffusion_coef[1], self.interact_b[1])
+        ]
+
+    def _fft(self, field):
+        """
+        Real FFT of a field over all axes
+        :param field: Field in real space
+        :return: Field in Fourier space
+        """
+        return np.fft.rfftn(field)
+
+    def _ifft(self, field_hat):
+        """
+        Inverse real FFT of a field over all axes
+        :param field_hat: Field in Fourier space
+        :return: Field in real space
+        """
+        return np.fft.irfftn(field_hat, s=self.deviation_a.shape)
+
+    def _nonlinear(self, a_hat, b_hat):
+        """
+        Non-linear and cross interaction terms of both species in Fourier space
+        :param a_hat: Species a in Fourier space
+        :param b_hat: Species b in Fourier space
+        :return: Terms for species a and species b in Fourier space
+        """
+        deviation_a = self._ifft(a_hat)
+        deviation_b = self._ifft(b_hat)
+        return (
+            self._fft(self.interact_b[0] * deviation_b - self.nonlin_break[0] * deviation_a**3),
+            self._fft(self.interact_a[1] * deviation_a - self.nonlin_break[1] * deviation_b**3)
+        )
+
+    def step(self, num_steps=1):
+        """
+        Advances both species. The fields stay in Fourier space during the steps, such that the increments
+        hold the change over all steps of this call
+        :param num_steps: Number of time steps
+        :return: None
+        """
+        state = [self._fft(self.deviation_a), self._fft(self.deviation_b)]
+        previous = [self.deviation_a.copy(), self.deviation_b.copy()]
+        for _ in range(num_steps):
+            nonlin_v = self._nonlinear(*state)
+            stage_a = [e2 * v + q * n for (_, e2, q, _, _, _), v, n in zip(self._coefficients, state, nonlin_v)]
+            nonlin_a = self._nonlinear(*stage_a)
+            stage_b = [e2 * v + q * n for (_, e2, q, _, _, _), v, n in zip(self._coefficients, state, nonlin_a)]
+            nonlin_b = self._nonlinear(*stage_b)
+            stage_c = [
+                e2 * a + q * (2 * nb - nv)
+                for (_, e2, q, _, _, _), a, nb, nv in zip(self._coefficients, stage_a, nonlin_b, nonlin_v)
+            ]
+            nonlin_c = self._nonlinear(*stage_c)
+            state = [
+                e * v + nv * f1 + 2 * (na + nb) * f2 + nc * f3
+                for (e, _, _, f1, f2, f3), v, nv, na, nb, nc
+                in zip(self._coefficients, state, nonlin_v, nonlin_a, nonlin_b, nonlin_c)
+            ]
+            self.time += self.dt
+            self.num_steps += 1
+
+        self.deviation_a[...] = self._ifft(state[0])
+        self.deviation_b[...] = self._ifft(state[1])
+        np.subtract(self.deviation_a, previous[0], out=self.increment_a)
+        np.subtract(self.deviation_b, previous[1], out=self.increment_b)
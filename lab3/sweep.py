@@ -0,0 +1,230 @@
+#!/usr/bin/python3
+import multiprocessing as mp
+import numpy as np
+from reaction_diffusion import HistoryBuffer, ReactDiffStepper, species_pair
+from convergence import ConvergenceMonitor
+
+
+def stack_parameters(parameter_sets, spatial_ndim):
+    """
+    Stacks the parameters of several simulations along a leading batch axis
+    :param parameter_sets: List of dictionaries with the parameters of the ReactDiffStepper that differ between
+            the simulations. Every dictionary needs to contain the same keys
+    :param spatial_ndim: Number of spatial dimensions of the species
+    :return: Dictionary that maps every parameter to a pair (species a, species b) of arrays with shape
+            (batch size, 1, ...) that broadcast against the stacked species
+    """
+    keys = set(parameter_sets[0])
+    if any(set(params) != keys for params in parameter_sets):
+        raise ValueError('All parameter sets need to contain the same parameters')
+
+    stacked = {}
+    shape = (len(parameter_sets),) + (1,) * spatial_ndim
+    for key in keys:
+        pairs = np.asarray([species_pair(params[key]) for params in parameter_sets], dtype=float)
+        stacked[key] = (pairs[:, 0].reshape(shape), pairs[:, 1].reshape(shape))
+    return stacked
+
+
+def _run_batch(
+        parameter_sets,
+        deviation_a,
+        deviation_b,
+        number_timesteps,
+        dt,
+        record_rate,
+        stepper_kwargs,
+        monitor_kwargs=None,
+        max_snapshots=None
+):
+    """
+    Advances a batch of simulations together in one vectorized stepper, which records into a HistoryBuffer of
+    batch-shaped fields
+    :param parameter_sets: List of dictionaries with the parameters of every simulation
+    :param deviation_a: Initial deviations of species a with shape (batch size, ...)
+    :param deviation_b: Initial deviations of species b with shape (batch size, ...)
+    :param number_timesteps: Number of time steps
+    :param dt: Change in time
+    :param record_rate: Number of time steps between two recorded states
+    :param stepper_kwargs: Parameters of the ReactDiffStepper that are shared by all simulations
+    :param monitor_kwargs: Parameters of the ConvergenceMonitor. If None, all time steps are performed
+    :param max_snapshots: Maximal number of stored records (see HistoryBuffer). If None, every record is kept
+    :return: Histories of species a and b with shape (batch size, number of records, ...), the times of the
+            records and the convergence time of every simulation
+    """
+    kwargs = dict(stepper_kwargs)
+    kwargs.update(stack_parameters(parameter_sets, deviation_a.ndim - 1))
+    stepper = ReactDiffStepper(deviation_a, deviation_b, dt=dt, batch_ndim=1, **kwargs)
+
+    if max_snapshots is None:
+        # The initial state, every record_rate-th step and the final state
+        max_snapshots = -(-number_timesteps // record_rate) + 1
+    history = HistoryBuffer(
+        deviation_a.shape,
+        max_snapshots=max_snapshots,
+        record_rate=record_rate,
+        dtype=stepper.dtype
+    )
+    monitor = None if monitor_kwargs is None else ConvergenceMonitor(batch_ndim=1, **monitor_kwargs)
+    # The idle tail after all simulations of the batch converged is not simulated
+    stepper.run(number_timesteps, history=history, monitor=monitor)
+    if history.snapshot_times()[-1] != stepper.time:
+        history.record(stepper.time, stepper.deviation_a, stepper.deviation_b, force=True)
+
+    convergence_time = np.full(deviation_a.shape[0], np.nan) if monitor is None else monitor.convergence_time
+    return (
+        np.moveaxis(history.snapshots(0), 0, 1),
+        np.moveaxis(history.snapshots(1), 0, 1),
+        history.snapshot_times().copy(),
+        convergence_time
+    )
+
+
+def run_sweep(
+        parameter_sets,
+        deviation_a,
+        deviation_b,
+        number_timesteps,
+        dt=0.1,
+        record_rate=1,
+        num_processes=1,
+        monitor_kwargs=None,
+        shared_initial=False,
+        max_snapshots=None,
+        **stepper_kwargs
+):
+    """
+    Runs one reaction diffusion simulation per parameter set. Instead of looping over the parameter sets, all
+    simulations are stacked along a leading batch axis and advanced together, such that every time step is a few
+    vectorized operations on the whole batch. Optionally, the batch is split into shards that run in a process pool
+    :param parameter_sets: List of dictionaries with the parameters of the ReactDiffStepper that differ between the
+            simulations, e.g. [{'diffusion_coef': (1., 3.)}, {'diffusion_coef': (1., 4.)}]
+    :param deviation_a: Initial deviations of species a with shape (number of parameter sets, ...), i.e. one field
+            per simulation, or one field that is shared by all simulations if shared_initial is set
+    :param deviation_b: Initial deviations of species b, with the same layout as species a
+    :param number_timesteps: Number of time steps
+    :param dt: Change in time
+    :param record_rate: Number of time steps between two recorded states. The final state is always recorded
+    :param num_processes: Number of processes among which the batch is split
+    :param monitor_kwargs: Parameters of the ConvergenceMonitor, e.g. {'steady_tol': 1e-5}. If given, a batch stops
+            once all its simulations reached a steady state or a periodic regime, and the convergence times are
+            returned as well
+    :param shared_initial: Flag to determine whether deviation_a and deviation_b are single fields that are shared
+            by all simulations instead of being stacked along the first axis
+    :param max_snapshots: Maximal number of records per simulation. When they are used up, every second record is
+            dropped and the record rate doubles (see HistoryBuffer), such that the memory does not depend on the
+            number of time steps. If None, every record is kept
+    :param stepper_kwargs: Parameters of the ReactDiffStepper that are shared by all simulations
+    :return: Histories of species a and b with shape (number of parameter sets, number of records, ...) and the
+            times of the records. The first record is the initial state, the last one the final state. If the run
+            stopped early, there are fewer records. Shards that stopped before the longest shard repeat their last
+            state. With monitor_kwargs, the convergence time of every simulation (NaN if it did not converge) is
+            returned as fourth value
+    """
+    num_sets = len(parameter_sets)
+    deviation_a = np.asarray(deviation_a, dtype=float)
+    deviation_b = np.asarray(deviation_b, dtype=float)
+    if shared_initial:
+        deviation_a = np.broadcast_to(deviation_a, (num_sets,) + deviation_a.shape)
+        deviation_b = np.broadcast_to(deviation_b, (num_sets,) + deviation_b.shape)
+    elif any(deviation.ndim == 0 or deviation.shape[0] != num_sets for deviation in (deviation_a, deviation_b)):
+        raise ValueError(
+            'The initial deviations need one field per parameter set stacked along the first axis. '
+            'Pass shared_initial=True to share one field among all parameter sets'
+        )
+
+    num_processes = max(1, min(num_processes, num_sets))
+    if num_processes == 1:
+        results = [_run_batch(
+            parameter_sets,
+            deviation_a,
+            deviation_b,
+            number_timesteps,
+            dt,
+            record_rate,
+            stepper_kwargs,
+            monitor_kwargs,
+            max_snapshots
+        )]
+    else:
+        results = _run_shards(
+            parameter_sets,
+            deviation_a,
+            deviation_b,
+            number_timesteps,
+            dt,
+            record_rate,
+            num_processes,
+            stepper_kwargs,
+            monitor_kwargs,
+            max_snapshots
+        )
+
+    times = max((result[2] for result in results), key=lambda shard_times: shard_times[-1])
+    histories = [
+        np.concatenate([_align_records(result[species], result[2], times) for result in results])
+        for species in range(2)
+    ]
+    if monitor_kwargs is None:
+        return histories[0], histories[1], times
+    return histories[0], histories[1], times, np.concatenate([result[3] for result in results])
+
+
+def _align_records(history, times, target_times):
+    """
+    Resamples the history of a shard to the record times of the longest shard. Every target time takes the latest
+    record up to this time, such that a shard that stopped early repeats its last state, and a shard that dropped
+    fewer records matches the coarser records of the longest shard
+    :param history: History with shape (batch size, number of records, ...)
+    :param times: Times of the records
+    :param target_times: Record times after resampling
+    :return: Resampled history
+    """
+    if times.shape == target_times.shape and np.array_equal(times, target_times):
+        return history
+    return history[:, np.searchsorted(times, target_times, side='right') - 1]
+
+
+def _run_shards(
+        parameter_sets,
+        deviation_a,
+        deviation_b,
+        number_timesteps,
+        dt,
+        record_rate,
+        num_processes,
+        stepper_kwargs,
+        monitor_kwargs,
+        max_snapshots
+):
+    """
+    Splits the batch into shards that run in a process pool
+    :param parameter_sets: List of dictionaries with the parameters of every simulation
+    :param deviation_a: Initial deviations of species a with shape (batch size, ...)
+    :param deviation_b: Initial deviations of species b with shape (batch size, ...)
+    :param number_timesteps: Number of time steps
+    :param dt: Change in time
+    :param record_rate: Number of time steps between two recorded states
+    :param num_processes: Number of processes
+    :param stepper_kwargs: Parameters of the ReactDiffStepper that are shared by all simulations
+    :param monitor_kwargs: Parameters of the ConvergenceMonitor or None
+    :param max_snapshots: Maximal number of stored records per shard or None
+    :return: List with the results of every shard
+    """
+    shards = np.array_split(np.arange(len(parameter_sets)), num_processes)
+    arguments = [
+        (
+            [parameter_sets[index] for index in shard],
+            deviation_a[shard],
+            deviation_b[shard],
+            number_timesteps,
+            dt,
+            record_rate,
+            stepper_kwargs,
+            monitor_kwargs,
+            max_snapshots
+        )
+        for shard in shards
+    ]
+    with mp.Pool(num_processes) as pool:
+        return pool.starmap(_run_batch, arguments)